@@ -0,0 +1,199 @@
+"""
+Per-User Ledger Actors - RupeeReady AI
+Orders balance mutations per user without a global lock, and coalesces a
+user's rapid successive ledger writes into one commit (group commit).
+"""
+
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class UserActor:
+    """Mailbox and write buffer for one user"""
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: turns run in arrival order
+        self.pending: List[Tuple[dict, asyncio.Future]] = []
+        self.flushes: Set[asyncio.Task] = set()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flush_due = False  # window elapsed while a turn was running
+        self.turns = 0  # turns waiting or running
+
+
+class Turn:
+    """A user's exclusive turn: read through the buffer, then buffer writes"""
+
+    def __init__(self, actors: "LedgerActors", user_id: str, actor: UserActor):
+        self._actors = actors
+        self._user_id = user_id
+        self._actor = actor
+
+    def overlay(self, profile: dict) -> dict:
+        """The profile as it will be once the buffered writes are flushed"""
+        profile = dict(profile)
+        for item, _ in self._actor.pending:
+            for key, value in item["increments"].items():
+                profile[key] = profile.get(key, 0) + value
+            profile.update(item["fields"])
+        return profile
+
+    def overlay_goals(self, goals: List[dict]) -> List[dict]:
+        """The user's goals as they will be once the buffered writes are flushed"""
+        goals = [dict(goal) for goal in goals]
+        by_id = {goal["id"]: goal for goal in goals}
+        for item, _ in self._actor.pending:
+            for goal_id, update in item.get("goals", {}).items():
+                goal = by_id.get(goal_id)
+                if goal is None:
+                    continue
+                for key, value in update.get("increments", {}).items():
+                    goal[key] = goal.get(key, 0) + value
+                goal.update(update.get("fields", {}))
+        return goals
+
+    def commit(self, increments: dict, fields: dict, entry: dict,
+               goals: Optional[dict] = None, alerts: Optional[List[dict]] = None) -> asyncio.Future:
+        """
+        Buffer a ledger entry, optionally with goal updates and alerts to
+        write alongside it. Await the returned future (after the turn ends,
+        so others can join the same flush) to know it was committed.
+        """
+        item = {
+            "user_id": self._user_id,
+            "increments": increments,
+            "fields": fields,
+            "entry": entry,
+        }
+        if goals:
+            item["goals"] = goals
+        if alerts:
+            item["alerts"] = alerts
+        return self._actors._buffer(self._user_id, self._actor, item)
+
+    async def drain(self):
+        """
+        Write the buffered entries now and wait for them, e.g. before
+        changing documents outside the ledger that they may update.
+        """
+        self._actors._flush(self._user_id, self._actor)
+        if self._actor.flushes:
+            await asyncio.gather(*self._actor.flushes, return_exceptions=True)
+
+
+class LedgerActors:
+    """
+    One actor per active user_id. Turns for the same user run one at a time
+    in arrival order; different users never wait for each other. Entries
+    committed during a turn are buffered while more turns for the user are
+    queued, and flushed with a single commit call once the queue drains,
+    `window` seconds pass or `max_pending` accumulate. A lone request is
+    written immediately; a burst shares one user document write.
+
+    Flushes only start between turns, and a turn starts only after the
+    user's in-flight flushes land, so reads made during a turn see every
+    earlier write exactly once: from storage or from the buffer.
+    Everything runs on the event loop; only `commit` leaves it.
+    """
+
+    def __init__(self, commit: Callable[[List[dict]], Awaitable], window: float = 0.025, max_pending: int = 100):
+        self._commit = commit
+        self.window = window
+        self.max_pending = max_pending
+        self._actors: Dict[str, UserActor] = {}
+        self.flushes = 0
+        self.entries = 0
+
+    @asynccontextmanager
+    async def turn(self, user_id: str):
+        actor = self._actors.get(user_id)
+        if actor is None:
+            actor = self._actors[user_id] = UserActor()
+        actor.turns += 1
+        try:
+            async with actor.lock:
+                if actor.flushes:
+                    await asyncio.gather(*actor.flushes, return_exceptions=True)
+                yield Turn(self, user_id, actor)
+        finally:
+            actor.turns -= 1
+            # Flush when nobody is left to coalesce with, or the buffer is due
+            if (not actor.turns or actor.flush_due or self.window <= 0
+                    or len(actor.pending) >= self.max_pending):
+                self._flush(user_id, actor)
+            self._retire(user_id, actor)
+
+    @asynccontextmanager
+    async def exclusive(self, user_ids: Iterable[str]):
+        """
+        Hold several users' turns at once, with their buffered entries
+        written, so a batch job can read and write for them directly.
+        Turns are taken in user_id order.
+        """
+        async with AsyncExitStack() as stack:
+            for user_id in sorted(set(user_ids)):
+                turn = await stack.enter_async_context(self.turn(user_id))
+                await turn.drain()
+            yield
+
+    def _buffer(self, user_id: str, actor: UserActor, item: dict) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        actor.pending.append((item, future))
+        if actor.timer is None and self.window > 0:
+            actor.timer = asyncio.get_running_loop().call_later(self.window, self._window_elapsed, user_id, actor)
+        return future
+
+    def _window_elapsed(self, user_id: str, actor: UserActor):
+        actor.timer = None
+        if actor.lock.locked():
+            actor.flush_due = True  # The running turn flushes when it ends
+        else:
+            self._flush(user_id, actor)
+
+    def _flush(self, user_id: str, actor: UserActor):
+        if actor.timer is not None:
+            actor.timer.cancel()
+            actor.timer = None
+        actor.flush_due = False
+        if not actor.pending:
+            return
+        batch, actor.pending = actor.pending, []
+        task = asyncio.get_running_loop().create_task(self._write(user_id, actor, batch))
+        actor.flushes.add(task)
+
+    async def _write(self, user_id: str, actor: UserActor, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            await self._commit([item for item, _ in batch])
+            self.flushes += 1
+            self.entries += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            actor.flushes.discard(asyncio.current_task())
+            self._retire(user_id, actor)
+
+    def _retire(self, user_id: str, actor: UserActor):
+        if not actor.turns and not actor.pending and not actor.flushes and self._actors.get(user_id) is actor:
+            del self._actors[user_id]
+
+    async def flush_all(self):
+        """Write every buffered entry now and wait for it (used on shutdown)"""
+        for user_id, actor in list(self._actors.items()):
+            self._flush(user_id, actor)
+        tasks = [task for actor in self._actors.values() for task in actor.flushes]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "active_users": len(self._actors),
+            "buffered_entries": sum(len(actor.pending) for actor in self._actors.values()),
+            "flushes": self.flushes,
+            "entries_flushed": self.entries,
+            "entries_per_flush": round(self.entries / self.flushes, 2) if self.flushes else 0.0,
+        }
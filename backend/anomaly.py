@@ -0,0 +1,91 @@
+"""
+Spending Anomaly Detector - RupeeReady AI
+Per-user, per-category running statistics of approved expenses, kept in the
+user profile as three floats per category and updated online (Welford), so
+Kavach can tell a usual expense from an outlier in constant time.
+
+Statistics are kept on log(amount): spending is right-skewed, and a ratio
+("6x your usual") is what matters more than an absolute difference.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+STATS_FIELD = "spending_stats"  # profile field: {category: [count, mean, m2]}
+MIN_LOG_STD = 0.05
+
+
+@dataclass(frozen=True)
+class Assessment:
+    """How an expense compares with the user's history in its category"""
+    status: str              # "typical", "unusual", "anomalous" or "unknown"
+    z_score: Optional[float]
+    samples: int
+    typical_amount: Optional[float]  # geometric mean of past expenses
+
+    def describe(self, category: str, amount: float) -> str:
+        if self.typical_amount is None:
+            return f"No spending history for {category} yet"
+        ratio = amount / self.typical_amount
+        return (f"₹{amount} is {ratio:.1f}x the user's typical ₹{self.typical_amount:.0f} on {category} "
+                f"(z = {self.z_score:+.1f} over {self.samples} past expenses)")
+
+
+def welford_update(stats: Optional[List[float]], value: float) -> List[float]:
+    """Fold one observation into [count, mean, m2]"""
+    count, mean, m2 = stats or (0, 0.0, 0.0)
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return [count, mean, m2]
+
+
+class AnomalyDetector:
+    """
+    Classifies an expense by its z-score against the category's history:
+    z <= typical_z is "typical" (Kavach may skip Gemini; spending well below
+    the usual amount is the safest case, so it is typical too), z >= anomaly_z
+    is "anomalous" (Gemini gets the context), anything else "unusual".
+    Fewer than min_samples past expenses gives "unknown".
+    """
+
+    def __init__(self, anomaly_z: float = 3.0, typical_z: float = 1.5,
+                 min_samples: int = 5, max_categories: int = 50):
+        self.anomaly_z = anomaly_z
+        self.typical_z = typical_z
+        self.min_samples = max(2, min_samples)  # a spread needs two samples
+        self.max_categories = max_categories
+
+    @staticmethod
+    def _key(category: str) -> str:
+        return category.strip().lower()
+
+    def assess(self, profile: dict, category: str, amount: float) -> Assessment:
+        stats = profile.get(STATS_FIELD, {}).get(self._key(category))
+        if not stats or stats[0] < self.min_samples:
+            return Assessment("unknown", None, int(stats[0]) if stats else 0, None)
+
+        count, mean, m2 = stats
+        # Floor the spread so a run of identical amounts does not make every
+        # small deviation look extreme (0.05 in log space is about 5%)
+        std = max(math.sqrt(m2 / (count - 1)), MIN_LOG_STD)
+        z = (math.log(amount) - mean) / std
+
+        if z <= self.typical_z:
+            status = "typical"
+        elif z >= self.anomaly_z:
+            status = "anomalous"
+        else:
+            status = "unusual"
+        return Assessment(status, round(z, 2), int(count), round(math.exp(mean), 2))
+
+    def updated_stats(self, profile: dict, category: str, amount: float) -> Dict[str, List[float]]:
+        """The profile's stats field after recording an approved expense"""
+        all_stats = dict(profile.get(STATS_FIELD, {}))
+        key = self._key(category)
+        if key not in all_stats and len(all_stats) >= self.max_categories:
+            return all_stats
+        all_stats[key] = welford_update(all_stats.get(key), math.log(amount))
+        return all_stats
@@ -0,0 +1,289 @@
+"""
+Ledger Audit - RupeeReady AI
+Replays every user's balances from the transaction log and reports the users
+whose stored profile disagrees. The log is loaded into compact typed columns
+with amounts in integer paise, and balances are replayed for all users at once
+with NumPy, so millions of transactions take seconds and float drift in the
+stored running totals shows up exactly.
+
+Usage:
+    python audit.py check                         # report mismatched users
+    python audit.py check --user u123 --show 50
+    python audit.py repair                        # check, then correct stored balances
+"""
+
+import argparse
+import json
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Profile fields the log determines, in replay order
+BALANCE_FIELDS = ("safe_balance", "tax_vault", "total_income", "total_expenses", "pending_income", "goal_savings")
+
+# Log entry kinds (column "kind")
+INCOME, PENDING_INCOME, EXPENSE, SETTLEMENT = 0, 1, 2, 3
+
+# Profile fields whose timestamps mark a user as written to after the audit began
+ACTIVITY_FIELDS = ("last_income_date", "last_expense_date", "last_settled_at")
+
+
+def to_paise(rupees) -> int:
+    return int(round(float(rupees or 0) * 100))
+
+# ============================================================================
+# COLUMNAR LOG
+# ============================================================================
+
+class LedgerColumns:
+    """
+    The transaction log as parallel typed arrays (37 bytes per entry):
+    user index, entry kind, amount and its tax / safe / goal split in paise.
+    """
+
+    def __init__(self):
+        self.user_ids: List[str] = []
+        self._user_index: Dict[str, int] = {}
+        self.user = array("i")
+        self.kind = array("b")
+        self.amount = array("q")
+        self.tax = array("q")
+        self.safe = array("q")
+        self.goal = array("q")
+        self.skipped = 0   # entries that do not move balances (blocked expenses, unknown types)
+        self.unsplit = 0   # incomes logged without a tax/safe split (e.g. written by the frontend)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column)
+                   for column in (self.user, self.kind, self.amount, self.tax, self.safe, self.goal))
+
+    def append(self, entry: dict):
+        entry_type = entry.get("type")
+        if entry_type == "income":
+            kind = PENDING_INCOME if entry.get("status") == "pending" else INCOME
+        elif entry_type == "expense" and entry.get("status", "approved") == "approved":
+            kind = EXPENSE
+        elif entry_type == "settlement":
+            kind = SETTLEMENT
+        else:
+            self.skipped += 1
+            return
+
+        user_id = entry["user_id"]
+        index = self._user_index.get(user_id)
+        if index is None:
+            index = self._user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+
+        amount = to_paise(entry.get("amount"))
+        tax = to_paise(entry.get("tax_allocated"))
+        goal = to_paise(entry.get("goal_allocated"))
+        if "safe_allocated" in entry:
+            safe = to_paise(entry["safe_allocated"])
+        else:
+            safe = amount - tax - goal
+            if kind == INCOME:
+                self.unsplit += 1
+
+        self.user.append(index)
+        self.kind.append(kind)
+        self.amount.append(amount)
+        self.tax.append(tax)
+        self.safe.append(safe)
+        self.goal.append(goal)
+
+    @classmethod
+    def load(cls, storage, user_id: Optional[str] = None, chunk_size: int = 5000) -> "LedgerColumns":
+        columns = cls()
+        for chunk in storage.scan_transactions(user_id=user_id, chunk_size=chunk_size):
+            for entry in chunk:
+                columns.append(entry)
+        return columns
+
+    def replay(self) -> np.ndarray:
+        """Expected balances in paise, shaped (len(BALANCE_FIELDS), users)"""
+        users = np.frombuffer(self.user, dtype=np.intc) if len(self) else np.empty(0, dtype=np.intc)
+        kind = np.frombuffer(self.kind, dtype=np.int8) if len(self) else np.empty(0, dtype=np.int8)
+
+        def column(values):
+            return np.frombuffer(values, dtype=np.int64) if len(self) else np.empty(0, dtype=np.int64)
+
+        amount, tax, safe, goal = column(self.amount), column(self.tax), column(self.safe), column(self.goal)
+        zero = np.zeros_like(amount)
+        income, pending = kind == INCOME, kind == PENDING_INCOME
+        expense, settlement = kind == EXPENSE, kind == SETTLEMENT
+        split = income | settlement
+
+        # Each row is what every entry adds to one balance field
+        deltas = np.stack([
+            np.where(split, safe, zero) - np.where(expense, amount, zero),  # safe_balance
+            np.where(split, tax, zero),                                      # tax_vault
+            np.where(income | pending, amount, zero),                        # total_income
+            np.where(expense, amount, zero),                                 # total_expenses
+            np.where(pending, amount, zero) - np.where(settlement, amount, zero),  # pending_income
+            np.where(split, goal, zero),                                     # goal_savings
+        ])
+
+        # Exact int64 sums per user: sort entries by user, reduce each run
+        expected = np.zeros((len(BALANCE_FIELDS), len(self.user_ids)), dtype=np.int64)
+        if len(self):
+            order = np.argsort(users, kind="stable")
+            sorted_users = users[order]
+            starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]])
+            expected[:, sorted_users[starts]] = np.add.reduceat(deltas[:, order], starts, axis=1)
+        return expected
+
+# ============================================================================
+# AUDIT AND REPAIR
+# ============================================================================
+
+def stored_balances(storage, user_ids: List[str], chunk_size: int = 500) -> Tuple[np.ndarray, Dict[str, dict]]:
+    """Stored balances in paise (same shape as replay()) and the profiles read"""
+    stored = np.zeros((len(BALANCE_FIELDS), len(user_ids)), dtype=np.int64)
+    profiles = {}
+    for start in range(0, len(user_ids), chunk_size):
+        profiles.update(storage.get_users(user_ids[start:start + chunk_size]))
+    for index, user_id in enumerate(user_ids):
+        profile = profiles.get(user_id, {})
+        stored[:, index] = [to_paise(profile.get(field)) for field in BALANCE_FIELDS]
+    return stored, profiles
+
+
+def audit_ledger(storage, user_id: Optional[str] = None, tolerance_paise: int = 1,
+                 chunk_size: int = 5000) -> dict:
+    """Replay the log and compare it with stored profiles"""
+    started_at = datetime.now().isoformat()
+    start = time.perf_counter()
+    columns = LedgerColumns.load(storage, user_id=user_id, chunk_size=chunk_size)
+    loaded = time.perf_counter()
+    expected = columns.replay()
+    replayed = time.perf_counter()
+    stored, profiles = stored_balances(storage, columns.user_ids)
+    compared = time.perf_counter()
+
+    differences = expected - stored
+    mismatched = np.flatnonzero((np.abs(differences) >= tolerance_paise).any(axis=0))
+    mismatches = []
+    for index in mismatched:
+        fields = {
+            field: {
+                "stored": stored[row, index] / 100,
+                "expected": expected[row, index] / 100,
+                "difference": differences[row, index] / 100,
+            }
+            for row, field in enumerate(BALANCE_FIELDS)
+            if abs(differences[row, index]) >= tolerance_paise
+        }
+        mismatches.append({"user_id": columns.user_ids[index], "fields": fields})
+
+    return {
+        "started_at": started_at,
+        "transactions": len(columns),
+        "entries_skipped": columns.skipped,
+        "incomes_without_split": columns.unsplit,
+        "users": len(columns.user_ids),
+        "users_without_profile": len(columns.user_ids) - len(profiles),
+        "column_bytes": columns.nbytes,
+        "mismatched_users": len(mismatches),
+        "mismatches": mismatches,
+        "seconds": {
+            "load": round(loaded - start, 3),
+            "replay": round(replayed - loaded, 3),
+            "compare": round(compared - replayed, 3),
+        },
+        "transactions_per_second": round(len(columns) / (replayed - start), 1) if replayed > start else 0.0,
+        "_profiles": profiles,
+    }
+
+
+def repair_balances(storage, report: dict, chunk_size: int = 500) -> dict:
+    """
+    Move each mismatched user's stored balances onto the replayed values
+    with batched increments. Users written to since the audit started are
+    skipped (their stored balances and the scanned log may disagree only
+    because of that write); audit again to pick them up.
+    """
+    profiles = report["_profiles"]
+    mismatched_ids = [mismatch["user_id"] for mismatch in report["mismatches"]]
+    current = {}
+    for start in range(0, len(mismatched_ids), chunk_size):
+        current.update(storage.get_users(mismatched_ids[start:start + chunk_size]))
+
+    adjustments, skipped = {}, []
+    for mismatch in report["mismatches"]:
+        user_id = mismatch["user_id"]
+        profile = profiles.get(user_id)
+        latest = current.get(user_id)
+        if profile is None or latest is None:
+            skipped.append(user_id)
+            continue
+        if any(str(latest.get(field) or "") >= report["started_at"] for field in ACTIVITY_FIELDS):
+            skipped.append(user_id)
+            continue
+        adjustments[user_id] = {
+            field: round(values["expected"] - (profile.get(field) or 0), 6)
+            for field, values in mismatch["fields"].items()
+        }
+
+    items = list(adjustments.items())
+    for start in range(0, len(items), chunk_size):
+        storage.adjust_users(dict(items[start:start + chunk_size]))
+    return {
+        "repaired_users": len(adjustments),
+        "skipped_users": skipped,
+        "batches": (len(items) + chunk_size - 1) // chunk_size,
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Audit RupeeReady balances against the transaction log")
+    parser.add_argument("command", choices=["check", "repair"])
+    parser.add_argument("--user", help="only audit this user")
+    parser.add_argument("--tolerance-paise", type=int, default=1, help="smallest difference reported")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="transactions read per storage call")
+    parser.add_argument("--show", type=int, default=20, help="mismatched users to print")
+    parser.add_argument("--output", help="write the full JSON report to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    storage = create_storage()
+    try:
+        print(f"🔎 Auditing balances in {storage.name} ({'user ' + args.user if args.user else 'all users'})...")
+        report = audit_ledger(storage, user_id=args.user, tolerance_paise=args.tolerance_paise,
+                              chunk_size=args.chunk_size)
+        seconds = report["seconds"]
+        print(f"📒 {report['transactions']} transactions, {report['users']} users "
+              f"({report['column_bytes'] / 1e6:.1f} MB of columns) - load {seconds['load']}s, "
+              f"replay {seconds['replay']}s ({report['transactions_per_second']} txn/s)")
+        if report["incomes_without_split"]:
+            print(f"⚠️ {report['incomes_without_split']} incomes have no tax split logged; replayed as fully safe")
+        print(f"{'✅' if not report['mismatched_users'] else '❌'} {report['mismatched_users']} users disagree with the log")
+        for mismatch in report["mismatches"][:args.show]:
+            details = ", ".join(
+                f"{field} {values['stored']} -> {values['expected']}" for field, values in mismatch["fields"].items()
+            )
+            print(f"   {mismatch['user_id']}: {details}")
+
+        if args.command == "repair" and report["mismatches"]:
+            repair = repair_balances(storage, report)
+            report["repair"] = repair
+            print(f"🛠️ Repaired {repair['repaired_users']} users in {repair['batches']} batches")
+            if repair["skipped_users"]:
+                print(f"⚠️ Skipped {len(repair['skipped_users'])} users written to during the audit; run it again")
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({k: v for k, v in report.items() if not k.startswith("_")}, f, indent=2)
+            print(f"💾 Report written to {args.output}")
+    finally:
+        storage.close()
@@ -0,0 +1,256 @@
+"""
+Benchmark Suite - RupeeReady AI
+Measures what the handlers in main.py cost per request, independent of the
+network: the app runs in-process over an ASGI transport against a fake
+Firestore and a fake Gemini model with fixed, deterministic latency and
+responses.
+
+Usage:
+    python benchmark.py                         # run and compare with the baseline
+    python benchmark.py --save-baseline         # record a new baseline
+    python benchmark.py --gemini-latency 0.05 --levels 1 16 64
+
+The exit status is 1 when any scenario regresses beyond --tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+# Every simulated user calls from the same in-process client, so rate limits
+# would measure the limiter rather than the handlers
+os.environ.setdefault("RATE_LIMIT_USER_PER_SECOND", "0")
+os.environ.setdefault("RATE_LIMIT_SOURCE_PER_SECOND", "0")
+
+import main
+from fakes import FakeFirestore, FakeModel
+from storage import FirestoreStorage
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Users are seeded with a large safe balance so expenses reach the policy
+# engine / Gemini instead of stopping at the insufficient-funds check
+BENCH_USERS = 256
+SEED_BALANCE = 1_000_000.0
+
+# Cycled so every run sees the same mix of rule-decided and Gemini-decided expenses
+EXPENSE_CASES = [
+    (450, "food"),           # essential -> rules
+    (1200, "entertainment"), # non-essential, healthy balance -> Gemini
+    (300, "transport"),      # essential -> rules
+    (2500, "gadgets"),       # unknown category -> Gemini
+]
+INCOME_AMOUNTS = [5000, 12000, 18500, 25000, 42000]
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+def income_request(i):
+    return "POST", "/webhook/income", {
+        "user_id": f"bench_user_{i % BENCH_USERS}",
+        "amount": INCOME_AMOUNTS[i % len(INCOME_AMOUNTS)],
+        "source": "Swiggy Payout",
+    }
+
+
+def expense_request(i):
+    amount, category = EXPENSE_CASES[i % len(EXPENSE_CASES)]
+    return "POST", "/api/check-expense", {
+        "user_id": f"bench_user_{i % BENCH_USERS}",
+        "amount": amount,
+        "category": category,
+    }
+
+
+def balance_request(i):
+    return "GET", f"/api/user/bench_user_{i % BENCH_USERS}/balance", None
+
+
+SCENARIOS = {
+    "income": income_request,
+    "expense": expense_request,
+    "balance": balance_request,
+}
+
+
+def reset_app(storage_latency, gemini_latency):
+    """Fresh fake backends, seeded users and empty caches for every scenario"""
+    main.storage = FirestoreStorage(FakeFirestore(storage_latency))
+    main.model = FakeModel(gemini_latency)
+    main.chanakya_cache.clear()
+    main.profile_cache.clear()
+    main.storage.commit_ledger([
+        {
+            "user_id": f"bench_user_{i}",
+            "increments": {"safe_balance": SEED_BALANCE},
+            "fields": {"created_at": "2025-01-01T00:00:00"},
+            "entry": {
+                "user_id": f"bench_user_{i}",
+                "type": "income",
+                "amount": SEED_BALANCE,
+                "timestamp": "2025-01-01T00:00:00",
+            },
+        }
+        for i in range(BENCH_USERS)
+    ])
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, build_request, concurrency, total_requests, warmup):
+    """Closed-loop run: `concurrency` workers issue requests back to back"""
+    for i in range(warmup):
+        method, path, payload = build_request(i)
+        await client.request(method, path, json=payload)
+
+    latencies = []
+    errors = 0
+    counter = iter(range(warmup, warmup + total_requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, payload = build_request(i)
+            start = time.perf_counter()
+            resp = await client.request(method, path, json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if resp.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "throughput_rps": round(total_requests / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+        },
+    }
+
+
+async def run_benchmarks(args):
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in args.scenarios:
+            for concurrency in args.levels:
+                random.seed(args.seed)
+                reset_app(args.storage_latency, args.gemini_latency)
+                key = f"{name}@c{concurrency}"
+                results[key] = await run_scenario(
+                    client, SCENARIOS[name], concurrency, args.requests, args.warmup
+                )
+                result = results[key]
+                print(f"{key:<16} {result['throughput_rps']:>10.1f} "
+                      f"{result['latency_ms']['p50']:>9.3f} {result['latency_ms']['p95']:>9.3f} "
+                      f"{result['latency_ms']['p99']:>9.3f} {result['errors']:>7}")
+    return results
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return regression messages for scenarios slower than the baseline"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        p50, base_p50 = result["latency_ms"]["p50"], base["latency_ms"]["p50"]
+        if p50 > base_p50 * (1 + tolerance):
+            regressions.append(f"{key}: p50 {p50:.3f} ms vs baseline {base_p50:.3f} ms")
+        rps, base_rps = result["throughput_rps"], base["throughput_rps"]
+        if rps < base_rps * (1 - tolerance):
+            regressions.append(f"{key}: throughput {rps:.1f} req/s vs baseline {base_rps:.1f} req/s")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="In-process benchmark suite for RupeeReady AI")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--storage-latency", type=float, default=0.0, help="seconds per fake Firestore call")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="seconds per fake Gemini call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    print("\n" + "=" * 60)
+    print("⏱️  RupeeReady AI - Benchmark Suite")
+    print("=" * 60)
+    print(f"Fake Firestore latency: {args.storage_latency * 1000:.1f} ms | "
+          f"Fake Gemini latency: {args.gemini_latency * 1000:.1f} ms")
+    print("=" * 60)
+    print(f"{'scenario':<16} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+
+    results = asyncio.run(run_benchmarks(args))
+    report = {
+        "recorded_at": datetime.now().isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "settings": {
+            "requests": args.requests,
+            "storage_latency": args.storage_latency,
+            "gemini_latency": args.gemini_latency,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️  No baseline found; run with --save-baseline to record one.")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("\n⚠️ Baseline was recorded with different settings; comparison may be meaningless.")
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for message in regressions:
+            print(f"   - {message}")
+        sys.exit(1)
+    print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
@@ -0,0 +1,267 @@
+"""
+In-Process Caches - RupeeReady AI
+Bounded LRU cache with per-entry TTL and hit/miss counters, a write-through
+user profile cache built on it, and an idempotency-key response store.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    When full, the least recently used entry is evicted. Expired entries are
+    dropped lazily on lookup.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Insert or replace key, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def replace(self, key: Hashable, value: Any) -> bool:
+        """Swap in a new value for a live entry, keeping its expiry time"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[1] <= time.monotonic():
+                return False
+            self._data[key] = (value, entry[1])
+            return True
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Look up key without touching LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[1] <= time.monotonic():
+                return default
+            return entry[0]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not)"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Counters for monitoring endpoints"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ProfileCache:
+    """
+    Write-through cache of user profiles keyed by user_id.
+
+    Ledger writes apply their increments to the cached copy instead of
+    invalidating it, so a user's balance stays servable from memory. A read
+    that overlaps a write for the same user is not cached, which keeps a
+    stale Firestore read from overwriting a newer write-through.
+
+    Entries remember the newest version (the backend's update time, when it
+    has one) they reflect. A listener snapshot or write-through older than
+    that is ignored, so a late echo of this process's own write cannot roll
+    a balance back, and a write the cached snapshot already includes is not
+    applied twice.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)  # user_id -> (profile, version)
+        self._lock = threading.Lock()
+        self._reads = {}  # user_id -> token of the read currently in flight
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """Return a copy of the cached profile, or None on a miss"""
+        entry = self._cache.get(user_id)
+        return dict(entry[0]) if entry is not None else None
+
+    def peek(self, user_id: str) -> Optional[dict]:
+        """Like get(), without touching LRU order or hit/miss counters"""
+        entry = self._cache.peek(user_id)
+        return dict(entry[0]) if entry is not None else None
+
+    def begin_read(self, user_id: str) -> object:
+        """Register a backing-store read; pass the token to finish_read"""
+        token = object()
+        with self._lock:
+            self._reads[user_id] = token
+        return token
+
+    def finish_read(self, user_id: str, token: object, profile: dict):
+        """Cache a freshly read profile unless a write raced with the read"""
+        with self._lock:
+            if self._reads.get(user_id) is token:
+                del self._reads[user_id]
+                self._cache.set(user_id, (dict(profile), None))
+
+    def apply(self, user_id: str, increments: Optional[dict] = None, fields: Optional[dict] = None,
+              version: Any = None):
+        """Write-through: apply committed increments and field updates"""
+        with self._lock:
+            self._reads.pop(user_id, None)
+            entry = self._cache.peek(user_id)
+            if entry is None:
+                return
+            profile, cached_version = entry
+            if version is not None and cached_version is not None and version <= cached_version:
+                return  # The cached snapshot already includes this write
+            profile = dict(profile)
+            for key, value in (increments or {}).items():
+                profile[key] = profile.get(key, 0) + value
+            profile.update(fields or {})
+            self._cache.replace(user_id, (profile, version if version is not None else cached_version))
+
+    def put(self, user_id: str, profile: dict, version: Any = None) -> bool:
+        """
+        Replace the cached profile with an authoritative copy. Returns False
+        (and keeps the cached one) if the copy is older than the cache.
+        """
+        with self._lock:
+            entry = self._cache.peek(user_id)
+            if version is not None and entry is not None and entry[1] is not None and version <= entry[1]:
+                return False
+            self._reads.pop(user_id, None)
+            self._cache.set(user_id, (dict(profile), version))
+            return True
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._reads.pop(user_id, None)
+            self._cache.pop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._reads.clear()
+            self._cache.clear()
+
+    def __contains__(self, user_id: str) -> bool:
+        return self._cache.peek(user_id) is not None
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused with a different request payload"""
+
+
+class IdempotencyStore:
+    """
+    Bounded, expiring record of responses by idempotency key.
+
+    A completed key replays its stored response in O(1). A duplicate that
+    arrives while the first request is still running waits for it instead
+    of repeating the work; if the first attempt fails, the next one runs.
+    In-flight bookkeeping is not thread-safe: use it from the event loop.
+    """
+
+    def __init__(self, max_size: int = 50000, ttl: float = 86400.0):
+        self._responses = TTLCache(max_size=max_size, ttl=ttl)
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    def lookup(self, key: Hashable, fingerprint: Hashable) -> Optional[Any]:
+        """Return the stored response for key, or None if there is none"""
+        stored = self._responses.get(key)
+        if stored is None:
+            return None
+        if stored[0] != fingerprint:
+            raise IdempotencyConflict("Idempotency key was already used with a different payload")
+        return stored[1]
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def begin(self, key: Hashable) -> bool:
+        """Mark key as in flight; False if another request already holds it"""
+        if key in self._in_flight:
+            return False
+        self._in_flight[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def complete(self, key: Hashable, fingerprint: Hashable, response: Any):
+        """Store the response for key and release its waiters"""
+        self._responses.set(key, (fingerprint, response))
+        self.abort(key)
+
+    def abort(self, key: Hashable):
+        """Release key without storing a response, so a retry runs again"""
+        future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def run(self, key: Hashable, fingerprint: Hashable,
+                  handler: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run handler once per key; returns (response, replayed)"""
+        while True:
+            response = self.lookup(key, fingerprint)
+            if response is not None:
+                return response, True
+            if self.begin(key):
+                break
+            await asyncio.shield(self._in_flight[key])
+        try:
+            response = await handler()
+        except BaseException:
+            self.abort(key)
+            raise
+        self.complete(key, fingerprint, response)
+        return response, False
+
+    def clear(self):
+        self._responses.clear()
+
+    def stats(self) -> dict:
+        return dict(self._responses.stats(), in_flight=len(self._in_flight))
@@ -0,0 +1,188 @@
+"""
+Traffic Capture - RupeeReady AI
+Records the agent API's incoming payloads, their timing and the Gemini
+replies they received to an append-only NDJSON log, so production traffic can
+be replayed against a local instance (python mock_bank.py replay).
+
+Each line is one request:
+    {"ts": 1718000000.123, "path": "/api/check-expense", "content_type": "application/json",
+     "body": {...}, "status": 200, "ms": 41.2,
+     "gemini": [{"agent": "kavach", "ms": 35.0, "text": "APPROVED"}]}
+
+JSON bodies are stored parsed; NDJSON and malformed bodies are stored as text
+and replayed byte for byte with their recorded content type.
+"""
+
+import base64
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+CAPTURED_PATHS = ("/webhook/income", "/webhook/income/batch", "/api/check-expense")
+
+# Carries the recorded Gemini replies of a replayed request (base64 JSON list)
+REPLAY_HEADER = "x-replay-gemini"
+
+_gemini_calls: ContextVar[Optional[list]] = ContextVar("capture_gemini_calls", default=None)
+_replay_replies: ContextVar[Optional[list]] = ContextVar("replay_gemini_replies", default=None)
+
+
+def record_gemini(agent: str, elapsed_ms: float, text: Optional[str] = None, error: Optional[str] = None):
+    """Note a Gemini outcome on the request being captured (no-op otherwise)"""
+    calls = _gemini_calls.get()
+    if calls is None:
+        return
+    call = {"agent": agent, "ms": round(elapsed_ms, 1)}
+    if error:
+        call["error"] = error
+    else:
+        call["text"] = text
+    calls.append(call)
+
+
+def next_replay_reply(agent: str) -> Optional[dict]:
+    """Pop the next recorded Gemini reply for agent in the replayed request"""
+    replies = _replay_replies.get()
+    if not replies:
+        return None
+    for i, reply in enumerate(replies):
+        if reply.get("agent") == agent:
+            return replies.pop(i)
+    return None
+
+
+def encode_replay_header(calls: List[dict]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(calls, separators=(",", ":")).encode()).decode()
+
+
+def decode_replay_header(value: bytes) -> list:
+    try:
+        replies = json.loads(base64.urlsafe_b64decode(value))
+    except ValueError:
+        return []
+    return [reply for reply in replies if isinstance(reply, dict)] if isinstance(replies, list) else []
+
+# ============================================================================
+# RECORDER
+# ============================================================================
+
+class TrafficRecorder:
+    """
+    Appends one compact JSON line per request. Each record is written with a
+    single write() on a file opened in append mode, so several workers can
+    share a log without interleaving lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.records = 0
+        self.bytes = 0
+
+    def write(self, record: dict):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+            self.bytes += len(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def stats(self) -> dict:
+        return {"path": self.path, "records": self.records, "bytes": self.bytes}
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    """Records of a capture log in file order, skipping torn lines"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+class CaptureMiddleware:
+    """
+    ASGI middleware for the captured paths. With a recorder it logs each
+    request's body, status, latency and Gemini outcomes; with accept_replay
+    it hands the replies in the X-Replay-Gemini header to the stub model.
+    """
+
+    def __init__(self, app, recorder: Optional[TrafficRecorder] = None,
+                 accept_replay: bool = False, paths=CAPTURED_PATHS):
+        self.app = app
+        self.recorder = recorder
+        self.accept_replay = accept_replay
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        replay_token = None
+        if self.accept_replay:
+            header = dict(scope["headers"]).get(REPLAY_HEADER.encode())
+            replay_token = _replay_replies.set(decode_replay_header(header) if header else [])
+        if self.recorder is None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _replay_replies.reset(replay_token)
+            return
+
+        calls = []
+        calls_token = _gemini_calls.set(calls)
+        body = []
+        status_code = 500
+        received_at = time.time()
+        start = time.perf_counter()
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                body.append(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _gemini_calls.reset(calls_token)
+            if replay_token is not None:
+                _replay_replies.reset(replay_token)
+            content_type = dict(scope["headers"]).get(b"content-type", b"").decode("latin-1")
+            raw = b"".join(body).decode("utf-8", errors="replace")
+            payload = raw  # Kept verbatim: NDJSON, and malformed requests are worth replaying too
+            if "ndjson" not in content_type:
+                try:
+                    payload = json.loads(raw)
+                except ValueError:
+                    pass
+            self.recorder.write({
+                "ts": round(received_at, 3),
+                "path": scope["path"],
+                "content_type": content_type,
+                "body": payload,
+                "status": status_code,
+                "ms": round(elapsed_ms, 1),
+                "gemini": calls,
+            })
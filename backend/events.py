@@ -0,0 +1,115 @@
+"""
+Balance Events - RupeeReady AI
+In-process fan-out of balance changes to the dashboards streaming them over
+server-sent events, so open dashboards no longer poll the balance endpoint.
+"""
+
+import asyncio
+from typing import Dict, Optional, Set
+
+# Queued in place of a slow subscriber's backlog: it should re-read a snapshot
+RESYNC = {"type": "resync"}
+# Queued (replacing any backlog) when the broker closes: the stream should end
+CLOSED = {"type": "closed"}
+
+
+class Subscription:
+    """One open stream: a bounded queue of events for a single user"""
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+
+class BalanceBroker:
+    """
+    Per-user fan-out of balance events.
+
+    publish() may be called from any thread (ledger commits run on the
+    storage executor); delivery happens on the event loop. Each subscriber
+    has a bounded queue. When a subscriber falls behind, its backlog is
+    dropped and replaced with a single RESYNC marker, so a slow client costs
+    at most one snapshot read instead of unbounded memory.
+
+    close() ends every stream and refuses new ones, so open connections do
+    not hold up a graceful shutdown.
+    """
+
+    def __init__(self, max_queue: int = 32, max_per_user: int = 8):
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.resyncs = 0
+        self.closed = False
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Open a subscription, or None if the user has too many streams or the broker is closed"""
+        if self.closed:
+            return None
+        self._loop = asyncio.get_running_loop()
+        subscribers = self._subscribers.setdefault(user_id, set())
+        if len(subscribers) >= self.max_per_user:
+            return None
+        subscription = Subscription(user_id, self.max_queue)
+        subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: str, event: dict):
+        """Queue an event for every stream of user_id (thread-safe)"""
+        if self._loop is None or user_id not in self._subscribers:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, user_id, event)
+        except RuntimeError:
+            pass  # Event loop already closed (shutdown)
+
+    def _deliver(self, user_id: str, event: dict):
+        self.published += 1
+        for subscription in list(self._subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._replace_backlog(subscription, RESYNC)
+                self.resyncs += 1
+
+    @staticmethod
+    def _replace_backlog(subscription: Subscription, event: dict):
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(event)
+
+    def close(self):
+        """Tell every open stream to end and refuse new ones (thread-safe)"""
+        self.closed = True
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._close_all)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def _close_all(self):
+        for subscribers in list(self._subscribers.values()):
+            for subscription in subscribers:
+                self._replace_backlog(subscription, CLOSED)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "events_published": self.published,
+            "resyncs": self.resyncs,
+        }
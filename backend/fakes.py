@@ -0,0 +1,272 @@
+"""
+Fake Clients - RupeeReady AI
+Blocking in-memory stand-ins for the Firestore client and Gemini model with
+fixed, configurable latency. Used by load_test.py and benchmark.py, and
+(ReplayModel) by the backend when replaying captured traffic.
+"""
+
+import threading
+import time
+import uuid
+
+from firebase_admin import firestore
+from google.api_core.exceptions import NotFound
+
+import capture
+
+# ============================================================================
+# FAKE FIRESTORE (blocking, like the real SDK)
+# ============================================================================
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeWriteResult:
+    def __init__(self):
+        self.update_time = time.time_ns()  # Taken under the store lock, so writes are ordered
+
+
+def apply_write(store, doc_id, data, merge):
+    """Apply a set() to a fake document, resolving firestore.Increment values"""
+    current = store.get(doc_id, {}) if merge else {}
+    store[doc_id] = _merge_values(current, data)
+
+
+def _merge_values(current, data):
+    updated = dict(current)
+    for key, value in data.items():
+        if isinstance(value, firestore.Increment):
+            updated[key] = current.get(key, 0) + value.value
+        elif isinstance(value, dict):
+            updated[key] = _merge_values(current.get(key) or {}, value)
+        else:
+            updated[key] = value
+    return updated
+
+
+class FakeDocument:
+    def __init__(self, store, doc_id, latency, lock):
+        self._store = store
+        self._id = doc_id
+        self.id = doc_id
+        self._latency = latency
+        self._lock = lock
+
+    def get(self):
+        time.sleep(self._latency)
+        return FakeSnapshot(self._id, self._store.get(self._id))
+
+    def set(self, data, merge=False):
+        time.sleep(self._latency)
+        with self._lock:
+            apply_write(self._store, self._id, data, merge)
+            return FakeWriteResult()
+
+    def update(self, updates):
+        return self.set(updates, merge=True)
+
+    def delete(self):
+        time.sleep(self._latency)
+        with self._lock:
+            self._store.pop(self._id, None)
+
+
+class FakeQuery:
+    """Equality and 'in' filters, one ordering and a limit over a fake collection"""
+
+    def __init__(self, collection, filters=(), order=None, count=None, after=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._order = order
+        self._count = count
+        self._after = after
+
+    def _with(self, **changes):
+        query = FakeQuery(self._collection, self._filters, self._order, self._count, self._after)
+        query.__dict__.update({f"_{name}": value for name, value in changes.items()})
+        return query
+
+    def where(self, filter):
+        if filter.op_string == "==":
+            values = (filter.value,)
+        elif filter.op_string == "in":
+            values = tuple(filter.value)
+        else:
+            raise NotImplementedError(f"FakeQuery only supports '==' and 'in' filters, not {filter.op_string!r}")
+        return self._with(filters=self._filters + ((filter.field_path, values),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._with(order=(field_path, direction))
+
+    def limit(self, count):
+        return self._with(count=count)
+
+    def start_after(self, cursor):
+        # A snapshot, or a {field: value} dict for the ordering field
+        if not self._order:
+            raise NotImplementedError("FakeQuery only supports start_after on an ordered query")
+        if isinstance(cursor, dict):
+            return self._with(after=(cursor[self._order[0]],))
+        return self._with(after=self._key(cursor))
+
+    def _key(self, snapshot):
+        # Like Firestore, ties on the ordering field are broken by document id
+        field = self._order[0]
+        if field == "__name__":
+            return (snapshot.id,)
+        return (snapshot.to_dict().get(field), snapshot.id)
+
+    def stream(self):
+        collection = self._collection
+        time.sleep(collection._latency)
+        with collection._lock:
+            matches = [
+                FakeSnapshot(doc_id, dict(data)) for doc_id, data in collection._docs.items()
+                if all(data.get(field) in values for field, values in self._filters)
+            ]
+        if self._order:
+            descending = self._order[1] == "DESCENDING"
+            matches.sort(key=self._key, reverse=descending)
+            if self._after is not None:
+                size = len(self._after)
+                matches = [
+                    snapshot for snapshot in matches
+                    if (self._key(snapshot)[:size] < self._after if descending else self._key(snapshot)[:size] > self._after)
+                ]
+        return iter(matches[:self._count] if self._count is not None else matches)
+
+
+class FakeCollection:
+    def __init__(self, latency, lock):
+        self._docs = {}
+        self._latency = latency
+        self._lock = lock
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._docs, doc_id or uuid.uuid4().hex, self._latency, self._lock)
+
+    def add(self, data):
+        self.document().set(data)
+
+    def where(self, filter):
+        return FakeQuery(self).where(filter)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return FakeQuery(self).order_by(field, direction)
+
+    def stream(self):
+        return FakeQuery(self).stream()
+
+
+class FakeBatch:
+    def __init__(self, latency, lock):
+        self._writes = []
+        self._latency = latency
+        self._lock = lock
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref, data, merge, False))
+
+    def update(self, ref, data):
+        self._writes.append((ref, data, True, True))
+
+    def commit(self):
+        time.sleep(self._latency)
+        with self._lock:
+            # Like Firestore, an update() of a missing document fails the whole batch
+            for ref, _, _, must_exist in self._writes:
+                if must_exist and ref._id not in ref._store:
+                    raise NotFound(f"No document to update: {ref._id}")
+            for ref, data, merge, _ in self._writes:
+                apply_write(ref._store, ref._id, data, merge)
+            result = FakeWriteResult()
+            return [result] * len(self._writes)
+
+
+class FakeFirestore:
+    """Minimal stand-in for firestore.client() with fixed per-call latency"""
+
+    def __init__(self, latency=0.0):
+        self._collections = {}
+        self._latency = latency
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self._latency, self._lock)
+        return self._collections[name]
+
+    def batch(self):
+        return FakeBatch(self._latency, self._lock)
+
+    def get_all(self, refs):
+        time.sleep(self._latency)
+        return [FakeSnapshot(ref._id, ref._store.get(ref._id)) for ref in refs]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+DEFAULT_FAKE_RESPONSES = {
+    "Kavach": "APPROVED",
+    "Chanakya": "20",
+}
+
+
+class FakeModel:
+    """
+    Minimal stand-in for genai.GenerativeModel with fixed latency.
+    The reply is the first entry of `responses` whose key (an agent name)
+    appears in the prompt, so results are deterministic.
+    """
+
+    def __init__(self, latency=0.0, responses=None):
+        self._latency = latency
+        self._responses = responses or DEFAULT_FAKE_RESPONSES
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self._latency)
+        for marker, text in self._responses.items():
+            if marker in prompt:
+                return FakeResponse(text)
+        return FakeResponse("")
+
+
+class ReplayModel:
+    """
+    Gemini stand-in for replaying captured traffic (GEMINI_STUB=replay).
+    Each call answers with the next reply recorded for the same agent on the
+    request being replayed, after its recorded latency; recorded errors and
+    timeouts are reproduced. Requests without recordings get the defaults.
+    """
+
+    def __init__(self, responses=None):
+        self._responses = responses or DEFAULT_FAKE_RESPONSES
+        self.calls = 0
+        self.replayed = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        marker = next((m for m in self._responses if m in prompt), None)
+        reply = capture.next_replay_reply(marker.lower()) if marker else None
+        if reply is None:
+            return FakeResponse(self._responses.get(marker, ""))
+        self.replayed += 1
+        time.sleep(reply.get("ms", 0) / 1000)
+        if reply.get("error") == "error":
+            raise RuntimeError("recorded Gemini error")
+        return FakeResponse(reply.get("text") or "")
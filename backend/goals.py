@@ -0,0 +1,101 @@
+"""
+Savings Goals - RupeeReady AI
+Splits a share of each income's safe allocation across a user's active goals
+and works out the goal updates and milestone alerts that go into the income's
+ledger commit. Goal documents use the frontend's field names (targetAmount,
+currentAmount, color, createdAt).
+"""
+
+from typing import Dict, List, Tuple
+
+GOAL_STATUSES = ("active", "paused", "completed")
+MILESTONES = (25, 50, 75, 100)  # percent of the target
+
+
+def remaining(goal: dict) -> float:
+    return max(0.0, goal.get("targetAmount", 0) - goal.get("currentAmount", 0))
+
+
+def allocate(goals: List[dict], pool: float) -> Dict[str, float]:
+    """
+    Split `pool` across active goals in proportion to their weights, never
+    giving a goal more than it still needs; what a capped goal cannot take
+    is shared among the others. Goals are visited in order of remaining
+    amount per unit of weight, so each one is settled in a single pass.
+    """
+    active = [g for g in goals if g.get("status", "active") == "active" and remaining(g) > 0]
+    active.sort(key=lambda g: remaining(g) / g.get("weight", 1))
+    total_weight = sum(g.get("weight", 1) for g in active)
+    allocations = {}
+    for goal in active:
+        if pool <= 0:
+            break
+        weight = goal.get("weight", 1)
+        amount = min(round(pool * weight / total_weight, 2), remaining(goal))
+        allocations[goal["id"]] = amount
+        pool -= amount
+        total_weight -= weight
+    return {goal_id: amount for goal_id, amount in allocations.items() if amount > 0}
+
+
+def crossed_milestones(goal: dict, amount: float) -> List[int]:
+    """Milestones passed by adding `amount` to the goal"""
+    target = goal.get("targetAmount", 0)
+    if target <= 0:
+        return []
+    before = goal.get("currentAmount", 0) / target * 100
+    after = (goal.get("currentAmount", 0) + amount) / target * 100
+    return [m for m in MILESTONES if before < m <= after + 1e-9]
+
+
+def milestone_alert(goal: dict, milestone: int, now: str) -> dict:
+    if milestone == 100:
+        title = f"🎉 Goal reached: {goal.get('name', 'your goal')}"
+        message = f"You saved the full ₹{goal.get('targetAmount', 0):,.0f}. Lakshmi is proud of you!"
+    else:
+        title = f"🪔 {milestone}% of {goal.get('name', 'your goal')}"
+        message = f"You are {milestone}% of the way to ₹{goal.get('targetAmount', 0):,.0f}. Keep going!"
+    return {
+        "user_id": goal["user_id"],
+        "type": "goal_milestone",
+        "title": title,
+        "message": message,
+        "actionLabel": "View goal",
+        "character": "lakshmi",
+        "goal_id": goal["id"],
+        "milestone": milestone,
+        "dismissed": False,
+        "created_at": now,
+    }
+
+
+def plan_goal_updates(goals: List[dict], pool: float, now: str) -> Tuple[Dict[str, float], Dict[str, dict], List[dict]]:
+    """
+    Allocate `pool` and return (allocations, goal updates, alerts): the
+    updates map goal_id -> {"increments", "fields"} for the ledger commit.
+    """
+    by_id = {goal["id"]: goal for goal in goals}
+    allocations = allocate(goals, pool)
+    updates, alerts = {}, []
+    for goal_id, amount in allocations.items():
+        goal = by_id[goal_id]
+        fields = {"updatedAt": now}
+        milestones = crossed_milestones(goal, amount)
+        if 100 in milestones:
+            fields.update(status="completed", completedAt=now)
+        updates[goal_id] = {"increments": {"currentAmount": amount}, "fields": fields}
+        alerts.extend(milestone_alert(goal, milestone, now) for milestone in milestones)
+    return allocations, updates, alerts
+
+
+def apply_goal_updates(goals: List[dict], updates: Dict[str, dict]) -> List[dict]:
+    """The goals as they will be once plan_goal_updates' updates are written"""
+    goals = [dict(goal) for goal in goals]
+    for goal in goals:
+        update = updates.get(goal["id"])
+        if update is None:
+            continue
+        for key, value in update.get("increments", {}).items():
+            goal[key] = goal.get(key, 0) + value
+        goal.update(update.get("fields", {}))
+    return goals
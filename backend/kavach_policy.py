@@ -0,0 +1,123 @@
+"""
+Kavach Policy Engine - RupeeReady AI
+Deterministic local rules for the Kavach spending shield. Clear-cut expenses
+are decided here in microseconds; only ambiguous ones are sent to Gemini.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_ESSENTIAL_CATEGORIES = (
+    "food", "groceries", "transport", "healthcare", "education", "rent", "utilities",
+)
+DEFAULT_NON_ESSENTIAL_CATEGORIES = (
+    "entertainment", "luxury", "shopping",
+)
+
+
+def _env_categories(name: str, default: tuple) -> frozenset:
+    """Read a comma-separated category list from the environment"""
+    raw = os.getenv(name)
+    if not raw:
+        return frozenset(default)
+    return frozenset(c.strip().lower() for c in raw.split(",") if c.strip())
+
+
+@dataclass(frozen=True)
+class KavachPolicy:
+    """Thresholds and category lists that mirror the Kavach prompt guidelines"""
+    max_expense_ratio: float = 0.5          # BLOCK if expense > 50% of safe balance
+    min_remaining_balance: float = 500.0    # BLOCK if < ₹500 would remain
+    low_balance_threshold: float = 5000.0   # "balance is low" for non-essentials
+    fallback_max_expense_ratio: float = 0.2 # ambiguous cases when Gemini is unavailable
+    essential_categories: frozenset = field(default_factory=lambda: frozenset(DEFAULT_ESSENTIAL_CATEGORIES))
+    non_essential_categories: frozenset = field(default_factory=lambda: frozenset(DEFAULT_NON_ESSENTIAL_CATEGORIES))
+
+    @classmethod
+    def from_env(cls) -> "KavachPolicy":
+        """Build a policy from KAVACH_* environment variables"""
+        return cls(
+            max_expense_ratio=float(os.getenv("KAVACH_MAX_EXPENSE_RATIO", "0.5")),
+            min_remaining_balance=float(os.getenv("KAVACH_MIN_REMAINING_BALANCE", "500")),
+            low_balance_threshold=float(os.getenv("KAVACH_LOW_BALANCE_THRESHOLD", "5000")),
+            fallback_max_expense_ratio=float(os.getenv("KAVACH_FALLBACK_MAX_EXPENSE_RATIO", "0.2")),
+            essential_categories=_env_categories("KAVACH_ESSENTIAL_CATEGORIES", DEFAULT_ESSENTIAL_CATEGORIES),
+            non_essential_categories=_env_categories("KAVACH_NON_ESSENTIAL_CATEGORIES", DEFAULT_NON_ESSENTIAL_CATEGORIES),
+        )
+
+# ============================================================================
+# RULE ENGINE
+# ============================================================================
+
+@dataclass(frozen=True)
+class PolicyDecision:
+    """Outcome of a local rule: status is "APPROVED" or "BLOCKED" """
+    status: str
+    rule: str
+    message: str
+
+
+class KavachRuleEngine:
+    """
+    Compiled form of a KavachPolicy.
+
+    Thresholds are copied into plain attributes at construction time so that
+    decide() is a handful of float comparisons and one set lookup.
+    """
+
+    def __init__(self, policy: KavachPolicy):
+        self.policy = policy
+        self._max_ratio = policy.max_expense_ratio
+        self._min_remaining = policy.min_remaining_balance
+        self._low_balance = policy.low_balance_threshold
+        self._essential = policy.essential_categories
+        self._non_essential = policy.non_essential_categories
+        self._fallback_ratio = policy.fallback_max_expense_ratio
+
+    def decide(self, safe_balance: float, amount: float, category: str) -> Optional[PolicyDecision]:
+        """Return a decision for clear-cut cases, or None if Gemini should decide"""
+        remaining = safe_balance - amount
+        category = category.strip().lower()
+
+        if amount > safe_balance * self._max_ratio:
+            return PolicyDecision(
+                "BLOCKED", "max_expense_ratio",
+                f"🛡️ Expense blocked: ₹{amount} is more than {self._max_ratio:.0%} of your safe balance.",
+            )
+        if remaining < self._min_remaining:
+            return PolicyDecision(
+                "BLOCKED", "min_remaining_balance",
+                f"🛡️ Expense blocked: only ₹{remaining} would remain (minimum ₹{self._min_remaining:.0f}).",
+            )
+        if category in self._non_essential and safe_balance < self._low_balance:
+            return PolicyDecision(
+                "BLOCKED", "non_essential_low_balance",
+                f"🛡️ Expense blocked: '{category}' is non-essential and your safe balance is low.",
+            )
+        if category in self._essential:
+            return PolicyDecision(
+                "APPROVED", "essential_category",
+                f"✅ Expense approved! ₹{amount} deducted from your safe balance.",
+            )
+        return None
+
+    def fallback(self, safe_balance: float, amount: float, category: str) -> PolicyDecision:
+        """
+        Conservative decision for cases decide() leaves to Gemini, used when
+        Gemini is unavailable: approve only small expenses relative to the balance.
+        """
+        if amount <= safe_balance * self._fallback_ratio:
+            return PolicyDecision(
+                "APPROVED", "fallback_expense_ratio",
+                f"✅ Expense approved! ₹{amount} deducted from your safe balance.",
+            )
+        return PolicyDecision(
+            "BLOCKED", "fallback_expense_ratio",
+            f"🛡️ Expense blocked: '{category.strip().lower()}' needs a closer look and ₹{amount} is "
+            f"more than {self._fallback_ratio:.0%} of your safe balance.",
+        )
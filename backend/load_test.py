@@ -0,0 +1,113 @@
+"""
+Load Test - RupeeReady AI
+Runs the agent endpoints in-process against slow fake Firestore/Gemini clients
+and reports how throughput scales with the number of concurrent users.
+
+Usage:
+    python load_test.py
+    python load_test.py --levels 1 8 32 --requests 64 --gemini-latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+# Every simulated user calls from the same in-process client, so rate limits
+# would measure the limiter rather than the handlers
+os.environ.setdefault("RATE_LIMIT_USER_PER_SECOND", "0")
+os.environ.setdefault("RATE_LIMIT_SOURCE_PER_SECOND", "0")
+
+import main
+from fakes import FakeFirestore, FakeModel
+from storage import FirestoreStorage, MemoryStorage, SQLiteStorage
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+def make_request(user_index):
+    """Build a random income or expense request for a simulated user"""
+    user_id = f"load_user_{user_index}"
+    if random.random() < 0.6:
+        return "/webhook/income", {"user_id": user_id, "amount": random.randint(5000, 50000)}
+    return "/api/check-expense", {
+        "user_id": user_id,
+        "amount": random.randint(100, 2000),
+        "category": random.choice(["food", "transport", "entertainment"]),
+    }
+
+
+async def run_level(client, concurrency, total_requests):
+    """Fire total_requests requests with at most `concurrency` in flight"""
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(make_request(i % concurrency))
+
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                path, payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            resp = await client.post(path, json=payload)
+            if resp.status_code != 200:
+                errors += 1
+
+    # Measure health check latency while the agents are busy
+    async def probe():
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await client.get("/")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(probe(), *(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return total_requests / elapsed, results[0], errors
+
+
+async def run_load_test(levels, total_requests):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        print(f"{'users':>6} {'req/s':>10} {'health (ms)':>12} {'errors':>7}")
+        for concurrency in levels:
+            throughput, health_latency, errors = await run_level(client, concurrency, total_requests)
+            print(f"{concurrency:>6} {throughput:>10.1f} {health_latency * 1000:>12.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process load test for RupeeReady AI")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--firestore-latency", type=float, default=0.02)
+    parser.add_argument("--gemini-latency", type=float, default=0.3)
+    parser.add_argument("--storage", choices=["fake-firestore", "memory", "sqlite"], default="fake-firestore",
+                        help="fake-firestore adds --firestore-latency per call; memory/sqlite use the real backends")
+    parser.add_argument("--sqlite-path", default="load_test.db")
+    args = parser.parse_args()
+
+    if args.storage == "memory":
+        main.storage = MemoryStorage()
+    elif args.storage == "sqlite":
+        main.storage = SQLiteStorage(args.sqlite_path)
+    else:
+        main.storage = FirestoreStorage(FakeFirestore(args.firestore_latency))
+    main.model = FakeModel(args.gemini_latency)
+
+    print("\n" + "=" * 60)
+    print("📈 RupeeReady AI - Load Test")
+    print("=" * 60)
+    print(f"Storage backend:   {args.storage}")
+    print(f"Firestore latency: {args.firestore_latency * 1000:.0f} ms per call")
+    print(f"Gemini latency:    {args.gemini_latency * 1000:.0f} ms per call")
+    print(f"Requests per level: {args.requests}")
+    print("=" * 60 + "\n")
+
+    asyncio.run(run_load_test(args.levels, args.requests))
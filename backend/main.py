@@ -3,18 +3,42 @@ RupeeReady AI - Agentic Financial System for Gig Workers
 Main FastAPI Application with "Rupee Squad" Agents
 """
 
+import time
+
+_import_started = time.perf_counter()  # Cold-start clock (see /readyz)
+
 import os
-from typing import Optional
-from datetime import datetime
+import json
+import base64
+import math
+import asyncio
+import hashlib
+import contextvars
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta
+from functools import partial
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
 
-import google.generativeai as genai
-import firebase_admin
-from firebase_admin import credentials, firestore
+from actors import LedgerActors
+from anomaly import STATS_FIELD, AnomalyDetector
+from cache import IdempotencyConflict, IdempotencyStore, ProfileCache, TTLCache
+from capture import CaptureMiddleware, TrafficRecorder, record_gemini
+from events import CLOSED, RESYNC, BalanceBroker
+from goals import apply_goal_updates, plan_goal_updates
+from kavach_policy import KavachPolicy, KavachRuleEngine
+from metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, MetricsMiddleware, stage
+from resilience import OPEN, CircuitBreaker, FairQueue, Overloaded, RateLimiter
+from rollups import current_period_key, empty_rollup, rollup_keys
+from settlement import PENDING_FLAG, run_settlement
+from storage import InvalidCursor, create_storage, merge_ledger_entries
 
 # ============================================================================
 # INITIALIZATION & CONFIGURATION
@@ -23,11 +47,25 @@ from firebase_admin import credentials, firestore
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up storage and Gemini in the background; clean up on shutdown"""
+    warm_up_task = asyncio.create_task(warm_up())
+    scheduler_task = asyncio.create_task(settlement_scheduler()) if SETTLEMENT_TIME else None
+    yield
+    balance_broker.close()  # Usually already closed when shutdown began (see __main__)
+    if scheduler_task:
+        scheduler_task.cancel()
+    await asyncio.gather(warm_up_task, return_exceptions=True)
+    await ledger_actors.flush_all()
+    shutdown()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="RupeeReady AI",
     description="Self-Driving Wallet for Gig Workers",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration (Allow Frontend to communicate)
@@ -39,58 +77,234 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Firebase Admin SDK
-try:
-    # Check if Firebase is already initialized
-    if not firebase_admin._apps:
-        # Option 1: Use GOOGLE_APPLICATION_CREDENTIALS environment variable
-        google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+# Request latency metrics (and optional per-request Server-Timing headers)
+SERVER_TIMING_HEADERS = os.getenv("SERVER_TIMING_HEADERS", "false").lower() == "true"
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING_HEADERS)
+
+# Traffic capture and replay (see capture.py and `python mock_bank.py replay`).
+# TRAFFIC_CAPTURE_FILE appends agent requests and their Gemini replies to a log;
+# GEMINI_STUB=replay answers Gemini calls with the replies a replayed request carries.
+TRAFFIC_CAPTURE_FILE = os.getenv("TRAFFIC_CAPTURE_FILE", "")
+GEMINI_STUB = os.getenv("GEMINI_STUB", "").lower()
+traffic_recorder = TrafficRecorder(TRAFFIC_CAPTURE_FILE) if TRAFFIC_CAPTURE_FILE else None
+if traffic_recorder or GEMINI_STUB == "replay":
+    app.add_middleware(CaptureMiddleware, recorder=traffic_recorder, accept_replay=GEMINI_STUB == "replay")
+
+# Storage (STORAGE_BACKEND: firestore, memory or sqlite) and Gemini clients.
+# Both are created by warm_up() after the server starts listening, so the heavy
+# SDK imports and credential lookups stay off the import path. Until then
+# /readyz reports 503 and requests that need storage get a 503.
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+storage = None
+model = None
+startup_state = {
+    "storage": "starting",  # starting, ready or failed
+    "gemini": "starting",
+    "timings_ms": {}
+}
+
+# Bounded I/O executors
+# The storage backends and the Gemini SDK are blocking, so their calls run on
+# dedicated thread pools instead of the event loop. Separate pools keep a burst
+# of slow Gemini calls from starving storage reads (and vice versa).
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "32"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+storage_executor = ThreadPoolExecutor(
+    max_workers=STORAGE_MAX_CONCURRENCY, thread_name_prefix="storage"
+)
+gemini_executor = ThreadPoolExecutor(
+    max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini"
+)
+
+# Monte Carlo projections are CPU-bound; a small pool keeps them from
+# crowding out request handling
+SIMULATION_MAX_CONCURRENCY = int(os.getenv("SIMULATION_MAX_CONCURRENCY", "2"))
+SIMULATION_MAX_PATHS = int(os.getenv("SIMULATION_MAX_PATHS", "50000"))
+SIMULATION_HISTORY_LIMIT = int(os.getenv("SIMULATION_HISTORY_LIMIT", "1000"))
+
+simulation_executor = ThreadPoolExecutor(
+    max_workers=SIMULATION_MAX_CONCURRENCY, thread_name_prefix="simulation"
+)
+
+# Write-through user profile cache (serves balance reads from memory)
+profile_cache = ProfileCache(
+    max_size=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "60")),
+)
+# PROFILE_CACHE_LISTENER watches the profiles of users with an open balance
+# stream (Firestore only), so writes from other processes reach their cached
+# profile and streams; other cached profiles catch up within the TTL.
+PROFILE_CACHE_LISTENER = os.getenv("PROFILE_CACHE_LISTENER", "false").lower() == "true"
+profile_watches = {}  # user_id -> storage listener (None while it attaches)
+
+# Live balance streams (SSE): in-process fan-out per user
+balance_broker = BalanceBroker(
+    max_queue=int(os.getenv("SSE_QUEUE_SIZE", "32")),
+    max_per_user=int(os.getenv("SSE_MAX_STREAMS_PER_USER", "8")),
+)
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# Per-user ledger actors: income and expense mutations for one user run in
+# order, other users proceed in parallel, and a user's writes landing within
+# LEDGER_COALESCE_WINDOW_MS are committed together (0 disables coalescing)
+LEDGER_COALESCE_WINDOW = float(os.getenv("LEDGER_COALESCE_WINDOW_MS", "25")) / 1000
+LEDGER_COALESCE_MAX_ENTRIES = int(os.getenv("LEDGER_COALESCE_MAX_ENTRIES", "100"))
+
+# Responses by idempotency key, so retried webhooks and expense checks are
+# replayed instead of re-running Gemini and the ledger write. Process-local:
+# with several workers, a retry is only deduplicated by the worker that saw it.
+idempotency_store = IdempotencyStore(
+    max_size=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "50000")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+)
+
+# Agent metrics (exposed on /metrics)
+GEMINI_CALLS = REGISTRY.counter(
+    "rupeeready_gemini_calls_total", "Gemini calls by agent and outcome", ("agent", "outcome")
+)
+GEMINI_TOKENS = REGISTRY.counter(
+    "rupeeready_gemini_tokens_total", "Gemini tokens used by agent", ("agent", "kind")
+)
+AGENT_FALLBACKS = REGISTRY.counter(
+    "rupeeready_fallbacks_total", "Agent decisions that fell back to a default", ("agent", "reason")
+)
+AGENT_DECISIONS = REGISTRY.counter(
+    "rupeeready_decisions_total", "Agent decisions by decision path", ("agent", "path", "status")
+)
+CACHE_ENTRIES = REGISTRY.gauge("rupeeready_cache_entries", "Entries held by each in-process cache", ("cache",))
+CACHE_HITS = REGISTRY.gauge("rupeeready_cache_hits", "Cache hits since startup", ("cache",))
+CACHE_MISSES = REGISTRY.gauge("rupeeready_cache_misses", "Cache misses since startup", ("cache",))
+BALANCE_STREAMS = REGISTRY.gauge("rupeeready_balance_streams", "Open balance event streams")
+BALANCE_RESYNCS = REGISTRY.gauge(
+    "rupeeready_balance_stream_resyncs", "Times a slow balance stream had its backlog replaced by a snapshot"
+)
+STARTUP_SECONDS = REGISTRY.gauge(
+    "rupeeready_startup_seconds", "Cold-start phase durations (import, storage, gemini, ready)", ("phase",)
+)
+GEMINI_CIRCUIT_STATE = REGISTRY.gauge(
+    "rupeeready_gemini_circuit_state", "Gemini circuit breaker state (0 closed, 1 half-open, 2 open)"
+)
+REQUESTS_SHED = REGISTRY.counter(
+    "rupeeready_requests_shed_total", "Requests answered 429 by admission control", ("reason",)
+)
+GEMINI_QUEUE_DEPTH = REGISTRY.gauge(
+    "rupeeready_gemini_queue_depth", "Gemini calls in flight and waiting for a slot", ("state",)
+)
+
+# Firestore allows at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
+INCOME_BATCH_MAX_ITEMS = int(os.getenv("INCOME_BATCH_MAX_ITEMS", "10000"))
+INCOME_BATCH_CONCURRENCY = int(os.getenv("INCOME_BATCH_CONCURRENCY", "16"))  # Chanakya decisions in flight
+
+# Transaction history pages; NDJSON exports read the store this many rows at a time
+TRANSACTIONS_MAX_PAGE_SIZE = 500
+TRANSACTIONS_EXPORT_CHUNK = int(os.getenv("TRANSACTIONS_EXPORT_CHUNK", "500"))
+
+# Income settlement: "immediate" splits each income as it arrives; "deferred"
+# only credits it to pending_income, and the settlement job (settlement.py,
+# POST /api/settlement/run, or daily at SETTLEMENT_TIME) splits it in bulk
+INCOME_SETTLEMENT_MODE = os.getenv("INCOME_SETTLEMENT_MODE", "immediate").lower()
+SETTLEMENT_TIME = os.getenv("SETTLEMENT_TIME", "")  # "HH:MM" local time; empty = not scheduled in-process
+SETTLEMENT_CHUNK_SIZE = int(os.getenv("SETTLEMENT_CHUNK_SIZE", "200"))
+SETTLEMENT_CONCURRENCY = int(os.getenv("SETTLEMENT_CONCURRENCY", "16"))
+settlement_lock = asyncio.Lock()
+
+# Savings goals: share of each income's safe allocation set aside for active
+# goals (a profile's goal_allocation_percentage overrides it)
+GOALS_ALLOCATION_PERCENTAGE = float(os.getenv("GOALS_ALLOCATION_PERCENTAGE", "10"))
+GOALS_MAX_PER_USER = int(os.getenv("GOALS_MAX_PER_USER", "50"))
+ALERTS_MAX_PAGE_SIZE = 100
+
+# Gemini latency budgets and circuit breaker
+# A call that exceeds its agent's budget, fails, or finds the circuit open is
+# answered immediately with a deterministic fallback instead of an HTTP 500.
+CHANAKYA_LATENCY_BUDGET = float(os.getenv("CHANAKYA_LATENCY_BUDGET_MS", "2000")) / 1000
+KAVACH_LATENCY_BUDGET = float(os.getenv("KAVACH_LATENCY_BUDGET_MS", "800")) / 1000
+
+gemini_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30")),
+    half_open_max_calls=int(os.getenv("GEMINI_BREAKER_HALF_OPEN_PROBES", "1")),
+)
+
+# Admission control
+# Agent requests are charged to token buckets per user and per source (the
+# X-Source-Id header, else the client address); an empty bucket answers 429
+# with Retry-After. Retries answered by the idempotency store are not charged.
+# Gemini calls then queue for GEMINI_MAX_CONCURRENCY slots in a weighted fair
+# queue (one flow per user, Kavach weighted over Chanakya since a user is
+# waiting at checkout) that sheds when the wait would exceed the agent's
+# latency budget: Chanakya answers 429, Kavach decides with its fallback rule.
+# A rate of 0 disables that limiter.
+RATE_LIMIT_SOURCE_HEADER = os.getenv("RATE_LIMIT_SOURCE_HEADER", "x-source-id").lower()
+user_rate_limiter = RateLimiter(
+    rate=float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "5")),
+    burst=float(os.getenv("RATE_LIMIT_USER_BURST", "20")),
+)
+source_rate_limiter = RateLimiter(
+    rate=float(os.getenv("RATE_LIMIT_SOURCE_PER_SECOND", "200")),
+    burst=float(os.getenv("RATE_LIMIT_SOURCE_BURST", "400")),
+)
+gemini_queue = FairQueue(
+    capacity=GEMINI_MAX_CONCURRENCY,
+    weights={
+        "kavach": float(os.getenv("GEMINI_QUEUE_KAVACH_WEIGHT", "4")),
+        "chanakya": float(os.getenv("GEMINI_QUEUE_CHANAKYA_WEIGHT", "1")),
+    },
+    max_waiting=int(os.getenv("GEMINI_QUEUE_MAX_WAITING", "256")),
+)
+
+# Kavach local policy (clear-cut expenses never reach Gemini)
+kavach_rules = KavachRuleEngine(KavachPolicy.from_env())
+
+# Per-category spending statistics (kept in the profile, updated on approval):
+# expenses typical for the user skip Gemini, outliers reach it with context
+spending_anomalies = AnomalyDetector(
+    anomaly_z=float(os.getenv("KAVACH_ANOMALY_Z", "3.0")),
+    typical_z=float(os.getenv("KAVACH_TYPICAL_Z", "1.5")),
+    min_samples=int(os.getenv("KAVACH_ANOMALY_MIN_SAMPLES", "5")),
+    max_categories=int(os.getenv("KAVACH_ANOMALY_MAX_CATEGORIES", "50")),
+)
+
+# ============================================================================
+# AGENT PROMPTS
+# ============================================================================
+
+CHANAKYA_PROMPT_TEMPLATE = """
+        You are Chanakya, a financial advisor for gig workers in India.
+        
+        User's Financial Profile:
+        - Current Safe Balance: ₹{safe_balance}
+        - Current Tax Vault: ₹{tax_vault}
+        - Total Income (Historical): ₹{total_income}
+        - New Income Received: ₹{amount}
         
-        # Option 2: Use explicit path from FIREBASE_CREDENTIALS_PATH
-        firebase_creds_path = os.getenv("FIREBASE_CREDENTIALS_PATH")
+        Question: What percentage of this new income (₹{amount}) should be saved for tax purposes?
         
-        if google_creds and os.path.exists(google_creds):
-            # GOOGLE_APPLICATION_CREDENTIALS is set and file exists
-            cred = credentials.Certificate(google_creds)
-            firebase_admin.initialize_app(cred)
-            print(f"✅ Firebase initialized with GOOGLE_APPLICATION_CREDENTIALS: {google_creds}")
-        elif firebase_creds_path and os.path.exists(firebase_creds_path):
-            # Use explicit path
-            cred = credentials.Certificate(firebase_creds_path)
-            firebase_admin.initialize_app(cred)
-            print(f"✅ Firebase initialized with path: {firebase_creds_path}")
-        elif os.path.exists("serviceAccountKey.json"):
-            # Check current directory
-            cred = credentials.Certificate("serviceAccountKey.json")
-            firebase_admin.initialize_app(cred)
-            print("✅ Firebase initialized with serviceAccountKey.json in current directory")
-        else:
-            # Initialize with default credentials (for deployed environments)
-            firebase_admin.initialize_app()
-            print("✅ Firebase initialized with default credentials")
-    
-    db = firestore.client()
-except Exception as e:
-    print(f"⚠️ Firebase initialization error: {e}")
-    print("ℹ️  To fix this, either:")
-    print("   1. Set GOOGLE_APPLICATION_CREDENTIALS environment variable to the path of your serviceAccountKey.json")
-    print("   2. Set FIREBASE_CREDENTIALS_PATH in your .env file")
-    print("   3. Place serviceAccountKey.json in the backend directory")
-    db = None
-
-# Initialize Google Gemini AI
-try:
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
-    
-    genai.configure(api_key=gemini_api_key)
-    # Using the latest Gemini 2.5 Flash model
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    print("✅ Gemini AI initialized successfully")
-except Exception as e:
-    print(f"⚠️ Gemini AI initialization error: {e}")
-    model = None
+        Respond with ONLY a number between 10 and 30 (representing percentage).
+        Consider that Indian gig workers typically need to save 15-20% for taxes.
+        Be conservative if this is a large income spike.
+        """
+
+DEFAULT_TAX_PERCENTAGE = 20
+
+# Chanakya decision cache
+# Tax percentages are cached per bucketed income profile. Buckets grow
+# geometrically (each one is CHANAKYA_CACHE_BUCKET_RATIO times wider than the
+# last), so ₹19,000 and ₹20,000 share an answer but ₹2,000 and ₹20,000 do not.
+# The key includes a digest of the prompt template and model name, so changing
+# either one invalidates every cached decision.
+CHANAKYA_CACHE_VERSION = hashlib.sha256(
+    f"{GEMINI_MODEL_NAME}\n{CHANAKYA_PROMPT_TEMPLATE}".encode()
+).hexdigest()[:16]
+CHANAKYA_CACHE_BUCKET_RATIO = float(os.getenv("CHANAKYA_CACHE_BUCKET_RATIO", "1.25"))
+
+chanakya_cache = TTLCache(
+    max_size=int(os.getenv("CHANAKYA_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("CHANAKYA_CACHE_TTL", "3600")),
+)
 
 # ============================================================================
 # PYDANTIC MODELS (Request/Response Schemas)
@@ -101,12 +315,14 @@ class IncomeTransaction(BaseModel):
     amount: float = Field(..., gt=0, description="Income amount received")
     source: Optional[str] = Field("gig_payment", description="Source of income")
     user_id: str = Field(default="default_user", description="User identifier")
+    idempotency_key: Optional[str] = Field(None, max_length=256, description="Client key that makes retries safe")
 
 class ExpenseRequest(BaseModel):
     """Schema for expense approval requests from Frontend"""
     amount: float = Field(..., gt=0, description="Expense amount")
     category: str = Field(..., description="Expense category (food, transport, etc.)")
     user_id: str = Field(default="default_user", description="User identifier")
+    idempotency_key: Optional[str] = Field(None, max_length=256, description="Client key that makes retries safe")
 
 class ExpenseResponse(BaseModel):
     """Response schema for expense check"""
@@ -114,58 +330,616 @@ class ExpenseResponse(BaseModel):
     message: str
     remaining_balance: Optional[float] = None
     motivation: Optional[str] = None
+    decision_path: Optional[str] = None  # "balance_check", "rules", "spending_history", "gemini" or "fallback"
+    decision_rule: Optional[str] = None
+    fallback: bool = False
+    fallback_reason: Optional[str] = None  # "timeout", "circuit_open", "error" or "unavailable"
+    spending_pattern: Optional[str] = None  # "typical", "unusual", "anomalous" or "unknown"
+    anomaly_score: Optional[float] = None  # z-score against the user's history in the category
+
+class GoalCreate(BaseModel):
+    """Schema for a new savings goal"""
+    name: str = Field(..., min_length=1, max_length=100, description="Goal name")
+    targetAmount: float = Field(..., gt=0, description="Amount to save")
+    currentAmount: float = Field(0, ge=0, description="Amount already saved")
+    color: str = Field("#10B981", description="Display color")
+    weight: float = Field(1, gt=0, description="Share of goal allocations relative to other goals")
+
+class GoalUpdate(BaseModel):
+    """Schema for editing a savings goal (only the fields given change)"""
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    targetAmount: Optional[float] = Field(None, gt=0)
+    color: Optional[str] = None
+    weight: Optional[float] = Field(None, gt=0)
+    status: Optional[str] = Field(None, pattern="^(active|paused)$", description="Pause or resume allocations")
+
+class SimulationRequest(BaseModel):
+    """Schema for Monte Carlo balance projections"""
+    user_id: str = Field(default="default_user", description="User identifier")
+    months: int = Field(12, ge=1, le=60, description="Months to project")
+    paths: int = Field(10000, ge=100, le=SIMULATION_MAX_PATHS, description="Number of simulated scenarios")
+    seed: Optional[int] = Field(None, description="Random seed for reproducible projections")
+
+class TaxDecision(NamedTuple):
+    """Chanakya's allocation decision and how it was reached"""
+    percentage: float
+    path: str  # "cache", "gemini" or "fallback"
+    fallback_reason: Optional[str] = None
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def storage_unavailable() -> HTTPException:
+    """Error for requests that need storage before (or without) a backend"""
+    if startup_state["storage"] == "starting":
+        return HTTPException(status_code=503, detail="Database is still starting up")
+    return HTTPException(status_code=500, detail="Database not initialized")
+
+def too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    """429 telling the client when to retry (whole seconds, at least 1)"""
+    return HTTPException(
+        status_code=429, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def enforce_rate_limits(request: Request, user_id: Optional[str] = None):
+    """Charge an agent request to its source's and user's token buckets"""
+    source = request.headers.get(RATE_LIMIT_SOURCE_HEADER) or (request.client.host if request.client else "unknown")
+    retry_after = source_rate_limiter.check(source)
+    if retry_after:
+        REQUESTS_SHED.inc(reason="source_rate_limit")
+        raise too_many_requests(f"Rate limit exceeded for source {source}", retry_after)
+    if user_id is not None:
+        retry_after = user_rate_limiter.check(user_id)
+        if retry_after:
+            REQUESTS_SHED.inc(reason="user_rate_limit")
+            raise too_many_requests(f"Rate limit exceeded for user {user_id}", retry_after)
+
+def default_user_profile() -> dict:
+    """Financial profile for a user seen for the first time"""
+    return {
+        "safe_balance": 0.0,
+        "tax_vault": 0.0,
+        "total_income": 0.0,
+        "total_expenses": 0.0,
+        "created_at": datetime.now().isoformat()
+    }
+
 def get_user_data(user_id: str) -> dict:
-    """Fetch user financial data from Firestore"""
-    if not db:
-        raise HTTPException(status_code=500, detail="Database not initialized")
+    """
+    Fetch user financial data, from the profile cache when possible.
+    A new user gets a default profile; it is persisted by their first ledger write.
+    """
+    cached = profile_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    if not storage:
+        raise storage_unavailable()
     
     try:
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        
-        if user_doc.exists:
-            return user_doc.to_dict()
+        token = profile_cache.begin_read(user_id)
+        with stage("storage_read"):
+            user_data = storage.get_user(user_id) or default_user_profile()
+        profile_cache.finish_read(user_id, token, user_data)
+        return user_data
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_users_data(user_ids: List[str]) -> dict:
+    """
+    Fetch several user profiles: cached ones from memory, the rest in a
+    single storage round trip. Unknown users get a default profile.
+    """
+    profiles = {}
+    misses = []
+    for user_id in user_ids:
+        cached = profile_cache.get(user_id)
+        if cached is not None:
+            profiles[user_id] = cached
         else:
-            # Create default user profile
-            default_data = {
-                "safe_balance": 0.0,
-                "tax_vault": 0.0,
-                "total_income": 0.0,
-                "total_expenses": 0.0,
-                "created_at": datetime.now().isoformat()
-            }
-            user_ref.set(default_data)
-            return default_data
+            misses.append(user_id)
+    if not misses:
+        return profiles
+    
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        tokens = {user_id: profile_cache.begin_read(user_id) for user_id in misses}
+        with stage("storage_read"):
+            stored = storage.get_users(misses)
+        for user_id in misses:
+            profiles[user_id] = stored.get(user_id) or default_user_profile()
+            profile_cache.finish_read(user_id, tokens[user_id], profiles[user_id])
+        return profiles
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 def update_user_data(user_id: str, updates: dict):
-    """Update user financial data in Firestore"""
-    if not db:
-        raise HTTPException(status_code=500, detail="Database not initialized")
+    """Update user financial data in storage (write-through to the profile cache)"""
+    if not storage:
+        raise storage_unavailable()
     
     try:
-        user_ref = db.collection('users').document(user_id)
-        user_ref.update(updates)
+        with stage("storage_write"):
+            version = storage.update_user(user_id, updates)
+        profile_cache.apply(user_id, fields=updates, version=version)
     except Exception as e:
+        profile_cache.invalidate(user_id)
         raise HTTPException(status_code=500, detail=f"Database update error: {str(e)}")
 
-def ask_gemini(prompt: str) -> str:
+def on_external_profile_change(user_id: str, profile: Optional[dict], version):
+    """Refresh a watched user's cached profile and streams (listener thread)"""
+    if profile is None:
+        profile_cache.invalidate(user_id)
+    elif profile_cache.put(user_id, profile, version):
+        # Older snapshots (e.g. echoes of our own earlier writes) are dropped
+        balance_broker.publish(user_id, {"type": "snapshot", "profile": profile})
+
+async def watch_profile(user_id: str):
+    """Attach a profile listener for a user with an open stream (once per user)"""
+    if not (PROFILE_CACHE_LISTENER and storage) or user_id in profile_watches:
+        return
+    profile_watches[user_id] = None
+    try:
+        watch = await run_storage(storage.watch_user, user_id, on_external_profile_change)
+    except Exception as e:
+        profile_watches.pop(user_id, None)
+        print(f"⚠️ Profile listener for {user_id} failed: {e}")
+        return
+    if user_id in profile_watches and balance_broker.has_subscribers(user_id):
+        profile_watches[user_id] = watch
+    elif watch:
+        watch.unsubscribe()  # The last stream closed while it attached
+
+def unwatch_profile(user_id: str):
+    """Detach a user's profile listener once their last stream closes"""
+    if not balance_broker.has_subscribers(user_id):
+        watch = profile_watches.pop(user_id, None)
+        if watch:
+            watch.unsubscribe()
+
+def ask_gemini(prompt: str, agent: str = "unknown") -> str:
     """Consult Gemini AI for financial decisions"""
     if not model:
         raise HTTPException(status_code=500, detail="AI model not initialized")
     
     try:
-        response = model.generate_content(prompt)
+        with stage("gemini"):
+            response = model.generate_content(prompt)
+        GEMINI_CALLS.inc(agent=agent, outcome="success")
+        
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            GEMINI_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, agent=agent, kind="prompt")
+            GEMINI_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, agent=agent, kind="completion")
         return response.text.strip()
     except Exception as e:
+        GEMINI_CALLS.inc(agent=agent, outcome="error")
         raise HTTPException(status_code=500, detail=f"AI consultation error: {str(e)}")
 
+def commit_ledger_batch(entries: List[dict]):
+    """
+    Commit several ledger entries (user_id, increments, fields, entry)
+    atomically: one merged update per user plus one log write per entry.
+    Callers must keep a chunk within FIRESTORE_BATCH_LIMIT operations
+    (see plan_ledger_batches).
+    """
+    if not storage:
+        raise storage_unavailable()
+    
+    increments, fields = merge_ledger_entries(entries)
+    try:
+        with stage("ledger_commit"):
+            version = storage.commit_ledger(entries)
+    except Exception as e:
+        for user_id in increments:
+            profile_cache.invalidate(user_id)
+        raise HTTPException(status_code=500, detail=f"Ledger commit error: {str(e)}")
+    
+    # Write-through: keep cached balances in step with the committed deltas,
+    # then push the change to any open balance streams
+    for user_id, user_increments in increments.items():
+        profile_cache.apply(user_id, increments=user_increments, fields=fields[user_id], version=version)
+        if balance_broker.has_subscribers(user_id):
+            balance_broker.publish(user_id, {
+                "type": "balance",
+                "delta": user_increments,
+                "profile": profile_cache.peek(user_id)
+            })
+
+def plan_ledger_batches(entries: List[dict], max_ops: int = None) -> List[List[dict]]:
+    """
+    Split ledger entries into chunks that each fit in one Firestore batch,
+    counting one write per log entry and alert plus one per distinct user
+    profile, rollup and goal document in the chunk. Entries for the same
+    user should be adjacent to keep those writes low.
+    """
+    max_ops = max_ops or FIRESTORE_BATCH_LIMIT
+    chunks = []
+    current = []
+    documents = set()
+    writes = 0  # log entries and alerts in the current chunk
+    for item in entries:
+        item_documents = {item["user_id"], *rollup_keys(item["entry"])}
+        item_documents.update(("goal", goal_id) for goal_id in item.get("goals", ()))
+        item_writes = 1 + len(item.get("alerts", ()))
+        new_documents = len(item_documents - documents)
+        if current and writes + len(documents) + new_documents + item_writes > max_ops:
+            chunks.append(current)
+            current = []
+            documents = set()
+            writes = 0
+            new_documents = len(item_documents)
+        current.append(item)
+        documents |= item_documents
+        writes += item_writes
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def run_storage(func, *args, **kwargs):
+    """Run a blocking storage helper on the bounded storage executor"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()  # carries the request's stage timings
+    return await loop.run_in_executor(storage_executor, context.run, partial(func, *args, **kwargs))
+
+async def run_gemini(func, *args, **kwargs):
+    """Run a blocking Gemini helper on the bounded Gemini executor"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(gemini_executor, context.run, partial(func, *args, **kwargs))
+
+async def commit_coalesced(entries: List[dict]):
+    """Write one user's buffered ledger entries (see ledger_actors)"""
+    for chunk in plan_ledger_batches(entries):
+        await run_storage(commit_ledger_batch, chunk)
+
+async def run_simulation(func, *args, **kwargs):
+    """Run a CPU-bound simulation on the bounded simulation executor"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(simulation_executor, context.run, partial(func, *args, **kwargs))
+
+ledger_actors = LedgerActors(
+    commit_coalesced, window=LEDGER_COALESCE_WINDOW, max_pending=LEDGER_COALESCE_MAX_ENTRIES
+)
+
+def project_balances(profile: dict, transactions: List[dict], months: int, paths: int,
+                     seed: Optional[int]) -> dict:
+    """Fit the user's history and run the Monte Carlo projection"""
+    from simulation import HistoryModel, simulate  # NumPy is only imported on first use
+    
+    with stage("simulate"):
+        history = HistoryModel.fit(transactions, DEFAULT_TAX_PERCENTAGE)
+        return simulate(profile, history, kavach_rules.policy, months=months, paths=paths, seed=seed)
+
+def idempotency_fingerprint(payload: BaseModel) -> tuple:
+    """Request fields a replayed key must match (everything but the key itself)"""
+    return tuple(sorted(payload.model_dump(exclude={"idempotency_key"}).items()))
+
+async def run_idempotent(scope: str, payload: BaseModel, request: Request, response: Response, handler):
+    """
+    Run handler once per (scope, user, idempotency key). Retries get the
+    original response back with an Idempotent-Replayed header. New work is
+    charged to the rate limits; a retry the store answers (or that waits for
+    its in-flight original) is free.
+    """
+    if not payload.idempotency_key:
+        enforce_rate_limits(request, payload.user_id)
+        return await handler()
+    key = (scope, payload.user_id, payload.idempotency_key)
+    fingerprint = idempotency_fingerprint(payload)
+    try:
+        if idempotency_store.lookup(key, fingerprint) is None and not idempotency_store.in_flight(key):
+            enforce_rate_limits(request, payload.user_id)
+        result, replayed = await idempotency_store.run(key, fingerprint, handler)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+def get_transactions(user_id: str, limit: int, after: Optional[dict] = None,
+                     type: Optional[str] = None, category: Optional[str] = None) -> List[dict]:
+    """Fetch one page of a user's transaction log, newest first"""
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        with stage("storage_read"):
+            return storage.query_transactions(user_id, limit, after=after, type=type, category=category)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_rollup(user_id: str, period: str, period_key: str) -> dict:
+    """Fetch one rollup document (zeros if nothing was recorded in that period)"""
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        with stage("storage_read"):
+            stored = storage.get_rollup(user_id, period, period_key) or {}
+        return dict(empty_rollup(user_id, period, period_key), **stored)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_user_goals(user_id: str) -> List[dict]:
+    """Fetch all of a user's goals in one query"""
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        with stage("storage_read"):
+            return storage.list_goals(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def get_users_goals(user_ids: List[str]) -> dict:
+    """Fetch several users' goals (user_id -> goals) in one query"""
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        with stage("storage_read"):
+            return storage.list_goals_for_users(user_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def goals_storage(operation: str, *args):
+    """Run a goal or alert storage method (list_goals, create_goal, ...) by name"""
+    if not storage:
+        raise storage_unavailable()
+    
+    try:
+        with stage("storage_read" if operation.startswith(("get", "list")) else "storage_write"):
+            return getattr(storage, operation)(*args)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def goal_share(user_data: dict) -> float:
+    """Fraction of an income's safe allocation that goes to goals"""
+    return min(100.0, max(0.0, user_data.get("goal_allocation_percentage", GOALS_ALLOCATION_PERCENTAGE))) / 100
+
+def balance_snapshot(user_id: str, user_data: dict) -> dict:
+    """The balance fields the dashboard shows"""
+    return {
+        "user_id": user_id,
+        "safe_balance": round(user_data.get('safe_balance', 0), 2),
+        "tax_vault": round(user_data.get('tax_vault', 0), 2),
+        "total_income": round(user_data.get('total_income', 0), 2),
+        "total_expenses": round(user_data.get('total_expenses', 0), 2),
+        "pending_income": round(user_data.get('pending_income', 0), 2)
+    }
+
+def sse_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def balance_events(subscription) -> AsyncIterator[bytes]:
+    """
+    SSE stream for one subscription: a snapshot first, then a balance event
+    per committed change and a comment line as heartbeat when idle.
+    """
+    user_id = subscription.user_id
+    try:
+        await watch_profile(user_id)
+        # Subscribed before this read, so no commit can slip between the two;
+        # events carry absolute balances, so an overlap is harmless
+        user_data = await run_storage(get_user_data, user_id)
+        yield sse_event("snapshot", balance_snapshot(user_id, user_data))
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": heartbeat\n\n"
+                continue
+            
+            if event is CLOSED:
+                return  # Server shutting down; clients reconnect to another instance
+            if event is RESYNC or event.get("profile") is None:
+                # Fell behind, or the profile left the cache: read it once
+                user_data = await run_storage(get_user_data, user_id)
+            else:
+                user_data = event["profile"]
+            data = balance_snapshot(user_id, user_data)
+            if event.get("type") == "balance":
+                data["delta"] = {key: round(value, 2) for key, value in event["delta"].items()}
+                yield sse_event("balance", data)
+            else:
+                yield sse_event("snapshot", data)
+    finally:
+        balance_broker.unsubscribe(subscription)
+        unwatch_profile(user_id)
+
+def encode_cursor(entry: dict) -> str:
+    """Opaque page cursor: the (timestamp, id) of the last entry returned"""
+    raw = json.dumps([entry["timestamp"], entry["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, entry_id = json.loads(raw)
+        return {"timestamp": str(timestamp), "id": str(entry_id)}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def stream_transactions(user_id: str, type: Optional[str], category: Optional[str],
+                              page: List[dict]) -> AsyncIterator[bytes]:
+    """Yield a user's full history as NDJSON from its first page, one store page at a time"""
+    while True:
+        if page:
+            yield "".join(json.dumps(entry, default=str) + "\n" for entry in page).encode()
+        if len(page) < TRANSACTIONS_EXPORT_CHUNK:
+            return
+        page = await run_storage(
+            get_transactions, user_id, TRANSACTIONS_EXPORT_CHUNK, after=page[-1], type=type, category=category
+        )
+
+def income_bucket(value: float) -> int:
+    """Map a rupee amount onto a geometric bucket index"""
+    if value < 1:
+        return 0
+    return 1 + int(math.log(value) / math.log(CHANAKYA_CACHE_BUCKET_RATIO))
+
+def chanakya_cache_key(user_data: dict, amount: float) -> tuple:
+    """Cache key for a tax decision: prompt/model version plus bucketed inputs"""
+    return (
+        CHANAKYA_CACHE_VERSION,
+        income_bucket(user_data.get('safe_balance', 0)),
+        income_bucket(user_data.get('tax_vault', 0)),
+        income_bucket(user_data.get('total_income', 0)),
+        income_bucket(amount),
+    )
+
+async def consult_gemini(prompt: str, agent: str, budget: float, user_id: Optional[str] = None,
+                         shed: bool = True) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ask Gemini within a latency budget, guarded by the circuit breaker and
+    the fair queue (one flow per user_id). Returns (response, None), or
+    (None, fallback_reason) when the caller should fall back to its
+    deterministic default. When the queue sheds the call it raises a 429,
+    or falls back with reason "overloaded" if shed is False (no client waiting).
+    """
+    def fallback(reason: str):
+        AGENT_FALLBACKS.inc(agent=agent, reason=reason)
+        return None, reason
+    
+    if not model:
+        return fallback("unavailable")
+    if gemini_breaker.state == OPEN:
+        return fallback("circuit_open")
+    
+    start = time.perf_counter()
+    try:
+        await gemini_queue.acquire(agent, user_id, max_wait=budget)
+    except Overloaded as e:
+        if not shed:
+            return fallback("overloaded")
+        REQUESTS_SHED.inc(reason=f"gemini_{e.reason}")
+        raise too_many_requests(f"{agent.title()} is at capacity, please retry", e.retry_after)
+    if not gemini_breaker.allow():
+        gemini_queue.release()
+        return fallback("circuit_open")
+    
+    # The slot is held until the executor thread finishes, even if we stop
+    # waiting for it, so the queue never promises more than the pool can run
+    called = time.perf_counter()
+    call = asyncio.ensure_future(run_gemini(ask_gemini, prompt, agent=agent))
+    breaker_waits_for_call = False
+    
+    def release_slot(task: asyncio.Future):
+        gemini_queue.release(time.perf_counter() - called)
+        failed = task.cancelled() or task.exception() is not None
+        if breaker_waits_for_call:
+            gemini_breaker.record_failure() if failed else gemini_breaker.record_success()
+    
+    call.add_done_callback(release_slot)
+    try:
+        response = await asyncio.wait_for(asyncio.shield(call), timeout=max(0.0, budget - (called - start)))
+    except asyncio.TimeoutError:
+        # The executor thread finishes the call in the background; we stop waiting.
+        # When queueing used up the budget, Gemini itself was not slow: the
+        # breaker hears how the call ends instead of counting a failure now
+        if time.perf_counter() - called < budget:
+            breaker_waits_for_call = True
+        else:
+            gemini_breaker.record_failure()
+        GEMINI_CALLS.inc(agent=agent, outcome="timeout")
+        record_gemini(agent, (time.perf_counter() - start) * 1000, error="timeout")
+        return fallback("timeout")
+    except HTTPException:
+        gemini_breaker.record_failure()
+        record_gemini(agent, (time.perf_counter() - start) * 1000, error="error")
+        return fallback("error")
+    except asyncio.CancelledError:
+        gemini_breaker.record_failure()
+        raise
+    
+    gemini_breaker.record_success()
+    record_gemini(agent, (time.perf_counter() - start) * 1000, text=response)
+    return response, None
+
+async def decide_tax_allocation(user_data: dict, amount: float, user_id: Optional[str] = None,
+                                shed: bool = True) -> TaxDecision:
+    """
+    Ask Chanakya (via the decision cache) what share of income to save for
+    tax; user_id and shed are passed on to consult_gemini
+    """
+    cache_key = chanakya_cache_key(user_data, amount)
+    cached = chanakya_cache.get(cache_key)
+    if cached is not None:
+        AGENT_DECISIONS.inc(agent="chanakya", path="cache", status="allocated")
+        return TaxDecision(cached, "cache")
+    
+    ai_prompt = CHANAKYA_PROMPT_TEMPLATE.format(
+        safe_balance=user_data.get('safe_balance', 0),
+        tax_vault=user_data.get('tax_vault', 0),
+        total_income=user_data.get('total_income', 0),
+        amount=amount
+    )
+    ai_response, fallback_reason = await consult_gemini(
+        ai_prompt, "chanakya", CHANAKYA_LATENCY_BUDGET, user_id=user_id, shed=shed
+    )
+    if ai_response is None:
+        AGENT_DECISIONS.inc(agent="chanakya", path="fallback", status="allocated")
+        return TaxDecision(DEFAULT_TAX_PERCENTAGE, "fallback", fallback_reason)
+    
+    # Parse AI response (extract percentage)
+    with stage("parse"):
+        try:
+            tax_percentage = float(''.join(filter(str.isdigit, ai_response.split()[0])))
+            tax_percentage = max(10, min(30, tax_percentage))  # Clamp between 10-30%
+        except Exception:
+            AGENT_FALLBACKS.inc(agent="chanakya", reason="parse_error")
+            AGENT_DECISIONS.inc(agent="chanakya", path="fallback", status="allocated")
+            return TaxDecision(DEFAULT_TAX_PERCENTAGE, "fallback", "parse_error")  # Not cached
+    
+    AGENT_DECISIONS.inc(agent="chanakya", path="gemini", status="allocated")
+    chanakya_cache.set(cache_key, tax_percentage)
+    return TaxDecision(tax_percentage, "gemini")
+
+async def read_income_batch(request: Request) -> list:
+    """
+    Read a settlement batch as a JSON array or an NDJSON stream.
+    NDJSON is parsed line by line as the body arrives; a malformed line is
+    kept as its exception so it can be reported against its index.
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    if "ndjson" not in content_type:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Batch body must be a JSON array")
+        return items
+    
+    items = []
+    
+    def parse_line(line: bytes):
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(e)
+    
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                parse_line(line)
+        if len(items) > INCOME_BATCH_MAX_ITEMS:
+            break
+    if buffer.strip():
+        parse_line(buffer)
+    return items
+
 def lakshmi_motivate(context: str) -> str:
     """Lakshmi Agent: Generate motivational message"""
     motivations = {
@@ -176,83 +950,204 @@ def lakshmi_motivate(context: str) -> str:
     }
     return motivations.get(context, "🚀 Keep going, you're doing great!")
 
+# ============================================================================
+# STARTUP & SHUTDOWN
+# ============================================================================
+
+def init_storage():
+    """Create the storage backend (blocking: SDK imports and credentials)"""
+    global storage
+    try:
+        storage = create_storage()
+        startup_state["storage"] = "ready"
+        print(f"✅ Storage backend initialized: {storage.name}")
+    except Exception as e:
+        startup_state["storage"] = "failed"
+        print(f"⚠️ Storage initialization error: {e}")
+        print("ℹ️  To fix this, either:")
+        print("   1. Set GOOGLE_APPLICATION_CREDENTIALS environment variable to the path of your serviceAccountKey.json")
+        print("   2. Set FIREBASE_CREDENTIALS_PATH in your .env file")
+        print("   3. Place serviceAccountKey.json in the backend directory")
+        print("   4. Set STORAGE_BACKEND=memory or STORAGE_BACKEND=sqlite to run without Firestore")
+
+def init_gemini():
+    """Configure the Gemini client (blocking: imports the SDK)"""
+    global model
+    if GEMINI_STUB == "replay":
+        from fakes import ReplayModel
+        model = ReplayModel()
+        startup_state["gemini"] = "ready"
+        print("🎭 Gemini stubbed: replaying recorded replies (GEMINI_STUB=replay)")
+        return
+    try:
+        gemini_api_key = os.getenv("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+        
+        import google.generativeai as genai
+        genai.configure(api_key=gemini_api_key)
+        # Using the latest Gemini 2.5 Flash model by default
+        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        startup_state["gemini"] = "ready"
+        print("✅ Gemini AI initialized successfully")
+    except Exception as e:
+        startup_state["gemini"] = "failed"
+        print(f"⚠️ Gemini AI initialization error: {e}")
+
+def timed(name: str, func):
+    """Run func and record its duration in startup_state["timings_ms"]"""
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        startup_state["timings_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+
+async def warm_up():
+    """Initialize storage and Gemini concurrently"""
+    await asyncio.gather(
+        run_storage(timed, "storage", init_storage),
+        run_gemini(timed, "gemini", init_gemini)
+    )
+    
+    timings = startup_state["timings_ms"]
+    timings["ready"] = round((time.perf_counter() - _import_started) * 1000, 1)
+    for phase, elapsed_ms in timings.items():
+        STARTUP_SECONDS.set(elapsed_ms / 1000, phase=phase)
+    print(f"⏱️ Cold start: import {timings['import']} ms, storage {timings['storage']} ms, "
+          f"gemini {timings['gemini']} ms, ready after {timings['ready']} ms")
+
+def shutdown():
+    """Detach listeners, drain the I/O executors and close storage"""
+    for watch in profile_watches.values():
+        if watch:
+            watch.unsubscribe()
+    profile_watches.clear()
+    storage_executor.shutdown(wait=True)
+    gemini_executor.shutdown(wait=True)
+    simulation_executor.shutdown(wait=True)
+    if storage:
+        storage.close()
+    if traffic_recorder:
+        traffic_recorder.close()
+
 # ============================================================================
 # API ROUTES
 # ============================================================================
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness(response: Response):
+    """
+    Readiness probe: 200 once storage is initialized. Gemini is optional
+    (agents fall back without it), so it only marks the instance degraded.
+    """
+    ready = startup_state["storage"] == "ready"
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": ("ready" if startup_state["gemini"] == "ready" else "degraded") if ready else "not_ready",
+        "storage": startup_state["storage"],
+        "gemini": startup_state["gemini"],
+        "ai_circuit": gemini_breaker.state,
+        "startup_ms": startup_state["timings_ms"]
+    }
+
 @app.get("/")
 async def health_check():
     """Health check endpoint"""
+    if not storage:
+        health = "starting" if startup_state["storage"] == "starting" else "unhealthy"
+    else:
+        health = "healthy" if model else "degraded"
     return {
-        "status": "healthy",
+        "status": health,
         "app": "RupeeReady AI",
         "message": "Self-Driving Wallet is running!",
-        "firebase_status": "connected" if db else "disconnected",
-        "ai_status": "connected" if model else "disconnected"
+        "storage_backend": storage.name if storage else None,
+        "storage_status": "connected" if storage else "disconnected",
+        "ai_status": "connected" if model else "disconnected",
+        "ai_circuit": gemini_breaker.state,
+        "ai_queue": gemini_queue.stats(),
+        "rate_limits": {"user": user_rate_limiter.stats(), "source": source_rate_limiter.stats()}
     }
 
 @app.post("/webhook/income")
-async def chanakya_income_agent(transaction: IncomeTransaction):
+async def chanakya_income_agent(transaction: IncomeTransaction, request: Request, response: Response):
     """
     🧠 CHANAKYA - The Income Agent (CFO)
     Automatically allocates income between Tax Vault and Safe Balance
     """
+    return await run_idempotent("income", transaction, request, response, partial(process_income, transaction))
+
+async def process_income(transaction: IncomeTransaction) -> dict:
+    """Allocate one income transaction and commit it to the ledger"""
+    if INCOME_SETTLEMENT_MODE == "deferred":
+        return await defer_income(transaction)
     try:
         # Fetch current user data
-        user_data = get_user_data(transaction.user_id)
-        
-        # Consult Gemini AI for tax allocation strategy
-        ai_prompt = f"""
-        You are Chanakya, a financial advisor for gig workers in India.
-        
-        User's Financial Profile:
-        - Current Safe Balance: ₹{user_data.get('safe_balance', 0)}
-        - Current Tax Vault: ₹{user_data.get('tax_vault', 0)}
-        - Total Income (Historical): ₹{user_data.get('total_income', 0)}
-        - New Income Received: ₹{transaction.amount}
+        user_data = await run_storage(get_user_data, transaction.user_id)
         
-        Question: What percentage of this new income (₹{transaction.amount}) should be saved for tax purposes?
-        
-        Respond with ONLY a number between 10 and 30 (representing percentage).
-        Consider that Indian gig workers typically need to save 15-20% for taxes.
-        Be conservative if this is a large income spike.
-        """
-        
-        ai_response = ask_gemini(ai_prompt)
-        
-        # Parse AI response (extract percentage)
-        try:
-            tax_percentage = float(''.join(filter(str.isdigit, ai_response.split()[0])))
-            tax_percentage = max(10, min(30, tax_percentage))  # Clamp between 10-30%
-        except:
-            tax_percentage = 20  # Default fallback
+        # Consult Chanakya (cached Gemini decision) for tax allocation strategy
+        tax_decision = await decide_tax_allocation(user_data, transaction.amount, transaction.user_id)
+        tax_percentage = tax_decision.percentage
         
         # Calculate allocations
         tax_amount = (transaction.amount * tax_percentage) / 100
         safe_amount = transaction.amount - tax_amount
         
-        # Update Firestore
+        # Queue balance increments, goal progress and the log entry on the
+        # user's actor; they are committed atomically (one batch, however many
+        # goals), possibly with the user's other writes
+        now = datetime.now().isoformat()
+        async with ledger_actors.turn(transaction.user_id) as turn:
+            stored_profile, stored_goals = await asyncio.gather(
+                run_storage(get_user_data, transaction.user_id),
+                run_storage(get_user_goals, transaction.user_id)
+            )
+            user_data = turn.overlay(stored_profile)
+            goals = turn.overlay_goals(stored_goals)
+            
+            # Part of the safe allocation moves into the user's active goals
+            allocations, goal_updates, alerts = plan_goal_updates(goals, safe_amount * goal_share(user_data), now)
+            goal_amount = round(sum(allocations.values()), 2)
+            safe_amount -= goal_amount
+            
+            increments = {
+                "safe_balance": safe_amount,
+                "tax_vault": tax_amount,
+                "total_income": transaction.amount
+            }
+            if goal_amount:
+                increments["goal_savings"] = goal_amount
+            committed = turn.commit(
+                increments=increments,
+                fields={
+                    "last_income_date": now,
+                    "created_at": user_data.get('created_at', now)
+                },
+                entry={
+                    "user_id": transaction.user_id,
+                    "type": "income",
+                    "amount": transaction.amount,
+                    "source": transaction.source,
+                    "tax_allocated": tax_amount,
+                    "safe_allocated": safe_amount,
+                    "goal_allocated": goal_amount,
+                    "tax_percentage": tax_percentage,
+                    "timestamp": now
+                },
+                goals=goal_updates,
+                alerts=alerts
+            )
+        await committed
+        
+        # Balances after every earlier write for this user plus this allocation
         new_safe_balance = user_data.get('safe_balance', 0) + safe_amount
         new_tax_vault = user_data.get('tax_vault', 0) + tax_amount
-        new_total_income = user_data.get('total_income', 0) + transaction.amount
-        
-        update_user_data(transaction.user_id, {
-            "safe_balance": new_safe_balance,
-            "tax_vault": new_tax_vault,
-            "total_income": new_total_income,
-            "last_income_date": datetime.now().isoformat()
-        })
-        
-        # Log transaction
-        db.collection('transactions').add({
-            "user_id": transaction.user_id,
-            "type": "income",
-            "amount": transaction.amount,
-            "tax_allocated": tax_amount,
-            "safe_allocated": safe_amount,
-            "tax_percentage": tax_percentage,
-            "timestamp": datetime.now().isoformat()
-        })
         
         return {
             "status": "success",
@@ -262,12 +1157,21 @@ async def chanakya_income_agent(transaction: IncomeTransaction):
                 "total_income": transaction.amount,
                 "tax_vault_allocation": round(tax_amount, 2),
                 "safe_balance_allocation": round(safe_amount, 2),
+                "goal_allocation": goal_amount,
                 "tax_percentage": tax_percentage
             },
             "new_balances": {
                 "safe_balance": round(new_safe_balance, 2),
                 "tax_vault": round(new_tax_vault, 2)
             },
+            "goals": [
+                {"goal_id": goal_id, "amount": amount, "completed": "status" in goal_updates[goal_id]["fields"]}
+                for goal_id, amount in allocations.items()
+            ],
+            "alerts": [alert["title"] for alert in alerts],
+            "decision_path": tax_decision.path,
+            "fallback": tax_decision.path == "fallback",
+            "fallback_reason": tax_decision.fallback_reason,
             "motivation": lakshmi_motivate("income")
         }
         
@@ -279,85 +1183,444 @@ async def chanakya_income_agent(transaction: IncomeTransaction):
             detail=f"Chanakya Agent Error: {str(e)}"
         )
 
-@app.post("/api/check-expense", response_model=ExpenseResponse)
-async def kavach_spending_shield(expense: ExpenseRequest):
+async def defer_income(transaction: IncomeTransaction) -> dict:
+    """Credit income to the user's pending bucket; the settlement job splits it later"""
+    try:
+        # No reads and no Gemini: just increments queued on the user's actor
+        now = datetime.now().isoformat()
+        async with ledger_actors.turn(transaction.user_id) as turn:
+            committed = turn.commit(
+                increments={
+                    "pending_income": transaction.amount,
+                    "total_income": transaction.amount
+                },
+                fields={
+                    "last_income_date": now,
+                    PENDING_FLAG: True
+                },
+                entry={
+                    "user_id": transaction.user_id,
+                    "type": "income",
+                    "status": "pending",
+                    "amount": transaction.amount,
+                    "source": transaction.source,
+                    "tax_allocated": 0.0,
+                    "safe_allocated": 0.0,
+                    "timestamp": now
+                }
+            )
+        await committed
+        AGENT_DECISIONS.inc(agent="chanakya", path="deferred", status="pending")
+        
+        return {
+            "status": "pending",
+            "agent": "Chanakya",
+            "message": f"Income of ₹{transaction.amount} received! It will be split between tax vault and safe balance at end-of-day settlement.",
+            "breakdown": {
+                "total_income": transaction.amount,
+                "pending_income": transaction.amount
+            },
+            "decision_path": "deferred",
+            "fallback": False,
+            "fallback_reason": None,
+            "motivation": lakshmi_motivate("income")
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Chanakya Agent Error: {str(e)}"
+        )
+
+async def settle_pending_income(run_id: Optional[str] = None) -> dict:
+    """Run (or resume) the deferred income settlement job; one run at a time per process"""
+    if not storage:
+        raise storage_unavailable()
+    if settlement_lock.locked():
+        raise HTTPException(status_code=409, detail="A settlement run is already in progress")
+    async with settlement_lock:
+        report = await run_settlement(
+            storage,
+            decide=partial(decide_tax_allocation, shed=False),  # Falls back instead of failing users
+            commit=commit_coalesced,
+            run_blocking=run_storage,
+            exclusive=ledger_actors.exclusive,
+            goal_share=goal_share,
+            run_id=run_id,
+            chunk_size=SETTLEMENT_CHUNK_SIZE,
+            concurrency=SETTLEMENT_CONCURRENCY
+        )
+    print(f"🧾 Settlement {report['run_id']}: {report['users_settled']} users, "
+          f"₹{report['amount_settled']} in {report['seconds']}s ({report['users_per_second']} users/s)")
+    return report
+
+async def settlement_scheduler():
+    """Run the settlement job every day at SETTLEMENT_TIME (local time)"""
+    hour, minute = (int(part) for part in SETTLEMENT_TIME.split(":"))
+    while True:
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            await settle_pending_income()
+        except Exception as e:
+            print(f"⚠️ Scheduled settlement failed (rerun it to resume): {getattr(e, 'detail', e)}")
+
+@app.post("/webhook/income/batch")
+async def chanakya_income_batch(request: Request):
     """
-    🛡️ KAVACH - The Spending Shield Agent (Guardian)
-    Evaluates expenses and protects against risky spending
+    🧠 CHANAKYA - Bulk Settlement Ingestion
+    Accepts a JSON array or NDJSON stream of income transactions, makes one
+    allocation decision per user, then holds every batch user's ledger turn
+    while their transactions (goal allocations included) are written in
+    batches of up to 500 operations
     """
+    enforce_rate_limits(request)  # Per source; the batch size is capped separately
+    claimed = {}  # index -> (idempotency key, fingerprint) held by this batch
     try:
-        # Fetch current user data
-        user_data = get_user_data(expense.user_id)
-        current_safe_balance = user_data.get('safe_balance', 0)
-        
-        # Check if expense exceeds available balance
-        if expense.amount > current_safe_balance:
-            return ExpenseResponse(
-                status="BLOCKED",
-                message=f"❌ Insufficient funds! You have ₹{current_safe_balance} but need ₹{expense.amount}.",
-                remaining_balance=current_safe_balance,
-                motivation=lakshmi_motivate("blocked")
+        raw_items = await read_income_batch(request)
+        if len(raw_items) > INCOME_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch too large: at most {INCOME_BATCH_MAX_ITEMS} transactions per request"
             )
         
-        # Consult Gemini AI for risk assessment
-        ai_prompt = f"""
-        You are Kavach, a spending guardian for gig workers.
+        results = [None] * len(raw_items)
         
-        User's Current Financial State:
-        - Safe Balance: ₹{current_safe_balance}
-        - Proposed Expense: ₹{expense.amount}
-        - Expense Category: {expense.category}
-        - Remaining After Expense: ₹{current_safe_balance - expense.amount}
+        def fail(index: int, detail: str):
+            results[index] = {"index": index, "status": "error", "detail": detail}
         
-        Question: Is this expense financially safe?
+        # Validate items, skip already-seen idempotency keys and group by user
+        by_user = {}
+        for index, raw in enumerate(raw_items):
+            if isinstance(raw, Exception):
+                fail(index, f"Invalid JSON: {raw}")
+                continue
+            try:
+                transaction = IncomeTransaction.model_validate(raw)
+            except ValidationError as e:
+                fail(index, str(e))
+                continue
+            if transaction.idempotency_key:
+                key = ("income", transaction.user_id, transaction.idempotency_key)
+                fingerprint = idempotency_fingerprint(transaction)
+                try:
+                    original = idempotency_store.lookup(key, fingerprint)
+                except IdempotencyConflict as e:
+                    fail(index, str(e))
+                    continue
+                if original is not None or not idempotency_store.begin(key):
+                    results[index] = {"index": index, "status": "duplicate", "original": original}
+                    continue
+                claimed[index] = (key, fingerprint)
+            by_user.setdefault(transaction.user_id, []).append((index, transaction))
         
-        Respond with ONLY one word: "APPROVED" or "BLOCKED"
+        user_ids = list(by_user)
+        profiles = await run_storage(get_users_data, user_ids) if user_ids else {}
         
-        Guidelines:
-        - BLOCK if expense is >50% of safe balance
-        - BLOCK if remaining balance would be <₹500
-        - BLOCK if category is non-essential (entertainment, luxury) and balance is low
-        - APPROVE essential categories (food, transport, healthcare, education)
-        """
+        # One Chanakya decision per user, sized on the user's batch total. A
+        # bulk job never sheds itself: a bounded wave of decisions that fall
+        # back (like settlement) when the Gemini queue is full
+        semaphore = asyncio.Semaphore(INCOME_BATCH_CONCURRENCY)
         
-        ai_decision = ask_gemini(ai_prompt).upper()
+        async def bounded_decide(user_id: str) -> TaxDecision:
+            async with semaphore:
+                return await decide_tax_allocation(
+                    profiles[user_id],
+                    sum(transaction.amount for _, transaction in by_user[user_id]),
+                    user_id,
+                    shed=False
+                )
         
-        # Parse AI decision
-        if "APPROVED" in ai_decision:
-            # Update balances
-            new_safe_balance = current_safe_balance - expense.amount
-            new_total_expenses = user_data.get('total_expenses', 0) + expense.amount
+        decisions = await asyncio.gather(*(bounded_decide(user_id) for user_id in user_ids), return_exceptions=True)
+        
+        decided = {}
+        for user_id, tax_decision in zip(user_ids, decisions):
+            if isinstance(tax_decision, Exception):
+                detail = getattr(tax_decision, "detail", str(tax_decision))
+                for index, _ in by_user[user_id]:
+                    fail(index, detail)
+                continue
+            decided[user_id] = tax_decision
+        
+        # Credit every decided user in one exclusive section (their other
+        # income and expense requests wait, as for settlement), so all their
+        # entries share Firestore-sized commits
+        credited = []  # (index, entry, goal allocations, decision path)
+        chunks = []
+        async with ledger_actors.exclusive(decided):
+            stored_profiles, stored_goals = await asyncio.gather(
+                run_storage(get_users_data, list(decided)),
+                run_storage(get_users_goals, list(decided))
+            )
+            now = datetime.now().isoformat()
+            entries = []
+            for user_id, tax_decision in decided.items():
+                tax_percentage = tax_decision.percentage
+                user_data = stored_profiles[user_id]
+                goals = stored_goals.get(user_id, [])
+                for index, transaction in by_user[user_id]:
+                    tax_amount = (transaction.amount * tax_percentage) / 100
+                    safe_amount = transaction.amount - tax_amount
+                    
+                    # Goals as left by this user's earlier transactions
+                    allocations, goal_updates, alerts = plan_goal_updates(
+                        goals, safe_amount * goal_share(user_data), now
+                    )
+                    goals = apply_goal_updates(goals, goal_updates)
+                    goal_amount = round(sum(allocations.values()), 2)
+                    safe_amount -= goal_amount
+                    
+                    increments = {
+                        "safe_balance": safe_amount,
+                        "tax_vault": tax_amount,
+                        "total_income": transaction.amount
+                    }
+                    if goal_amount:
+                        increments["goal_savings"] = goal_amount
+                    entry = {
+                        "user_id": user_id,
+                        "type": "income",
+                        "amount": transaction.amount,
+                        "source": transaction.source,
+                        "tax_allocated": tax_amount,
+                        "safe_allocated": safe_amount,
+                        "goal_allocated": goal_amount,
+                        "tax_percentage": tax_percentage,
+                        "timestamp": now
+                    }
+                    item = {
+                        "index": index,
+                        "user_id": user_id,
+                        "increments": increments,
+                        "fields": {
+                            "last_income_date": now,
+                            "created_at": user_data.get('created_at', now)
+                        },
+                        "entry": entry
+                    }
+                    if goal_updates:
+                        item["goals"] = goal_updates
+                    if alerts:
+                        item["alerts"] = alerts
+                    entries.append(item)
+                    credited.append((index, entry, allocations, tax_decision.path))
             
-            update_user_data(expense.user_id, {
-                "safe_balance": new_safe_balance,
-                "total_expenses": new_total_expenses,
-                "last_expense_date": datetime.now().isoformat()
-            })
+            # Commit in Firestore-sized batches, each covering many users
+            chunks = plan_ledger_batches(entries)
+            outcomes = await asyncio.gather(
+                *(run_storage(commit_ledger_batch, chunk) for chunk in chunks),
+                return_exceptions=True
+            )
+        
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                for item in chunk:
+                    fail(item["index"], getattr(outcome, "detail", str(outcome)))
+        for index, entry, allocations, decision_path in credited:
+            if results[index] is not None:
+                continue
+            results[index] = {
+                "index": index,
+                "status": "success",
+                "user_id": entry["user_id"],
+                "amount": entry["amount"],
+                "tax_percentage": entry["tax_percentage"],
+                "tax_vault_allocation": round(entry["tax_allocated"], 2),
+                "safe_balance_allocation": round(entry["safe_allocated"], 2),
+                "goal_allocation": entry["goal_allocated"],
+                "goals": [{"goal_id": goal_id, "amount": amount} for goal_id, amount in allocations.items()],
+                "decision_path": decision_path
+            }
+        
+        # Record credited keys; release the rest so a retry can run them
+        for index, (key, fingerprint) in claimed.items():
+            if results[index]["status"] == "success":
+                idempotency_store.complete(key, fingerprint, results[index])
+            else:
+                idempotency_store.abort(key)
+        claimed.clear()
+        
+        failed = sum(1 for result in results if result["status"] == "error")
+        duplicates = sum(1 for result in results if result["status"] == "duplicate")
+        return {
+            "status": "success" if failed == 0 else "partial",
+            "agent": "Chanakya",
+            "message": f"Settlement processed: {len(results) - failed - duplicates} of {len(results)} transactions credited.",
+            "summary": {
+                "received": len(results),
+                "processed": len(results) - failed - duplicates,
+                "duplicates": duplicates,
+                "failed": failed,
+                "users": len(user_ids),
+                "batches": len(chunks)
+            },
+            "results": results,
+            "motivation": lakshmi_motivate("income")
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Chanakya Batch Error: {str(e)}"
+        )
+    finally:
+        for key, _ in claimed.values():
+            idempotency_store.abort(key)
+
+@app.post("/api/check-expense", response_model=ExpenseResponse)
+async def kavach_spending_shield(expense: ExpenseRequest, request: Request, response: Response):
+    """
+    🛡️ KAVACH - The Spending Shield Agent (Guardian)
+    Evaluates expenses and protects against risky spending
+    """
+    return await run_idempotent("expense", expense, request, response, partial(process_expense, expense))
+
+async def process_expense(expense: ExpenseRequest) -> ExpenseResponse:
+    """Decide one expense and, if approved, debit the safe balance"""
+    try:
+        # Decide within the user's turn: one decision at a time per user
+        async with ledger_actors.turn(expense.user_id) as turn:
+            # Fetch current user data (including this user's queued writes)
+            user_data = turn.overlay(await run_storage(get_user_data, expense.user_id))
+            current_safe_balance = user_data.get('safe_balance', 0)
             
-            # Log transaction
-            db.collection('transactions').add({
-                "user_id": expense.user_id,
-                "type": "expense",
-                "amount": expense.amount,
-                "category": expense.category,
-                "status": "approved",
-                "timestamp": datetime.now().isoformat()
-            })
+            # Check if expense exceeds available balance
+            if expense.amount > current_safe_balance:
+                AGENT_DECISIONS.inc(agent="kavach", path="balance_check", status="BLOCKED")
+                return ExpenseResponse(
+                    status="BLOCKED",
+                    message=f"❌ Insufficient funds! You have ₹{current_safe_balance} but need ₹{expense.amount}.",
+                    remaining_balance=current_safe_balance,
+                    motivation=lakshmi_motivate("blocked"),
+                    decision_path="balance_check"
+                )
+            
+            # Fast path: let the local policy decide clear-cut cases
+            with stage("rules"):
+                rule_decision = kavach_rules.decide(current_safe_balance, expense.amount, expense.category)
+            
+            # Compare with the user's own history in this category (O(1))
+            pattern = spending_anomalies.assess(user_data, expense.category, expense.amount)
+            
+            fallback_reason = None
+            if rule_decision:
+                decision = rule_decision.status
+                decision_path = "rules"
+                decision_rule = rule_decision.rule
+            elif pattern.status == "typical":
+                # Ambiguous for the policy, but routine for this user
+                decision = "APPROVED"
+                decision_path = "spending_history"
+                decision_rule = "typical_for_user"
+            else:
+                # Consult Gemini AI for risk assessment
+                month = await run_storage(get_rollup, expense.user_id, "month", current_period_key("month"))
+                category_spend = month["expenses_by_category"].get(expense.category.strip().lower(), 0)
+                ai_prompt = f"""
+                You are Kavach, a spending guardian for gig workers.
+            
+                User's Current Financial State:
+                - Safe Balance: ₹{current_safe_balance}
+                - Proposed Expense: ₹{expense.amount}
+                - Expense Category: {expense.category}
+                - Remaining After Expense: ₹{current_safe_balance - expense.amount}
+                - Already Spent on {expense.category} This Month: ₹{category_spend}
+                - Spending History: {pattern.describe(expense.category, expense.amount)}
+            
+                Question: Is this expense financially safe?
+            
+                Respond with ONLY one word: "APPROVED" or "BLOCKED"
+            
+                Guidelines:
+                - BLOCK if expense is >50% of safe balance
+                - BLOCK if remaining balance would be <₹500
+                - BLOCK if category is non-essential (entertainment, luxury) and balance is low
+                - APPROVE essential categories (food, transport, healthcare, education)
+                - Be cautious with amounts far above the user's usual spending in the category
+                """
+            
+                # A shed call falls back too: the user is waiting at checkout
+                ai_decision, fallback_reason = await consult_gemini(
+                    ai_prompt, "kavach", KAVACH_LATENCY_BUDGET, user_id=expense.user_id, shed=False
+                )
+                if ai_decision is None:
+                    # Gemini unavailable, too slow or at capacity: decide with the fallback rule
+                    rule_decision = kavach_rules.fallback(current_safe_balance, expense.amount, expense.category)
+                    decision = rule_decision.status
+                    decision_path = "fallback"
+                    decision_rule = rule_decision.rule
+                else:
+                    decision = "APPROVED" if "APPROVED" in ai_decision.upper() else "BLOCKED"
+                    decision_path = "gemini"
+                    decision_rule = None
+            
+            AGENT_DECISIONS.inc(agent="kavach", path=decision_path, status=decision)
+            if decision == "APPROVED":
+                # Queue the balance decrement and log entry before our turn ends,
+                # so the user's next request already sees this spend
+                now = datetime.now().isoformat()
+                committed = turn.commit(
+                    increments={
+                        "safe_balance": -expense.amount,
+                        "total_expenses": expense.amount
+                    },
+                    fields={
+                        "last_expense_date": now,
+                        "created_at": user_data.get('created_at', now),
+                        STATS_FIELD: spending_anomalies.updated_stats(user_data, expense.category, expense.amount)
+                    },
+                    entry={
+                        "user_id": expense.user_id,
+                        "type": "expense",
+                        "amount": expense.amount,
+                        "category": expense.category,
+                        "status": "approved",
+                        "decision_path": decision_path,
+                        "timestamp": now
+                    }
+                )
+        
+        if decision == "APPROVED":
+            await committed
+            new_safe_balance = current_safe_balance - expense.amount
             
             return ExpenseResponse(
                 status="APPROVED",
                 message=f"✅ Expense approved! ₹{expense.amount} deducted from your safe balance.",
                 remaining_balance=round(new_safe_balance, 2),
-                motivation=lakshmi_motivate("approved")
+                motivation=lakshmi_motivate("approved"),
+                decision_path=decision_path,
+                decision_rule=decision_rule,
+                fallback=fallback_reason is not None,
+                fallback_reason=fallback_reason,
+                spending_pattern=pattern.status,
+                anomaly_score=pattern.z_score
             )
         
         else:
-            # Expense blocked by AI
+            # Expense blocked by the local policy, its fallback rule or by AI
+            if rule_decision:
+                message = rule_decision.message
+            else:
+                message = f"🛡️ Expense blocked for your financial safety. Category '{expense.category}' flagged as risky given current balance."
             return ExpenseResponse(
                 status="BLOCKED",
-                message=f"🛡️ Expense blocked for your financial safety. Category '{expense.category}' flagged as risky given current balance.",
+                message=message,
                 remaining_balance=current_safe_balance,
-                motivation=lakshmi_motivate("blocked")
+                motivation=lakshmi_motivate("blocked"),
+                decision_path=decision_path,
+                decision_rule=decision_rule,
+                fallback=fallback_reason is not None,
+                fallback_reason=fallback_reason,
+                spending_pattern=pattern.status,
+                anomaly_score=pattern.z_score
             )
         
     except HTTPException:
@@ -368,46 +1631,350 @@ async def kavach_spending_shield(expense: ExpenseRequest):
             detail=f"Kavach Agent Error: {str(e)}"
         )
 
+@app.post("/api/simulate")
+async def simulate_balances(request: SimulationRequest):
+    """
+    🔮 Monte Carlo projection of safe balance and tax vault, resampled from
+    the user's recent transactions under Chanakya's and Kavach's rules
+    """
+    try:
+        user_data, transactions = await asyncio.gather(
+            run_storage(get_user_data, request.user_id),
+            run_storage(get_transactions, request.user_id, SIMULATION_HISTORY_LIMIT)
+        )
+        projection = await run_simulation(
+            project_balances, user_data, transactions, request.months, request.paths, request.seed
+        )
+        return {
+            "user_id": request.user_id,
+            "starting_balances": {
+                "safe_balance": round(user_data.get('safe_balance', 0), 2),
+                "tax_vault": round(user_data.get('tax_vault', 0), 2)
+            },
+            **projection
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Simulation Error: {str(e)}"
+        )
+
+@app.post("/api/settlement/run")
+async def run_income_settlement(run_id: Optional[str] = None):
+    """
+    🧾 Settle deferred income now: split every user's pending income between
+    tax vault and safe balance. Rerunning a failed run_id resumes it.
+    """
+    try:
+        return await settle_pending_income(run_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Settlement Error: {str(e)}"
+        )
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the in-process caches"""
+    return {
+        "chanakya_decisions": chanakya_cache.stats(),
+        "user_profiles": profile_cache.stats(),
+        "idempotency_keys": idempotency_store.stats(),
+        "ledger_actors": ledger_actors.stats()
+    }
+
+@app.post("/api/cache/invalidate/{user_id}")
+async def invalidate_user_cache(user_id: str):
+    """Drop a user's cached profile (e.g. after an out-of-band Firestore edit)"""
+    profile_cache.invalidate(user_id)
+    return {"status": "invalidated", "user_id": user_id}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: stage timings, Gemini usage, fallbacks, decisions, caches"""
+    caches = (
+        ("chanakya_decisions", chanakya_cache),
+        ("user_profiles", profile_cache),
+        ("idempotency_keys", idempotency_store),
+    )
+    for name, cache in caches:
+        cache_stats = cache.stats()
+        CACHE_ENTRIES.set(cache_stats["size"], cache=name)
+        CACHE_HITS.set(cache_stats["hits"], cache=name)
+        CACHE_MISSES.set(cache_stats["misses"], cache=name)
+    stream_stats = balance_broker.stats()
+    BALANCE_STREAMS.set(stream_stats["streams"])
+    BALANCE_RESYNCS.set(stream_stats["resyncs"])
+    GEMINI_CIRCUIT_STATE.set({"closed": 0, "half_open": 1, "open": 2}[gemini_breaker.state])
+    queue_stats = gemini_queue.stats()
+    GEMINI_QUEUE_DEPTH.set(queue_stats["in_flight"], state="in_flight")
+    GEMINI_QUEUE_DEPTH.set(queue_stats["waiting"], state="waiting")
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/api/user/{user_id}/balance")
 async def get_user_balance(user_id: str):
     """Get current user balance (for frontend dashboard)"""
     try:
-        user_data = get_user_data(user_id)
+        user_data = await run_storage(get_user_data, user_id)
+        return balance_snapshot(user_id, user_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching balance: {str(e)}"
+        )
+
+@app.get("/api/user/{user_id}/balance/stream")
+async def stream_user_balance(user_id: str):
+    """
+    Live balance updates as server-sent events: a "snapshot" event on
+    connect and whenever the stream resyncs, then a "balance" event (new
+    balances plus the delta) for every committed income or expense.
+    """
+    if balance_broker.closed:
+        raise HTTPException(status_code=503, detail="Server is shutting down")
+    subscription = balance_broker.subscribe(user_id)
+    if subscription is None:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many open balance streams for user {user_id}"
+        )
+    return StreamingResponse(
+        balance_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(balance_broker.unsubscribe, subscription)
+    )
+
+@app.get("/api/user/{user_id}/summary")
+async def get_user_summary(
+    user_id: str,
+    period: str = Query("month", pattern="^(day|week|month)$"),
+    key: Optional[str] = Query(None, description="e.g. 2025-02-14, 2025-W07 or 2025-02; defaults to the current period")
+):
+    """Income by source, expenses by category and tax vault growth for one period (a single rollup read)"""
+    try:
+        rollup = await run_storage(get_rollup, user_id, period, key or current_period_key(period))
+        rollup["net_savings"] = round(rollup.get("income_total", 0) - rollup.get("expense_total", 0), 2)
+        return rollup
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching summary: {str(e)}"
+        )
+
+@app.get("/api/user/{user_id}/transactions")
+async def get_user_transactions(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=TRANSACTIONS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    type: Optional[str] = Query(None, description="income or expense"),
+    category: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Transaction history, newest first. Pages are keyset-paginated: pass
+    next_cursor back as cursor. format=ndjson streams the whole history
+    (from cursor, if given) instead of a single page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    
+    if format == "ndjson":
+        # The first page is read up front so a bad cursor or store error gets
+        # a status code instead of a truncated stream
+        first_page = await run_storage(
+            get_transactions, user_id, TRANSACTIONS_EXPORT_CHUNK, after=after, type=type, category=category
+        )
+        return StreamingResponse(
+            stream_transactions(user_id, type, category, first_page),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{user_id}-transactions.ndjson"'}
+        )
+    
+    try:
+        # One extra row tells us whether another page exists
+        page = await run_storage(get_transactions, user_id, limit + 1, after=after, type=type, category=category)
+        has_more = len(page) > limit
+        page = page[:limit]
         return {
             "user_id": user_id,
-            "safe_balance": round(user_data.get('safe_balance', 0), 2),
-            "tax_vault": round(user_data.get('tax_vault', 0), 2),
-            "total_income": round(user_data.get('total_income', 0), 2),
-            "total_expenses": round(user_data.get('total_expenses', 0), 2)
+            "transactions": page,
+            "count": len(page),
+            "next_cursor": encode_cursor(page[-1]) if has_more else None
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error fetching balance: {str(e)}"
+            detail=f"Error fetching transactions: {str(e)}"
+        )
+
+@app.get("/api/user/{user_id}/goals")
+async def list_user_goals(user_id: str):
+    """Savings goals with their progress, oldest first"""
+    try:
+        goals = await run_storage(get_user_goals, user_id)
+        goals.sort(key=lambda goal: goal.get("createdAt", ""))
+        return {"user_id": user_id, "goals": goals, "count": len(goals)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching goals: {str(e)}"
+        )
+
+@app.post("/api/user/{user_id}/goals", status_code=status.HTTP_201_CREATED)
+async def create_user_goal(user_id: str, goal: GoalCreate):
+    """🎯 Create a savings goal; future incomes contribute to it automatically"""
+    try:
+        # In the user's turn, so it is ordered with their income allocations
+        async with ledger_actors.turn(user_id):
+            goals = await run_storage(get_user_goals, user_id)
+            if len(goals) >= GOALS_MAX_PER_USER:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Goal limit reached: at most {GOALS_MAX_PER_USER} goals per user"
+                )
+            now = datetime.now().isoformat()
+            document = dict(
+                goal.model_dump(),
+                user_id=user_id,
+                status="completed" if goal.currentAmount >= goal.targetAmount else "active",
+                createdAt=now,
+                updatedAt=now
+            )
+            goal_id = await run_storage(goals_storage, "create_goal", document)
+        return dict(document, id=goal_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error creating goal: {str(e)}"
+        )
+
+async def find_user_goal(user_id: str, goal_id: str) -> dict:
+    goal = await run_storage(goals_storage, "get_goal", goal_id)
+    if goal is None or goal.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail=f"Goal {goal_id} not found for user {user_id}")
+    return goal
+
+@app.patch("/api/user/{user_id}/goals/{goal_id}")
+async def update_user_goal(user_id: str, goal_id: str, changes: GoalUpdate):
+    """Rename, retarget, reweight, pause or resume a goal"""
+    try:
+        async with ledger_actors.turn(user_id) as turn:
+            # Land pending allocations first so the goal is read as it stands
+            await turn.drain()
+            goal = await find_user_goal(user_id, goal_id)
+            updates = changes.model_dump(exclude_none=True)
+            updates["updatedAt"] = datetime.now().isoformat()
+            
+            # A new target can complete a goal or reopen a completed one
+            merged = dict(goal, **updates)
+            if merged.get("currentAmount", 0) >= merged["targetAmount"]:
+                updates["status"] = "completed"
+                updates.setdefault("completedAt", goal.get("completedAt", updates["updatedAt"]))
+            elif goal.get("status") == "completed" and "status" not in updates:
+                updates["status"] = "active"
+            
+            await run_storage(goals_storage, "update_goal", goal_id, updates)
+        return dict(goal, **updates)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error updating goal: {str(e)}"
+        )
+
+@app.delete("/api/user/{user_id}/goals/{goal_id}")
+async def delete_user_goal(user_id: str, goal_id: str):
+    """Delete a goal (money already allocated to it stays in goal_savings)"""
+    try:
+        async with ledger_actors.turn(user_id) as turn:
+            # Pending allocations must land before the goal disappears
+            await turn.drain()
+            await find_user_goal(user_id, goal_id)
+            await run_storage(goals_storage, "delete_goal", goal_id)
+        return {"status": "deleted", "goal_id": goal_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting goal: {str(e)}"
+        )
+
+@app.get("/api/user/{user_id}/alerts")
+async def get_user_alerts(user_id: str, limit: int = Query(20, ge=1, le=ALERTS_MAX_PAGE_SIZE)):
+    """Most recent alerts (goal milestones), newest first"""
+    try:
+        alerts = await run_storage(goals_storage, "list_alerts", user_id, limit)
+        return {"user_id": user_id, "alerts": alerts, "count": len(alerts)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching alerts: {str(e)}"
         )
 
 # ============================================================================
 # APPLICATION STARTUP
 # ============================================================================
 
+startup_state["timings_ms"]["import"] = round((time.perf_counter() - _import_started) * 1000, 1)
+
 if __name__ == "__main__":
     import uvicorn
     
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
+    # production: no auto-reload. One worker by default: the profile cache,
+    # idempotency keys, ledger actors, balance streams and rate limiters all
+    # live in this process, so extra workers would read each other's stale
+    # balances, miss duplicate retries and multiply the rate limits. Move that
+    # state to a shared store before raising WEB_CONCURRENCY.
+    production = os.getenv("ENVIRONMENT", "development").lower() == "production"
+    workers = int(os.getenv("WEB_CONCURRENCY", "1")) if production else 1
     
     print("\n" + "="*60)
     print("🚀 RupeeReady AI - Self-Driving Wallet Starting...")
     print("="*60)
     print(f"📍 Server: http://{host}:{port}")
     print(f"📚 Docs: http://{host}:{port}/docs")
+    print(f"⚙️  Mode: {'production' if production else 'development'} ({workers} worker{'s' if workers > 1 else ''})")
     print("="*60 + "\n")
     
-    uvicorn.run(
-        "main:app",
+    options = dict(
         host=host,
         port=port,
-        reload=True
+        reload=not production,
+        workers=workers,
+        log_level=os.getenv("LOG_LEVEL", "info"),
+        # Open connections (balance streams included) may delay shutdown, and
+        # so the flush of buffered ledger writes, by at most this long
+        timeout_graceful_shutdown=int(os.getenv("SHUTDOWN_GRACE_SECONDS", "10"))
     )
+    if production and workers == 1:
+        class Server(uvicorn.Server):
+            """Ends balance streams as soon as shutdown begins, not after the grace period"""
+            
+            def handle_exit(self, sig, frame):
+                from main import balance_broker  # The served module, not __main__
+                balance_broker.close()
+                super().handle_exit(sig, frame)
+        
+        Server(uvicorn.Config("main:app", **options)).run()
+    else:
+        uvicorn.run("main:app", **options)
@@ -1,14 +1,29 @@
 """
 Mock Bank Simulator - RupeeReady AI
 Simulates real-time income transactions for testing the Chanakya Agent
+
+Usage:
+    python mock_bank.py                      # interactive single-user simulator
+    python mock_bank.py load --users 5000 --rate 200 --pattern poisson \
+        --duration 60 --output run.json      # async load generation
+    python mock_bank.py replay capture.ndjson --speed 4 \
+        --output replay.json                 # replay a TRAFFIC_CAPTURE_FILE log
 """
 
+import argparse
+import asyncio
+import math
 import requests
 import time
+import uuid
 import random
 import json
 from datetime import datetime
 
+import httpx
+
+from capture import REPLAY_HEADER, encode_replay_header, read_capture
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -16,6 +31,10 @@ from datetime import datetime
 INCOME_ENDPOINT = "http://localhost:8000/webhook/income"
 EXPENSE_ENDPOINT = "http://localhost:8000/api/check-expense"
 USER_ID = "user_123"
+# The backend rate-limits per source (RATE_LIMIT_SOURCE_HEADER, default
+# X-Source-Id): 200 requests/s with a burst of 400 unless the server sets
+# RATE_LIMIT_SOURCE_PER_SECOND=0. Load runs send one source per simulated user
+SOURCE_HEADER = "X-Source-Id"
 TRANSACTION_INTERVAL = 15  # seconds
 
 # Realistic income sources for gig workers
@@ -44,24 +63,26 @@ EXPENSE_CATEGORIES = {
 # HELPERS
 # ============================================================================
 
-def generate_income_transaction():
+def generate_income_transaction(user_id=USER_ID):
     """Generate a random income transaction"""
     return {
-        "user_id": USER_ID,
+        "user_id": user_id,
         "amount": random.randint(5000, 50000),
         "source": random.choice(INCOME_SOURCES),
+        "idempotency_key": uuid.uuid4().hex,  # lets the backend drop retried webhooks
     }
 
 
-def generate_expense_transaction():
+def generate_expense_transaction(user_id=USER_ID):
     """Generate a random expense transaction"""
     category = random.choice(list(EXPENSE_CATEGORIES.keys()))
     rng = EXPENSE_CATEGORIES[category]
     amount = random.randint(rng["min"], rng["max"])
     return ({
-        "user_id": USER_ID,
+        "user_id": user_id,
         "amount": amount,
         "category": category,
+        "idempotency_key": uuid.uuid4().hex,
     }, rng.get("emoji", ""))
 
 
@@ -187,5 +208,422 @@ def run_simulator():
         print("=" * 60 + "\n")
 
 
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+ARRIVAL_PATTERNS = ("constant", "poisson", "payday")
+
+# Latency histogram bucket upper bounds (milliseconds)
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class EndpointStats:
+    """Latencies, status codes and errors recorded for one endpoint"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.status_codes = {}
+        self.errors = 0
+
+    def record(self, latency_ms, status_code=None, error=False):
+        self.latencies_ms.append(latency_ms)
+        if status_code is not None:
+            key = str(status_code)
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+        if error:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies_ms)
+        count = len(latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            index = min(count - 1, max(0, math.ceil(p / 100 * count) - 1))
+            return round(latencies[index], 2)
+
+        histogram = {}
+        bucket_index = 0
+        for latency in latencies:
+            while bucket_index < len(HISTOGRAM_BUCKETS_MS) and latency > HISTOGRAM_BUCKETS_MS[bucket_index]:
+                bucket_index += 1
+            label = f"le_{HISTOGRAM_BUCKETS_MS[bucket_index]}ms" if bucket_index < len(HISTOGRAM_BUCKETS_MS) else "gt_30000ms"
+            histogram[label] = histogram.get(label, 0) + 1
+
+        return {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "status_codes": self.status_codes,
+            "latency_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": round(latencies[-1], 2) if latencies else None,
+                "mean": round(sum(latencies) / count, 2) if count else None,
+            },
+            "histogram": histogram,
+        }
+
+
+def arrival_rate(pattern, base_rate, elapsed, burst_every=30.0, burst_length=5.0, burst_multiplier=10.0):
+    """Requests per second at `elapsed` seconds into the run"""
+    if pattern == "payday" and elapsed % burst_every < burst_length:
+        return base_rate * burst_multiplier
+    return base_rate
+
+
+def next_interarrival(pattern, rate):
+    """Seconds until the next request for the given arrival pattern"""
+    if pattern == "constant":
+        return 1.0 / rate
+    # poisson and payday both draw exponential gaps (payday varies the rate)
+    return random.expovariate(rate)
+
+
+def parse_mix(mix):
+    """Parse 'income:6,expense:4,balance:0' into request-type weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition(":")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"income", "expense", "balance"}
+    if unknown:
+        raise ValueError(f"Unknown request types in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def build_request(base_url, users, weights, source_id=None):
+    """
+    Pick a simulated user and a request type; return (endpoint, method, url,
+    payload, headers). Requests come from the user's own source unless
+    `source_id` puts them all behind one
+    """
+    user_id = f"load_user_{random.randrange(users)}"
+    headers = {SOURCE_HEADER: source_id or user_id}
+    kind = random.choices(list(weights), weights=list(weights.values()))[0]
+    if kind == "income":
+        return "income", "POST", f"{base_url}/webhook/income", generate_income_transaction(user_id), headers
+    if kind == "expense":
+        transaction, _ = generate_expense_transaction(user_id)
+        return "expense", "POST", f"{base_url}/api/check-expense", transaction, headers
+    return "balance", "GET", f"{base_url}/api/user/{user_id}/balance", None, headers
+
+
+async def send_load_request(client, request, stats, semaphore):
+    """Send one request and record its latency under its endpoint"""
+    endpoint, method, url, payload, headers = request
+    try:
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, json=payload, headers=headers)
+            latency_ms = (time.perf_counter() - start) * 1000
+            stats[endpoint].record(latency_ms, resp.status_code, error=not resp.is_success)
+        except httpx.HTTPError as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            stats[endpoint].record(latency_ms, type(e).__name__, error=True)
+    finally:
+        semaphore.release()
+
+
+async def run_load(args):
+    """Open-loop load generation: arrivals follow the pattern regardless of response times"""
+    weights = parse_mix(args.mix)
+    stats = {name: EndpointStats() for name in weights}
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    tasks = set()
+    dropped = 0
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        next_send = start
+        while True:
+            now = time.perf_counter()
+            elapsed = now - start
+            if elapsed >= args.duration:
+                break
+            # Always yield, even when behind schedule, so responses get processed
+            await asyncio.sleep(max(0.0, next_send - now))
+
+            rate = arrival_rate(args.pattern, args.rate, elapsed, args.burst_every,
+                                args.burst_length, args.burst_multiplier)
+            next_send += next_interarrival(args.pattern, rate)
+
+            if semaphore.locked():
+                # Client-side saturation: count it instead of silently slowing down
+                dropped += 1
+                continue
+            await semaphore.acquire()
+            task = asyncio.create_task(
+                send_load_request(client, build_request(args.base_url, args.users, weights, args.source_id), stats, semaphore)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(s.latencies_ms) for s in stats.values())
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "pattern": args.pattern,
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": weights,
+            "connections": args.connections,
+            "max_in_flight": args.max_in_flight,
+        },
+        "started_at": datetime.now().isoformat(),
+        "elapsed_seconds": round(elapsed, 3),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "dropped_arrivals": dropped,
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+    }
+
+
+def print_load_report(report):
+    """Human-readable summary of a load run"""
+    print("\n" + "=" * 60)
+    print("📊 LOAD TEST RESULTS")
+    print("=" * 60)
+    print(f"⏱️  Elapsed: {report['elapsed_seconds']}s  |  Requests: {report['total_requests']}  "
+          f"|  Throughput: {report['throughput_rps']} req/s")
+    if report["dropped_arrivals"]:
+        print(f"⚠️ Dropped arrivals (client saturated): {report['dropped_arrivals']}")
+    print(f"\n{'endpoint':<10} {'reqs':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>7}")
+    for name, summary in report["endpoints"].items():
+        latency = summary["latency_ms"]
+        print(f"{name:<10} {summary['requests']:>7} {summary['throughput_rps']:>8} "
+              f"{latency['p50'] or 0:>8} {latency['p95'] or 0:>8} {latency['p99'] or 0:>8} "
+              f"{summary['error_rate'] * 100:>6.2f}%")
+    print("=" * 60 + "\n")
+
+
+def run_load_generator(args):
+    """Entry point for `python mock_bank.py load`"""
+    print("\n" + "=" * 60)
+    print("🏦 MOCK BANK LOAD GENERATOR")
+    print("=" * 60)
+    print(f"🎯 Target: {args.base_url}")
+    print(f"👥 Simulated users: {args.users}")
+    print(f"📈 Arrivals: {args.pattern} @ {args.rate} req/s for {args.duration}s")
+    print("=" * 60)
+
+    report = asyncio.run(run_load(args))
+    print_load_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    return report
+
+
+# ============================================================================
+# TRAFFIC REPLAY
+# ============================================================================
+
+REPLAY_ENDPOINTS = {
+    "/webhook/income": "income",
+    "/webhook/income/batch": "income_batch",
+    "/api/check-expense": "expense",
+}
+
+
+async def send_replay_request(client, base_url, record, replayed, mismatches, semaphore):
+    """Reissue one captured request with its recorded Gemini replies attached"""
+    endpoint = REPLAY_ENDPOINTS.get(record["path"], record["path"])
+    headers = {REPLAY_HEADER: encode_replay_header(record.get("gemini", []))}
+    body = record.get("body")
+    # Resend the recorded content type (older captures did not record one)
+    content_type = record.get("content_type") or "application/json"
+    if isinstance(body, str):
+        request = {"content": body, "headers": dict(headers, **{"content-type": content_type})}
+    else:
+        request = {"json": body, "headers": dict(headers, **{"content-type": content_type})}
+    try:
+        start = time.perf_counter()
+        try:
+            resp = await client.post(f"{base_url}{record['path']}", **request)
+            latency_ms = (time.perf_counter() - start) * 1000
+            replayed[endpoint].record(latency_ms, resp.status_code, error=not resp.is_success)
+            if resp.status_code != record.get("status"):
+                mismatches[endpoint] = mismatches.get(endpoint, 0) + 1
+        except httpx.HTTPError as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            replayed[endpoint].record(latency_ms, type(e).__name__, error=True)
+            mismatches[endpoint] = mismatches.get(endpoint, 0) + 1
+    finally:
+        semaphore.release()
+
+
+async def run_replay(args):
+    """
+    Reissue captured requests at their recorded offsets divided by --speed.
+    The target should run with GEMINI_STUB=replay so every request gets the
+    Gemini replies (and Gemini latency) it got when it was recorded. Replay
+    against fresh storage: captured idempotency keys are sent again as-is.
+    """
+    records = sorted(read_capture(args.capture), key=lambda r: r["ts"])
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        raise ValueError(f"No requests found in {args.capture}")
+
+    recorded, replayed = {}, {}
+    for record in records:
+        endpoint = REPLAY_ENDPOINTS.get(record["path"], record["path"])
+        if endpoint not in recorded:
+            recorded[endpoint], replayed[endpoint] = EndpointStats(), EndpointStats()
+        recorded[endpoint].record(record["ms"], record.get("status"), error=record.get("status", 500) >= 400)
+    recorded_span = records[-1]["ts"] - records[0]["ts"]
+
+    mismatches = {}
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    tasks = set()
+    dropped = 0
+
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        for record in records:
+            send_at = start + (record["ts"] - records[0]["ts"]) / args.speed
+            await asyncio.sleep(max(0.0, send_at - time.perf_counter()))
+            if semaphore.locked():
+                dropped += 1
+                continue
+            await semaphore.acquire()
+            task = asyncio.create_task(
+                send_replay_request(client, args.base_url, record, replayed, mismatches, semaphore)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in recorded:
+        before = recorded[name].summary(recorded_span)
+        after = replayed[name].summary(elapsed)
+        endpoints[name] = {
+            "recorded": before,
+            "replayed": after,
+            "latency_delta_ms": {
+                key: round(after["latency_ms"][key] - before["latency_ms"][key], 2)
+                for key in ("p50", "p95", "p99", "mean")
+                if after["latency_ms"][key] is not None and before["latency_ms"][key] is not None
+            },
+            "status_mismatches": mismatches.get(name, 0),
+        }
+    return {
+        "config": {
+            "capture": args.capture,
+            "base_url": args.base_url,
+            "speed": args.speed,
+            "connections": args.connections,
+            "max_in_flight": args.max_in_flight,
+        },
+        "started_at": datetime.now().isoformat(),
+        "recorded_seconds": round(recorded_span, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "total_requests": len(records),
+        "dropped_arrivals": dropped,
+        "endpoints": endpoints,
+    }
+
+
+def print_replay_report(report):
+    """Recorded vs replayed latency per endpoint"""
+    print("\n" + "=" * 60)
+    print("📼 REPLAY RESULTS")
+    print("=" * 60)
+    print(f"⏱️  Recorded: {report['recorded_seconds']}s  |  Replayed: {report['elapsed_seconds']}s  "
+          f"|  Requests: {report['total_requests']}")
+    if report["dropped_arrivals"]:
+        print(f"⚠️ Dropped arrivals (client saturated): {report['dropped_arrivals']}")
+    print(f"\n{'endpoint':<13} {'reqs':>6} {'p50':>17} {'p95':>17} {'p99':>17} {'status≠':>8}")
+    for name, result in report["endpoints"].items():
+        before, after = result["recorded"]["latency_ms"], result["replayed"]["latency_ms"]
+        columns = [f"{before[p] or 0:>7}→{after[p] or 0:<8}" for p in ("p50", "p95", "p99")]
+        print(f"{name:<13} {result['replayed']['requests']:>6} {' '.join(columns)} {result['status_mismatches']:>8}")
+    print("(latencies in ms, recorded→replayed)")
+    print("=" * 60 + "\n")
+
+
+def run_replay_tool(args):
+    """Entry point for `python mock_bank.py replay`"""
+    print("\n" + "=" * 60)
+    print("🏦 MOCK BANK TRAFFIC REPLAY")
+    print("=" * 60)
+    print(f"📼 Capture: {args.capture}")
+    print(f"🎯 Target: {args.base_url} @ {args.speed}x")
+    print("=" * 60)
+
+    report = asyncio.run(run_replay(args))
+    print_replay_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Mock Bank Simulator - RupeeReady AI")
+    subparsers = parser.add_subparsers(dest="command")
+
+    load = subparsers.add_parser("load", help="async load generation with many simulated users")
+    load.add_argument("--base-url", default="http://localhost:8000")
+    load.add_argument("--users", type=int, default=1000, help="number of simulated users")
+    load.add_argument("--rate", type=float, default=50.0, help="mean arrivals per second")
+    load.add_argument("--pattern", choices=ARRIVAL_PATTERNS, default="poisson")
+    load.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    load.add_argument("--mix", default="income:6,expense:4", help="request weights, e.g. income:5,expense:3,balance:2")
+    load.add_argument("--connections", type=int, default=100, help="connection pool size")
+    load.add_argument("--max-in-flight", type=int, default=1000)
+    load.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    load.add_argument("--burst-every", type=float, default=30.0, help="payday: seconds between bursts")
+    load.add_argument("--burst-length", type=float, default=5.0, help="payday: burst duration in seconds")
+    load.add_argument("--burst-multiplier", type=float, default=10.0, help="payday: rate multiplier during bursts")
+    load.add_argument("--seed", type=int, default=None)
+    load.add_argument("--source-id", help="send every request as this one X-Source-Id (default: one per user); "
+                                          "the server then allows it 200 req/s, burst 400, unless "
+                                          "RATE_LIMIT_SOURCE_PER_SECOND=0")
+    load.add_argument("--output", help="write the JSON report to this file")
+
+    replay = subparsers.add_parser("replay", help="reissue captured traffic (TRAFFIC_CAPTURE_FILE)")
+    replay.add_argument("capture", help="capture log written with TRAFFIC_CAPTURE_FILE")
+    replay.add_argument("--base-url", default="http://localhost:8000")
+    replay.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, e.g. 4 for 4x")
+    replay.add_argument("--limit", type=int, default=None, help="only replay the first N requests")
+    replay.add_argument("--connections", type=int, default=100, help="connection pool size")
+    replay.add_argument("--max-in-flight", type=int, default=1000)
+    replay.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    replay.add_argument("--output", help="write the JSON report to this file")
+    return parser
+
+
 if __name__ == "__main__":
-    run_simulator() 
+    args = build_parser().parse_args()
+    if args.command == "load":
+        if args.seed is not None:
+            random.seed(args.seed)
+        run_load_generator(args)
+    elif args.command == "replay":
+        if args.speed <= 0:
+            raise SystemExit("--speed must be positive")
+        run_replay_tool(args)
+    else:
+        run_simulator()
+
@@ -0,0 +1,327 @@
+"""
+Resilience - RupeeReady AI
+Circuit breaker that stops calling a degraded dependency (Gemini) after
+repeated failures and probes it for recovery, plus admission control:
+token-bucket rate limits per user and per source, and a weighted fair queue
+in front of the shared Gemini capacity that sheds load instead of letting
+requests time out.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker.
+
+    - closed: calls flow; `failure_threshold` consecutive failures open it.
+    - open: calls are refused until `reset_timeout` seconds have passed.
+    - half_open: up to `half_open_max_calls` probe calls are let through;
+      a successful probe closes the circuit, a failed one re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed (reserving a probe slot when half-open)"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probes_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self._probes_in_flight = 0
+
+    def stats(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+        }
+
+
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+class Overloaded(Exception):
+    """A request was shed; retry_after is how long the caller should back off (seconds)"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason}: retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Holds up to `burst` tokens, refilled at `rate` per second"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Spend `cost` tokens; returns 0 if admitted, else seconds until it would be"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per key (user id, source). Buckets of the least recently
+    seen keys are dropped beyond `max_keys`; a dropped key comes back with a
+    full bucket. A rate of 0 disables the limiter.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def check(self, key: Hashable, cost: float = 1.0) -> float:
+        """Charge `cost` to key's bucket; returns 0 if admitted, else the Retry-After in seconds"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now, min(cost, self.burst))
+            if wait:
+                self.rejected += 1
+            else:
+                self.admitted += 1
+            return wait
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "keys": len(self._buckets),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class FairQueue:
+    """
+    Weighted fair queue in front of `capacity` concurrent slots, two levels
+    of start-time fair queuing. Free slots go to the waiting classes in
+    proportion to their weights (a class that was idle gets no saved-up
+    credit), and within a class to its flows in turn, so one flow's backlog
+    only delays that flow.
+
+    A request is shed with Overloaded rather than left to time out when its
+    expected wait exceeds `max_wait`, when it is still waiting after
+    `max_wait`, or when the queue is full. When the queue is full, a newcomer
+    that outranks the last waiter of the lowest-weight class takes its place.
+
+    acquire() and release() must be called from the event loop thread.
+    """
+
+    def __init__(self, capacity: int, weights: Dict[str, float], max_waiting: int = 256,
+                 default_weight: float = 1.0):
+        self.capacity = capacity
+        self.weights = weights
+        self.max_waiting = max_waiting
+        self.default_weight = default_weight
+        self._virtual_time = 0.0                       # across classes
+        self._class_finish: Dict[str, float] = {}
+        self._class_time: Dict[str, float] = {}        # within each class
+        self._flow_finish: Dict[Hashable, float] = {}  # (class, flow) -> next start stamp
+        self._waiting: Dict[str, list] = {}            # class -> heap of (stamp, seq, future)
+        self._size = 0
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._service_time: Optional[float] = None     # moving average of slot hold time (s)
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+
+    def _weight(self, cls: str) -> float:
+        return self.weights.get(cls, self.default_weight)
+
+    def _expected_wait(self, cls: str, ahead: int) -> float:
+        """Slots go to cls at its weighted share of the classes now waiting"""
+        backlogged = set(self._waiting) | {cls}
+        share = self._weight(cls) / sum(self._weight(name) for name in backlogged)
+        return (ahead + 1) / (self.capacity * share) * (self._service_time or 0.0)
+
+    def _shed(self, reason: str, retry_after: float) -> Overloaded:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        return Overloaded(reason, max(retry_after, self._service_time or 0.0))
+
+    def _remove(self, cls: str, future) -> bool:
+        heap = self._waiting.get(cls, [])
+        kept = [waiter for waiter in heap if waiter[2] is not future]
+        if len(kept) == len(heap):
+            return False
+        heapq.heapify(kept)
+        if kept:
+            self._waiting[cls] = kept
+        else:
+            del self._waiting[cls]
+        self._size -= 1
+        return True
+
+    def _preempt(self, cls: str, stamp: float) -> bool:
+        """Make room for a newcomer by shedding a waiter it outranks"""
+        if not self._waiting:
+            return False
+        victim_cls = min(self._waiting, key=lambda name: (self._weight(name), -max(self._waiting[name])[0]))
+        last = max(self._waiting[victim_cls])
+        outranked = (self._weight(victim_cls) < self._weight(cls)
+                     or (victim_cls == cls and last[0] > stamp))
+        if not outranked:
+            return False
+        self._remove(victim_cls, last[2])
+        retry_after = self._expected_wait(victim_cls, len(self._waiting.get(victim_cls, ())))
+        last[2].set_exception(self._shed("preempted", retry_after))
+        return True
+
+    async def acquire(self, cls: str, flow: Hashable = None, max_wait: float = float("inf")):
+        """Wait for a slot (raises Overloaded); pair with release()"""
+        if self._in_flight < self.capacity and not self._size:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        key = (cls, flow)
+        previous = self._flow_finish.get(key)
+        stamp = max(self._class_time.get(cls, 0.0), previous or 0.0)
+        ahead = sum(1 for waiter in self._waiting.get(cls, ()) if waiter[0] <= stamp)
+        expected = self._expected_wait(cls, ahead)
+        if expected > max_wait:
+            raise self._shed("queue_wait", expected)
+        if self._size >= self.max_waiting and not self._preempt(cls, stamp):
+            raise self._shed("queue_full", expected)
+
+        self._flow_finish[key] = stamp + 1.0
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting.setdefault(cls, []), (stamp, next(self._seq), future))
+        self._size += 1
+        self._prune()
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except asyncio.TimeoutError:
+            self._remove(cls, future)
+            raise self._shed("queue_timeout", self._expected_wait(cls, len(self._waiting.get(cls, ()))))
+        except BaseException:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()  # Granted a slot just as the caller gave up
+            else:
+                self._remove(cls, future)
+            raise
+        self.admitted += 1
+
+    def release(self, held: Optional[float] = None):
+        """Free a slot; `held` (seconds) feeds the wait estimate"""
+        self._in_flight -= 1
+        if held is not None:
+            self._service_time = held if self._service_time is None else 0.8 * self._service_time + 0.2 * held
+        while self._size and self._in_flight < self.capacity:
+            # Class with the smallest start stamp (ties to the heavier), then its flow with the smallest
+            starts = {cls: max(self._virtual_time, self._class_finish.get(cls, 0.0)) for cls in self._waiting}
+            cls = min(starts, key=lambda name: (starts[name], -self._weight(name)))
+            self._virtual_time = starts[cls]
+            self._class_finish[cls] = starts[cls] + 1.0 / self._weight(cls)
+            heap = self._waiting[cls]
+            stamp, _, future = heapq.heappop(heap)
+            if not heap:
+                del self._waiting[cls]
+            self._size -= 1
+            self._class_time[cls] = stamp
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _prune(self):
+        # Flows stamped at or behind their class's virtual time would start from it anyway
+        if len(self._flow_finish) > 4 * (self.max_waiting + self.capacity):
+            self._flow_finish = {
+                key: finish for key, finish in self._flow_finish.items()
+                if finish > self._class_time.get(key[0], 0.0)
+            }
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "waiting": self._size,
+            "waiting_by_class": {cls: len(heap) for cls, heap in self._waiting.items()},
+            "max_waiting": self.max_waiting,
+            "weights": dict(self.weights),
+            "service_time_ms": round(self._service_time * 1000, 1) if self._service_time is not None else None,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
@@ -0,0 +1,153 @@
+"""
+Rollups - RupeeReady AI
+Daily, weekly and monthly per-user summaries (income by source, expenses by
+category, tax vault growth). Storage backends update them incrementally in the
+same commit as each transaction; this module defines the rollup shape and the
+job that rebuilds them from the raw transaction log.
+
+Usage:
+    python rollups.py rebuild               # recompute every user's rollups
+    python rollups.py rebuild --user u123   # just one user
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+PERIODS = ("day", "week", "month")
+
+# (user_id, period, period_key), e.g. ("u123", "week", "2025-W07")
+RollupKey = Tuple[str, str, str]
+
+# ============================================================================
+# ROLLUP SHAPE
+# ============================================================================
+
+def period_keys(timestamp: str) -> Dict[str, str]:
+    """Day, ISO week and month keys for an ISO-8601 timestamp"""
+    moment = datetime.fromisoformat(timestamp)
+    year, week, _ = moment.isocalendar()
+    return {
+        "day": moment.strftime("%Y-%m-%d"),
+        "week": f"{year}-W{week:02d}",
+        "month": moment.strftime("%Y-%m"),
+    }
+
+
+def current_period_key(period: str) -> str:
+    return period_keys(datetime.now().isoformat())[period]
+
+
+def entry_deltas(entry: dict) -> dict:
+    """What one log entry adds to its rollups (empty for untracked types)"""
+    amount = entry.get("amount", 0)
+    if entry.get("type") == "income":
+        return {
+            "income_total": amount,
+            "income_count": 1,
+            "tax_vault_growth": entry.get("tax_allocated", 0),
+            "income_by_source": {entry.get("source") or "unknown": amount},
+        }
+    if entry.get("type") == "expense":
+        return {
+            "expense_total": amount,
+            "expense_count": 1,
+            "expenses_by_category": {(entry.get("category") or "other").strip().lower(): amount},
+        }
+    if entry.get("type") == "settlement":
+        # Deferred income was counted when received; its tax split lands now
+        return {"tax_vault_growth": entry.get("tax_allocated", 0)}
+    return {}
+
+
+def rollup_keys(entry: dict) -> List[RollupKey]:
+    """Rollup documents a log entry contributes to"""
+    if not entry_deltas(entry):
+        return []
+    keys = period_keys(entry["timestamp"])
+    return [(entry["user_id"], period, keys[period]) for period in PERIODS]
+
+
+def add_deltas(target: dict, deltas: dict):
+    """Sum deltas into target in place (one level of nested breakdowns)"""
+    for name, value in deltas.items():
+        if isinstance(value, dict):
+            breakdown = target.setdefault(name, {})
+            for key, amount in value.items():
+                breakdown[key] = breakdown.get(key, 0) + amount
+        else:
+            target[name] = target.get(name, 0) + value
+
+
+def merge_rollup_deltas(entries: Iterable[dict]) -> Dict[RollupKey, dict]:
+    """Collapse log entries into one summed delta per rollup document"""
+    rollups: Dict[RollupKey, dict] = {}
+    for entry in entries:
+        deltas = entry_deltas(entry)
+        if not deltas:
+            continue
+        for key in rollup_keys(entry):
+            add_deltas(rollups.setdefault(key, {}), deltas)
+    return rollups
+
+
+def empty_rollup(user_id: str, period: str, period_key: str) -> dict:
+    return {
+        "user_id": user_id,
+        "period": period,
+        "period_key": period_key,
+        "income_total": 0.0,
+        "income_count": 0,
+        "tax_vault_growth": 0.0,
+        "income_by_source": {},
+        "expense_total": 0.0,
+        "expense_count": 0,
+        "expenses_by_category": {},
+    }
+
+# ============================================================================
+# REBUILD JOB
+# ============================================================================
+
+def rebuild_rollups(storage, user_id: str = None, chunk_size: int = 1000) -> dict:
+    """
+    Recompute rollups from the transaction log in one streaming pass and
+    replace the stored ones. Memory grows with the number of rollup
+    documents, not with the number of transactions. Writes that land while
+    the job runs may be overwritten, so run it when traffic is quiet.
+    """
+    start = time.perf_counter()
+    rollups: Dict[RollupKey, dict] = {}
+    scanned = 0
+    for chunk in storage.scan_transactions(user_id=user_id, chunk_size=chunk_size):
+        scanned += len(chunk)
+        for key, deltas in merge_rollup_deltas(chunk).items():
+            add_deltas(rollups.setdefault(key, {}), deltas)
+    storage.replace_rollups(rollups, user_id=user_id)
+    return {
+        "transactions_scanned": scanned,
+        "rollups_written": len(rollups),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Rebuild RupeeReady rollups from the transaction log")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user", help="only rebuild this user's rollups")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="transactions read per storage call")
+    args = parser.parse_args()
+
+    load_dotenv()
+    storage = create_storage()
+    try:
+        print(f"🔁 Rebuilding rollups from {storage.name} ({'user ' + args.user if args.user else 'all users'})...")
+        report = rebuild_rollups(storage, user_id=args.user, chunk_size=args.chunk_size)
+        print(f"✅ {report['transactions_scanned']} transactions -> "
+              f"{report['rollups_written']} rollups in {report['seconds']}s")
+    finally:
+        storage.close()
@@ -0,0 +1,212 @@
+"""
+Income Settlement - RupeeReady AI
+End-of-day tax settlement for INCOME_SETTLEMENT_MODE=deferred. Income
+webhooks only add the gross amount to the user's pending_income; this job
+splits every user's pending income between tax vault and safe balance in one
+pass: users are read in chunks, each chunk gets one bounded-concurrency wave
+of Chanakya decisions and is written with batched ledger commits. Savings
+goals get their share of the safe allocation (with milestone alerts) at
+settlement, exactly as an immediately settled income would give them.
+
+Each user's settlement (pending decrement, split and log entry) commits
+atomically, and progress is checkpointed after every chunk, so a job that
+crashes can simply be run again: it resumes after the last committed chunk
+and never settles the same income twice.
+
+Usage:
+    python settlement.py run                        # settle today's pending income
+    python settlement.py run --run-id settlement-2025-02-14
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import AsyncContextManager, Awaitable, Callable, Iterable, List, Optional
+
+from goals import plan_goal_updates
+
+PENDING_FLAG = "settlement_pending"  # profile field set by deferred income webhooks
+
+
+@asynccontextmanager
+async def _no_exclusion(user_ids):
+    yield
+
+
+def default_run_id() -> str:
+    return f"settlement-{date.today().isoformat()}"
+
+
+def settlement_item(user_id: str, profile: dict, decision, run_id: str, now: str,
+                    goals: List[dict] = (), goal_share: float = 0.0) -> dict:
+    """
+    Ledger entry moving a user's pending income into tax vault and safe
+    balance, with `goal_share` of the safe part allocated to their goals
+    """
+    pending = profile["pending_income"]
+    tax_amount = pending * decision.percentage / 100
+    safe_amount = pending - tax_amount
+    allocations, goal_updates, alerts = plan_goal_updates(goals, safe_amount * goal_share, now)
+    goal_amount = round(sum(allocations.values()), 2)
+    safe_amount -= goal_amount
+    increments = {
+        "pending_income": -pending,
+        "safe_balance": safe_amount,
+        "tax_vault": tax_amount,
+    }
+    if goal_amount:
+        increments["goal_savings"] = goal_amount
+    item = {
+        "user_id": user_id,
+        "increments": increments,
+        "fields": {
+            PENDING_FLAG: False,
+            "last_settlement_id": run_id,
+            "last_settled_at": now,
+            "created_at": profile.get("created_at", now),
+        },
+        "entry": {
+            "user_id": user_id,
+            "type": "settlement",
+            "amount": pending,
+            "tax_allocated": tax_amount,
+            "safe_allocated": safe_amount,
+            "goal_allocated": goal_amount,
+            "tax_percentage": decision.percentage,
+            "decision_path": decision.path,
+            "settlement_id": run_id,
+            "timestamp": now,
+        },
+    }
+    if goal_updates:
+        item["goals"] = goal_updates
+    if alerts:
+        item["alerts"] = alerts
+    return item
+
+
+async def run_settlement(storage, decide: Callable[[dict, float], Awaitable],
+                         commit: Callable[[List[dict]], Awaitable], run_blocking: Callable[..., Awaitable],
+                         exclusive: Callable[[Iterable[str]], AsyncContextManager] = _no_exclusion,
+                         goal_share: Optional[Callable[[dict], float]] = None,
+                         run_id: Optional[str] = None, chunk_size: int = 200, concurrency: int = 16) -> dict:
+    """
+    Settle every user flagged with pending income. `decide(profile, amount)`
+    returns a TaxDecision, `commit(items)` writes ledger items in batches,
+    `run_blocking(func, *args)` runs a blocking storage call off the loop and
+    `exclusive(user_ids)` keeps other writers for those users out while their
+    pending amounts are re-read and settled. `goal_share(profile)` is the
+    fraction of the safe allocation that goes to the user's goals (None: none).
+    """
+    run_id = run_id or default_run_id()
+    state = await run_blocking(storage.get_job_state, run_id) or {}
+    resumed = state.get("status") == "running"
+    if not resumed:
+        state = {
+            "run_id": run_id,
+            "cursor": None,
+            "users_settled": 0,
+            "users_failed": 0,
+            "amount_settled": 0.0,
+            "tax_allocated": 0.0,
+            "goal_allocated": 0.0,
+            "decision_paths": {},
+            "chunks": 0,
+            "started_at": datetime.now().isoformat(),
+        }
+    state["status"] = "running"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_decide(profile: dict):
+        async with semaphore:
+            return await decide(profile, profile["pending_income"])
+
+    start = time.perf_counter()
+    settled_this_run = 0
+    while True:
+        chunk = await run_blocking(storage.pending_settlements, chunk_size, state["cursor"])
+        if not chunk:
+            break
+        chunk_ids = [user_id for user_id, _ in chunk]
+        chunk = [(user_id, profile) for user_id, profile in chunk if profile.get("pending_income", 0) > 0]
+
+        # One wave of decisions for the chunk (cached buckets skip Gemini)
+        decisions = await asyncio.gather(*(bounded_decide(profile) for _, profile in chunk), return_exceptions=True)
+        decided = {}
+        for (user_id, _), decision in zip(chunk, decisions):
+            if isinstance(decision, Exception):
+                state["users_failed"] += 1  # still flagged: picked up by the next run
+            else:
+                decided[user_id] = decision
+
+        # Settle exactly what is pending once nobody else can add to it
+        items = []
+        async with exclusive(decided):
+            profiles = await run_blocking(storage.get_users, list(decided))
+            settle_ids = [user_id for user_id in decided if profiles.get(user_id, {}).get("pending_income", 0) > 0]
+            goals = {}
+            if goal_share is not None:
+                user_goals = await asyncio.gather(*(run_blocking(storage.list_goals, user_id) for user_id in settle_ids))
+                goals = dict(zip(settle_ids, user_goals))
+            now = datetime.now().isoformat()
+            for user_id in settle_ids:
+                profile = profiles[user_id]
+                items.append(settlement_item(
+                    user_id, profile, decided[user_id], run_id, now,
+                    goals=goals.get(user_id, ()),
+                    goal_share=goal_share(profile) if goal_share is not None else 0.0
+                ))
+            if items:
+                await commit(items)
+
+        for item in items:
+            entry = item["entry"]
+            state["amount_settled"] = round(state["amount_settled"] + entry["amount"], 2)
+            state["tax_allocated"] = round(state["tax_allocated"] + entry["tax_allocated"], 2)
+            state["goal_allocated"] = round(state.get("goal_allocated", 0.0) + entry["goal_allocated"], 2)
+            paths = state["decision_paths"]
+            paths[entry["decision_path"]] = paths.get(entry["decision_path"], 0) + 1
+        state["users_settled"] += len(items)
+        settled_this_run += len(items)
+        state["chunks"] += 1
+        state["cursor"] = chunk_ids[-1]
+        state["updated_at"] = datetime.now().isoformat()
+        await run_blocking(storage.save_job_state, run_id, state)
+
+    elapsed = time.perf_counter() - start
+    state["status"] = "completed"
+    state["cursor"] = None
+    state["finished_at"] = datetime.now().isoformat()
+    await run_blocking(storage.save_job_state, run_id, state)
+    return dict(
+        state,
+        resumed=resumed,
+        seconds=round(elapsed, 3),
+        users_per_second=round(settled_this_run / elapsed, 2) if elapsed else 0.0,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Settle deferred RupeeReady income into tax vault and safe balance")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--run-id", help="settlement run to start or resume (default: today's)")
+    args = parser.parse_args()
+
+    import main  # Settlement uses the app's storage, Chanakya and ledger commit path
+
+    async def settle():
+        await main.warm_up()
+        try:
+            return await main.settle_pending_income(args.run_id)
+        finally:
+            main.shutdown()
+
+    print(f"🧾 Settling pending income ({args.run_id or default_run_id()})...")
+    report = asyncio.run(settle())
+    print(f"✅ {report['users_settled']} users, ₹{report['amount_settled']:,} settled "
+          f"(₹{report['tax_allocated']:,} to tax vault) in {report['seconds']}s "
+          f"- {report['users_per_second']} users/s{' (resumed)' if report['resumed'] else ''}")
+    if report["users_failed"]:
+        print(f"⚠️ {report['users_failed']} users failed and stay pending for the next run")
@@ -0,0 +1,926 @@
+"""
+Storage Backends - RupeeReady AI
+User profiles, the transactions log, per-period rollups, savings goals and
+alerts behind one interface, with Firestore, in-memory and SQLite
+implementations. Select one with STORAGE_BACKEND.
+
+All methods are blocking; main.py runs them on its storage executor
+(storage_executor), whichever backend is selected.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from rollups import RollupKey, add_deltas, empty_rollup, merge_rollup_deltas
+from settlement import PENDING_FLAG
+
+FIRESTORE_IN_LIMIT = 30  # values per Firestore 'in' filter
+
+# ============================================================================
+# INTERFACE
+# ============================================================================
+
+def merge_ledger_entries(entries: List[dict]) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """
+    Collapse ledger entries (user_id, increments, fields, entry) into one
+    summed increment dict and one merged field dict per user.
+    """
+    increments = {}
+    fields = {}
+    for item in entries:
+        user_increments = increments.setdefault(item["user_id"], {})
+        for key, value in item["increments"].items():
+            user_increments[key] = user_increments.get(key, 0) + value
+        fields.setdefault(item["user_id"], {}).update(item["fields"])
+    return increments, fields
+
+
+def merge_goal_updates(entries: List[dict]) -> Dict[str, dict]:
+    """
+    Collapse the entries' optional goal updates (goal_id -> increments,
+    fields) into one summed update per goal.
+    """
+    goals = {}
+    for item in entries:
+        for goal_id, update in item.get("goals", {}).items():
+            merged = goals.setdefault(goal_id, {"increments": {}, "fields": {}})
+            for key, value in update.get("increments", {}).items():
+                merged["increments"][key] = merged["increments"].get(key, 0) + value
+            merged["fields"].update(update.get("fields", {}))
+    return goals
+
+
+class InvalidCursor(ValueError):
+    """A pagination `after` entry whose id this backend never issued"""
+
+
+class StorageBackend:
+    """Interface for user profiles and the transactions log"""
+
+    name = "base"
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        """Return the stored profile, or None if the user has none yet"""
+        raise NotImplementedError
+
+    def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        """Return stored profiles for the users that have one"""
+        profiles = {}
+        for user_id in user_ids:
+            profile = self.get_user(user_id)
+            if profile is not None:
+                profiles[user_id] = profile
+        return profiles
+
+    def update_user(self, user_id: str, updates: dict):
+        """Overwrite fields on an existing profile; returns the write's version like commit_ledger"""
+        raise NotImplementedError
+
+    def adjust_users(self, increments: Dict[str, dict]):
+        """
+        Atomically add user_id -> {field: delta} to existing profiles without
+        logging a transaction (balance corrections; at most 500 users per call)
+        """
+        raise NotImplementedError
+
+    def commit_ledger(self, entries: List[dict]):
+        """
+        Atomically apply every entry's balance increments and field updates
+        to its user's profile (creating it if needed), append its log entry
+        and add it to the user's day/week/month rollups. Entries may also
+        carry "goals" updates (applied to existing goals only) and "alerts"
+        documents to create. Returns the commit's version (an orderable
+        update time) when the backend has watch_user listeners, else None.
+        """
+        raise NotImplementedError
+
+    def list_goals(self, user_id: str) -> List[dict]:
+        """Return a user's goals, each with its id"""
+        raise NotImplementedError
+
+    def list_goals_for_users(self, user_ids: List[str]) -> Dict[str, List[dict]]:
+        """Return user_id -> goals (each with its id) for several users"""
+        return {user_id: self.list_goals(user_id) for user_id in user_ids}
+
+    def get_goal(self, goal_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def create_goal(self, goal: dict) -> str:
+        """Store a new goal and return its id"""
+        raise NotImplementedError
+
+    def update_goal(self, goal_id: str, updates: dict):
+        """Overwrite fields on an existing goal"""
+        raise NotImplementedError
+
+    def delete_goal(self, goal_id: str):
+        raise NotImplementedError
+
+    def list_alerts(self, user_id: str, limit: int) -> List[dict]:
+        """Return a user's most recent alerts, newest first, each with its id"""
+        raise NotImplementedError
+
+    def pending_settlements(self, limit: int, after: Optional[str] = None) -> List[Tuple[str, dict]]:
+        """
+        Return up to `limit` (user_id, profile) pairs for users flagged with
+        deferred income, in user_id order, starting after user_id `after`.
+        """
+        raise NotImplementedError
+
+    def get_job_state(self, job_id: str) -> Optional[dict]:
+        """Return a batch job's checkpoint, or None if it never ran"""
+        raise NotImplementedError
+
+    def save_job_state(self, job_id: str, state: dict):
+        raise NotImplementedError
+
+    def get_rollup(self, user_id: str, period: str, period_key: str) -> Optional[dict]:
+        """Return one rollup document, or None if nothing was recorded in it"""
+        raise NotImplementedError
+
+    def scan_transactions(self, user_id: Optional[str] = None, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        """Yield the whole transaction log (or one user's) in chunks"""
+        if user_id is None:
+            raise NotImplementedError
+        after = None
+        while True:
+            page = self.query_transactions(user_id, chunk_size, after=after)
+            if page:
+                yield page
+            if len(page) < chunk_size:
+                return
+            after = page[-1]
+
+    def replace_rollups(self, rollups: Dict[RollupKey, dict], user_id: Optional[str] = None):
+        """Drop stored rollups (all, or one user's) and write these instead"""
+        raise NotImplementedError
+
+    def query_transactions(self, user_id: str, limit: int, after: Optional[dict] = None,
+                           type: Optional[str] = None, category: Optional[str] = None) -> List[dict]:
+        """
+        Return up to `limit` of a user's log entries, newest first, each with
+        its "id". Pass the last entry of a page as `after` to continue from it
+        (keyset pagination on timestamp, then id); raises InvalidCursor if its
+        id cannot be one of this backend's.
+        """
+        raise NotImplementedError
+
+    def watch_user(self, user_id: str, on_change: Callable[[str, Optional[dict], object], None]):
+        """
+        Call on_change(user_id, profile_or_None, version) whenever one user's
+        profile changes, including this process's own writes (compare the
+        version with the one commit_ledger returned). Returns an object with
+        unsubscribe(), or None when the backend has no other writers.
+        """
+        return None
+
+    def close(self):
+        pass
+
+# ============================================================================
+# FIRESTORE
+# ============================================================================
+
+class FirestoreStorage(StorageBackend):
+    """Cloud Firestore: `users` documents and a `transactions` collection"""
+
+    name = "firestore"
+
+    def __init__(self, client):
+        from firebase_admin import firestore
+        self.db = client
+        self._increment = firestore.Increment
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        user_doc = self.db.collection('users').document(user_id).get()
+        return user_doc.to_dict() if user_doc.exists else None
+
+    def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        refs = [self.db.collection('users').document(user_id) for user_id in user_ids]
+        return {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in self.db.get_all(refs)
+            if snapshot.exists
+        }
+
+    def update_user(self, user_id: str, updates: dict):
+        return self.db.collection('users').document(user_id).update(updates).update_time
+
+    def adjust_users(self, increments):
+        batch = self.db.batch()
+        for user_id, deltas in increments.items():
+            batch.update(
+                self.db.collection('users').document(user_id),
+                {key: self._increment(value) for key, value in deltas.items()},
+            )
+        batch.commit()
+
+    def commit_ledger(self, entries: List[dict]):
+        # One merged write per user (server-side increments) plus one write per
+        # log entry, all in a single batch
+        increments, fields = merge_ledger_entries(entries)
+        batch = self.db.batch()
+        for user_id, user_increments in increments.items():
+            updates = {key: self._increment(value) for key, value in user_increments.items()}
+            updates.update(fields[user_id])
+            batch.set(self.db.collection('users').document(user_id), updates, merge=True)
+        for item in entries:
+            batch.set(self.db.collection('transactions').document(), item["entry"])
+        for key, deltas in merge_rollup_deltas(item["entry"] for item in entries).items():
+            batch.set(self._rollup_ref(*key), self._rollup_increments(key, deltas), merge=True)
+        # Goal updates only touch goals that still exist: one read skips goals
+        # deleted since the allocation was planned, and update() (which needs
+        # the document) fails the batch rather than recreating a goal deleted
+        # after that read
+        goal_updates = merge_goal_updates(entries)
+        goal_refs = [self.db.collection('goals').document(goal_id) for goal_id in goal_updates]
+        existing = {snapshot.id for snapshot in self.db.get_all(goal_refs) if snapshot.exists} if goal_refs else set()
+        for ref in goal_refs:
+            if ref.id not in existing:
+                continue
+            update = goal_updates[ref.id]
+            fields = {key: self._increment(value) for key, value in update["increments"].items()}
+            fields.update(update["fields"])
+            batch.update(ref, fields)
+        for item in entries:
+            for alert in item.get("alerts", ()):
+                batch.set(self.db.collection('alerts').document(), alert)
+        results = batch.commit()
+        return results[0].update_time if results else None  # Every write in a batch shares it
+
+    def _rollup_ref(self, user_id: str, period: str, period_key: str):
+        return self.db.collection('rollups').document(f"{user_id}_{period}_{period_key}")
+
+    def _rollup_increments(self, key: RollupKey, deltas: dict) -> dict:
+        user_id, period, period_key = key
+        updates = {"user_id": user_id, "period": period, "period_key": period_key}
+        for name, value in deltas.items():
+            if isinstance(value, dict):
+                updates[name] = {k: self._increment(v) for k, v in value.items()}
+            else:
+                updates[name] = self._increment(value)
+        return updates
+
+    def get_rollup(self, user_id, period, period_key):
+        snapshot = self._rollup_ref(user_id, period, period_key).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def scan_transactions(self, user_id=None, chunk_size=1000):
+        if user_id is not None:
+            yield from super().scan_transactions(user_id, chunk_size)
+            return
+        query = self.db.collection('transactions').order_by("__name__").limit(chunk_size)
+        last = None
+        while True:
+            snapshots = list((query.start_after(last) if last else query).stream())
+            if snapshots:
+                yield [dict(snapshot.to_dict(), id=snapshot.id) for snapshot in snapshots]
+            if len(snapshots) < chunk_size:
+                return
+            last = snapshots[-1]
+
+    def replace_rollups(self, rollups, user_id=None):
+        from firebase_admin import firestore
+        
+        existing = self.db.collection('rollups')
+        if user_id is not None:
+            existing = existing.where(filter=firestore.FieldFilter("user_id", "==", user_id))
+        writes = [("delete", snapshot.reference, None) for snapshot in existing.stream()]
+        for key, deltas in rollups.items():
+            document = empty_rollup(*key)
+            add_deltas(document, deltas)
+            writes.append(("set", self._rollup_ref(*key), document))
+        
+        # Firestore batches hold at most 500 writes
+        for start in range(0, len(writes), 500):
+            batch = self.db.batch()
+            for op, ref, document in writes[start:start + 500]:
+                if op == "delete":
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, document)
+            batch.commit()
+
+    def query_transactions(self, user_id, limit, after=None, type=None, category=None):
+        from firebase_admin import firestore
+        
+        # Served by the (user_id[, type][, category], timestamp DESC)
+        # composite indexes in firestore.indexes.json
+        transactions = self.db.collection('transactions')
+        query = transactions.where(filter=firestore.FieldFilter("user_id", "==", user_id))
+        if type:
+            query = query.where(filter=firestore.FieldFilter("type", "==", type))
+        if category:
+            query = query.where(filter=firestore.FieldFilter("category", "==", category))
+        query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+        if after is not None:
+            cursor = transactions.document(after["id"]).get()
+            query = query.start_after(cursor if cursor.exists else {"timestamp": after["timestamp"]})
+        return [dict(snapshot.to_dict(), id=snapshot.id) for snapshot in query.limit(limit).stream()]
+
+    def list_goals(self, user_id):
+        from firebase_admin import firestore
+        
+        query = self.db.collection('goals').where(filter=firestore.FieldFilter("user_id", "==", user_id))
+        return [dict(snapshot.to_dict(), id=snapshot.id) for snapshot in query.stream()]
+
+    def list_goals_for_users(self, user_ids):
+        from firebase_admin import firestore
+        
+        # One 'in' query per FIRESTORE_IN_LIMIT users instead of one per user
+        goals = {user_id: [] for user_id in user_ids}
+        user_ids = list(goals)
+        for start in range(0, len(user_ids), FIRESTORE_IN_LIMIT):
+            chunk = user_ids[start:start + FIRESTORE_IN_LIMIT]
+            query = self.db.collection('goals').where(filter=firestore.FieldFilter("user_id", "in", chunk))
+            for snapshot in query.stream():
+                goal = snapshot.to_dict()
+                goals[goal["user_id"]].append(dict(goal, id=snapshot.id))
+        return goals
+
+    def get_goal(self, goal_id):
+        snapshot = self.db.collection('goals').document(goal_id).get()
+        return dict(snapshot.to_dict(), id=snapshot.id) if snapshot.exists else None
+
+    def create_goal(self, goal):
+        ref = self.db.collection('goals').document()
+        ref.set(goal)
+        return ref.id
+
+    def update_goal(self, goal_id, updates):
+        self.db.collection('goals').document(goal_id).update(updates)
+
+    def delete_goal(self, goal_id):
+        self.db.collection('goals').document(goal_id).delete()
+
+    def list_alerts(self, user_id, limit):
+        from firebase_admin import firestore
+        
+        # Served by the (user_id, created_at DESC) index in firestore.indexes.json
+        query = (self.db.collection('alerts')
+                 .where(filter=firestore.FieldFilter("user_id", "==", user_id))
+                 .order_by("created_at", direction=firestore.Query.DESCENDING)
+                 .limit(limit))
+        return [dict(snapshot.to_dict(), id=snapshot.id) for snapshot in query.stream()]
+
+    def pending_settlements(self, limit, after=None):
+        from firebase_admin import firestore
+        
+        # Equality filter plus document-id order: no composite index needed
+        users = self.db.collection('users')
+        query = users.where(filter=firestore.FieldFilter(PENDING_FLAG, "==", True)).order_by("__name__")
+        if after is not None:
+            query = query.start_after(users.document(after).get())
+        return [(snapshot.id, snapshot.to_dict()) for snapshot in query.limit(limit).stream()]
+
+    def get_job_state(self, job_id):
+        snapshot = self.db.collection('jobs').document(job_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def save_job_state(self, job_id, state):
+        self.db.collection('jobs').document(job_id).set(state)
+
+    def watch_user(self, user_id, on_change):
+        # One document listener per watched user, not the whole collection:
+        # cost follows the users this process streams, not the user count
+        def on_snapshot(snapshots, changes, read_time):
+            snapshot = next((snapshot for snapshot in snapshots if snapshot.exists), None)
+            if snapshot is None:
+                on_change(user_id, None, None)
+            else:
+                on_change(user_id, snapshot.to_dict(), snapshot.update_time)
+
+        return self.db.collection('users').document(user_id).on_snapshot(on_snapshot)
+
+
+def create_firestore_client():
+    """Initialize the Firebase Admin SDK and return a Firestore client"""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    # Check if Firebase is already initialized
+    if not firebase_admin._apps:
+        # Option 1: Use GOOGLE_APPLICATION_CREDENTIALS environment variable
+        google_creds = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+
+        # Option 2: Use explicit path from FIREBASE_CREDENTIALS_PATH
+        firebase_creds_path = os.getenv("FIREBASE_CREDENTIALS_PATH")
+
+        if google_creds and os.path.exists(google_creds):
+            # GOOGLE_APPLICATION_CREDENTIALS is set and file exists
+            cred = credentials.Certificate(google_creds)
+            firebase_admin.initialize_app(cred)
+            print(f"✅ Firebase initialized with GOOGLE_APPLICATION_CREDENTIALS: {google_creds}")
+        elif firebase_creds_path and os.path.exists(firebase_creds_path):
+            # Use explicit path
+            cred = credentials.Certificate(firebase_creds_path)
+            firebase_admin.initialize_app(cred)
+            print(f"✅ Firebase initialized with path: {firebase_creds_path}")
+        elif os.path.exists("serviceAccountKey.json"):
+            # Check current directory
+            cred = credentials.Certificate("serviceAccountKey.json")
+            firebase_admin.initialize_app(cred)
+            print("✅ Firebase initialized with serviceAccountKey.json in current directory")
+        else:
+            # Initialize with default credentials (for deployed environments)
+            firebase_admin.initialize_app()
+            print("✅ Firebase initialized with default credentials")
+
+    return firestore.client()
+
+# ============================================================================
+# IN-MEMORY
+# ============================================================================
+
+class MemoryStorage(StorageBackend):
+    """Process-local dictionaries; for tests, benchmarks and demos"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._users = {}
+        self._transactions = []
+        self._rollups = {}
+        self._goals = {}
+        self._alerts = []
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            profile = self._users.get(user_id)
+            return dict(profile) if profile is not None else None
+
+    def update_user(self, user_id: str, updates: dict):
+        with self._lock:
+            if user_id not in self._users:
+                raise KeyError(f"No profile for user {user_id}")
+            self._users[user_id].update(updates)
+
+    def adjust_users(self, increments):
+        with self._lock:
+            missing = [user_id for user_id in increments if user_id not in self._users]
+            if missing:
+                raise KeyError(f"No profile for users {missing}")
+            for user_id, deltas in increments.items():
+                profile = self._users[user_id]
+                for key, value in deltas.items():
+                    profile[key] = profile.get(key, 0) + value
+
+    def commit_ledger(self, entries: List[dict]):
+        increments, fields = merge_ledger_entries(entries)
+        with self._lock:
+            for user_id, user_increments in increments.items():
+                profile = self._users.setdefault(user_id, {})
+                for key, value in user_increments.items():
+                    profile[key] = profile.get(key, 0) + value
+                profile.update(fields[user_id])
+            for item in entries:
+                self._transactions.append(dict(item["entry"], id=uuid.uuid4().hex))
+            for key, deltas in merge_rollup_deltas(item["entry"] for item in entries).items():
+                rollup = self._rollups.get(key) or empty_rollup(*key)
+                add_deltas(rollup, deltas)
+                self._rollups[key] = rollup
+            for goal_id, update in merge_goal_updates(entries).items():
+                goal = self._goals.get(goal_id)
+                if goal is None:
+                    continue  # Deleted since the allocation was planned
+                for key, value in update["increments"].items():
+                    goal[key] = goal.get(key, 0) + value
+                goal.update(update["fields"])
+            for item in entries:
+                self._alerts.extend(dict(alert, id=uuid.uuid4().hex) for alert in item.get("alerts", ()))
+
+    def get_rollup(self, user_id, period, period_key):
+        with self._lock:
+            rollup = self._rollups.get((user_id, period, period_key))
+            return json.loads(json.dumps(rollup)) if rollup is not None else None
+
+    def scan_transactions(self, user_id=None, chunk_size=1000):
+        if user_id is not None:
+            yield from super().scan_transactions(user_id, chunk_size)
+            return
+        for start in range(0, len(self._transactions), chunk_size):
+            with self._lock:
+                chunk = [dict(entry) for entry in self._transactions[start:start + chunk_size]]
+            yield chunk
+
+    def replace_rollups(self, rollups, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._rollups.clear()
+            else:
+                for key in [key for key in self._rollups if key[0] == user_id]:
+                    del self._rollups[key]
+            for key, deltas in rollups.items():
+                rollup = empty_rollup(*key)
+                add_deltas(rollup, deltas)
+                self._rollups[key] = rollup
+
+    def query_transactions(self, user_id, limit, after=None, type=None, category=None):
+        with self._lock:
+            matches = [
+                entry for entry in self._transactions
+                if entry.get("user_id") == user_id
+                and (type is None or entry.get("type") == type)
+                and (category is None or entry.get("category") == category)
+                and (after is None or (entry["timestamp"], entry["id"]) < (after["timestamp"], after["id"]))
+            ]
+        matches.sort(key=lambda entry: (entry["timestamp"], entry["id"]), reverse=True)
+        return [dict(entry) for entry in matches[:limit]]
+
+    def list_goals(self, user_id):
+        with self._lock:
+            return [dict(goal, id=goal_id) for goal_id, goal in self._goals.items() if goal.get("user_id") == user_id]
+
+    def list_goals_for_users(self, user_ids):
+        goals = {user_id: [] for user_id in user_ids}
+        with self._lock:
+            for goal_id, goal in self._goals.items():
+                if goal.get("user_id") in goals:
+                    goals[goal["user_id"]].append(dict(goal, id=goal_id))
+        return goals
+
+    def get_goal(self, goal_id):
+        with self._lock:
+            goal = self._goals.get(goal_id)
+            return dict(goal, id=goal_id) if goal is not None else None
+
+    def create_goal(self, goal):
+        goal_id = uuid.uuid4().hex
+        with self._lock:
+            self._goals[goal_id] = dict(goal)
+        return goal_id
+
+    def update_goal(self, goal_id, updates):
+        with self._lock:
+            if goal_id not in self._goals:
+                raise KeyError(f"No goal {goal_id}")
+            self._goals[goal_id].update(updates)
+
+    def delete_goal(self, goal_id):
+        with self._lock:
+            self._goals.pop(goal_id, None)
+
+    def list_alerts(self, user_id, limit):
+        with self._lock:
+            alerts = [dict(alert) for alert in self._alerts if alert.get("user_id") == user_id]
+        alerts.sort(key=lambda alert: alert["created_at"], reverse=True)
+        return alerts[:limit]
+
+    def pending_settlements(self, limit, after=None):
+        with self._lock:
+            pending = sorted(
+                (user_id, dict(profile)) for user_id, profile in self._users.items()
+                if profile.get(PENDING_FLAG) and (after is None or user_id > after)
+            )
+        return pending[:limit]
+
+    def get_job_state(self, job_id):
+        with self._lock:
+            state = self._jobs.get(job_id)
+            return json.loads(json.dumps(state)) if state is not None else None
+
+    def save_job_state(self, job_id, state):
+        with self._lock:
+            self._jobs[job_id] = json.loads(json.dumps(state))
+
+# ============================================================================
+# SQLITE
+# ============================================================================
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    type TEXT,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_timestamp ON transactions (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_type_timestamp ON transactions (user_id, type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+CREATE TABLE IF NOT EXISTS rollups (
+    user_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    period_key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, period, period_key)
+);
+CREATE TABLE IF NOT EXISTS goals (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_goals_user ON goals (user_id);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user_created ON alerts (user_id, created_at);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Single-node SQLite database in WAL mode. Profiles are JSON documents and
+    increments are applied inside SQL, so each ledger commit is one
+    IMMEDIATE transaction with no read round trip.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "rupeeready.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (WAL lets readers run alongside a writer)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT data FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        rows = self._connection().execute(
+            f"SELECT user_id, data FROM users WHERE user_id IN ({placeholders})", user_ids
+        ).fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def update_user(self, user_id: str, updates: dict):
+        cursor = self._connection().execute(
+            "UPDATE users SET data = json_patch(data, ?) WHERE user_id = ?",
+            (json.dumps(updates), user_id),
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(f"No profile for user {user_id}")
+
+    def adjust_users(self, increments):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user_id, deltas in increments.items():
+                for key, value in deltas.items():
+                    path = f'$."{key}"'
+                    cursor = conn.execute(
+                        "UPDATE users SET data = json_set(data, ?, COALESCE(json_extract(data, ?), 0) + ?) "
+                        "WHERE user_id = ?",
+                        (path, path, value, user_id),
+                    )
+                    if cursor.rowcount == 0:
+                        raise KeyError(f"No profile for user {user_id}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def commit_ledger(self, entries: List[dict]):
+        increments, fields = merge_ledger_entries(entries)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user_id, user_increments in increments.items():
+                conn.execute(
+                    "INSERT INTO users (user_id, data) VALUES (?, '{}') ON CONFLICT(user_id) DO NOTHING",
+                    (user_id,),
+                )
+                for key, value in user_increments.items():
+                    path = f'$."{key}"'
+                    conn.execute(
+                        "UPDATE users SET data = json_set(data, ?, COALESCE(json_extract(data, ?), 0) + ?) "
+                        "WHERE user_id = ?",
+                        (path, path, value, user_id),
+                    )
+                conn.execute(
+                    "UPDATE users SET data = json_patch(data, ?) WHERE user_id = ?",
+                    (json.dumps(fields[user_id]), user_id),
+                )
+            conn.executemany(
+                "INSERT INTO transactions (user_id, type, timestamp, data) VALUES (?, ?, ?, ?)",
+                [
+                    (item["entry"]["user_id"], item["entry"].get("type"),
+                     item["entry"]["timestamp"], json.dumps(item["entry"]))
+                    for item in entries
+                ],
+            )
+            # Rollups are read-modify-write; BEGIN IMMEDIATE already holds the write lock
+            for key, deltas in merge_rollup_deltas(item["entry"] for item in entries).items():
+                self._add_to_rollup(conn, key, deltas)
+            # Goal updates only touch goals that still exist
+            for goal_id, update in merge_goal_updates(entries).items():
+                for key, value in update["increments"].items():
+                    path = f'$."{key}"'
+                    conn.execute(
+                        "UPDATE goals SET data = json_set(data, ?, COALESCE(json_extract(data, ?), 0) + ?) WHERE id = ?",
+                        (path, path, value, goal_id),
+                    )
+                conn.execute(
+                    "UPDATE goals SET data = json_patch(data, ?) WHERE id = ?",
+                    (json.dumps(update["fields"]), goal_id),
+                )
+            conn.executemany(
+                "INSERT INTO alerts (user_id, created_at, data) VALUES (?, ?, ?)",
+                [
+                    (alert["user_id"], alert["created_at"], json.dumps(alert))
+                    for item in entries for alert in item.get("alerts", ())
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _add_to_rollup(self, conn: sqlite3.Connection, key: RollupKey, deltas: dict):
+        row = conn.execute(
+            "SELECT data FROM rollups WHERE user_id = ? AND period = ? AND period_key = ?", key
+        ).fetchone()
+        rollup = json.loads(row[0]) if row else empty_rollup(*key)
+        add_deltas(rollup, deltas)
+        conn.execute(
+            "INSERT INTO rollups (user_id, period, period_key, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(user_id, period, period_key) DO UPDATE SET data = excluded.data",
+            key + (json.dumps(rollup),),
+        )
+
+    def get_rollup(self, user_id, period, period_key):
+        row = self._connection().execute(
+            "SELECT data FROM rollups WHERE user_id = ? AND period = ? AND period_key = ?",
+            (user_id, period, period_key),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def scan_transactions(self, user_id=None, chunk_size=1000):
+        if user_id is not None:
+            yield from super().scan_transactions(user_id, chunk_size)
+            return
+        last_id = 0
+        while True:
+            rows = self._connection().execute(
+                "SELECT id, data FROM transactions WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk_size)
+            ).fetchall()
+            if rows:
+                yield [dict(json.loads(data), id=str(row_id)) for row_id, data in rows]
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    def replace_rollups(self, rollups, user_id=None):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if user_id is None:
+                conn.execute("DELETE FROM rollups")
+            else:
+                conn.execute("DELETE FROM rollups WHERE user_id = ?", (user_id,))
+            for key, deltas in rollups.items():
+                self._add_to_rollup(conn, key, deltas)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query_transactions(self, user_id, limit, after=None, type=None, category=None):
+        # Keyset scan of idx_transactions_user_timestamp (rowid breaks ties)
+        clauses = ["user_id = ?"]
+        params: list = [user_id]
+        if type:
+            clauses.append("type = ?")
+            params.append(type)
+        if category:
+            clauses.append("json_extract(data, '$.category') = ?")
+            params.append(category)
+        if after is not None:
+            try:
+                after_id = int(after["id"])
+            except ValueError:
+                raise InvalidCursor(f"Not a transaction id: {after['id']!r}")
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([after["timestamp"], after["timestamp"], after_id])
+        rows = self._connection().execute(
+            f"SELECT id, data FROM transactions WHERE {' AND '.join(clauses)} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [dict(json.loads(data), id=str(row_id)) for row_id, data in rows]
+
+    def list_goals(self, user_id):
+        rows = self._connection().execute(
+            "SELECT id, data FROM goals WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        return [dict(json.loads(data), id=goal_id) for goal_id, data in rows]
+
+    def list_goals_for_users(self, user_ids):
+        goals = {user_id: [] for user_id in user_ids}
+        if not goals:
+            return goals
+        placeholders = ",".join("?" * len(goals))
+        rows = self._connection().execute(
+            f"SELECT id, user_id, data FROM goals WHERE user_id IN ({placeholders})", list(goals)
+        ).fetchall()
+        for goal_id, user_id, data in rows:
+            goals[user_id].append(dict(json.loads(data), id=goal_id))
+        return goals
+
+    def get_goal(self, goal_id):
+        row = self._connection().execute("SELECT data FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        return dict(json.loads(row[0]), id=goal_id) if row else None
+
+    def create_goal(self, goal):
+        goal_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO goals (id, user_id, data) VALUES (?, ?, ?)",
+            (goal_id, goal["user_id"], json.dumps(goal)),
+        )
+        return goal_id
+
+    def update_goal(self, goal_id, updates):
+        cursor = self._connection().execute(
+            "UPDATE goals SET data = json_patch(data, ?) WHERE id = ?", (json.dumps(updates), goal_id)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(f"No goal {goal_id}")
+
+    def delete_goal(self, goal_id):
+        self._connection().execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+
+    def list_alerts(self, user_id, limit):
+        rows = self._connection().execute(
+            "SELECT id, data FROM alerts WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+        return [dict(json.loads(data), id=str(row_id)) for row_id, data in rows]
+
+    def pending_settlements(self, limit, after=None):
+        rows = self._connection().execute(
+            f"SELECT user_id, data FROM users WHERE json_extract(data, '$.{PENDING_FLAG}') = 1 "
+            "AND user_id > ? ORDER BY user_id LIMIT ?",
+            (after or "", limit),
+        ).fetchall()
+        return [(user_id, json.loads(data)) for user_id, data in rows]
+
+    def get_job_state(self, job_id):
+        row = self._connection().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_job_state(self, job_id, state):
+        self._connection().execute(
+            "INSERT INTO jobs (job_id, data) VALUES (?, ?) ON CONFLICT(job_id) DO UPDATE SET data = excluded.data",
+            (job_id, json.dumps(state)),
+        )
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+# ============================================================================
+# FACTORY
+# ============================================================================
+
+STORAGE_BACKENDS = ("firestore", "memory", "sqlite")
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    """Build the backend named by STORAGE_BACKEND (default: firestore)"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "firestore")).lower()
+    if backend == "firestore":
+        return FirestoreStorage(create_firestore_client())
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("SQLITE_PATH", "rupeeready.db"))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected one of {', '.join(STORAGE_BACKENDS)})")
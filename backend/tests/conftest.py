@@ -0,0 +1,40 @@
+"""
+Shared fixtures: the app runs in-process (as in load_test.py and
+benchmark.py) against a storage backend and fake Gemini model per test.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every request comes from the same in-process client
+os.environ.setdefault("RATE_LIMIT_USER_PER_SECOND", "0")
+os.environ.setdefault("RATE_LIMIT_SOURCE_PER_SECOND", "0")
+
+import pytest
+
+import main
+from fakes import FakeFirestore, FakeModel
+from storage import FirestoreStorage, MemoryStorage, SQLiteStorage
+
+
+def make_storage(backend: str, tmp_path):
+    if backend == "fake-firestore":
+        return FirestoreStorage(FakeFirestore())
+    if backend == "sqlite":
+        return SQLiteStorage(str(tmp_path / "rupeeready.db"))
+    return MemoryStorage()
+
+
+@pytest.fixture
+def app_state():
+    """Reset the app's in-process state; tests then set main.storage and main.model"""
+    saved = main.storage, main.model
+    main.model = FakeModel()
+    yield main
+    if main.storage is not None and main.storage is not saved[0]:
+        main.storage.close()
+    main.storage, main.model = saved
+    for cache in (main.profile_cache, main.chanakya_cache, main.idempotency_store):
+        cache.clear()
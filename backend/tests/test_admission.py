@@ -0,0 +1,57 @@
+"""Admission control: rate limits and Gemini queue shedding"""
+
+import asyncio
+
+import httpx
+
+from resilience import Overloaded, RateLimiter
+from storage import MemoryStorage
+
+
+async def post_in_order(app, *requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [await client.post(path, json=payload) for path, payload in requests]
+
+
+def test_idempotent_retries_are_not_rate_limited(app_state, monkeypatch):
+    app_state.storage = MemoryStorage()
+    monkeypatch.setattr(app_state, "user_rate_limiter", RateLimiter(rate=0.001, burst=1))
+    income = {"user_id": "retry_user", "amount": 1000, "idempotency_key": "payout-1"}
+
+    first, retry, other = asyncio.run(post_in_order(
+        app_state.app,
+        ("/webhook/income", income),
+        ("/webhook/income", income),
+        ("/webhook/income", dict(income, idempotency_key="payout-2")),
+    ))
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert other.status_code == 429  # New work is still charged
+
+
+def test_shed_expense_check_falls_back_to_rules(app_state, monkeypatch):
+    app_state.storage = MemoryStorage()
+    app_state.storage.commit_ledger([{
+        "user_id": "busy_user",
+        "increments": {"safe_balance": 100000.0},
+        "fields": {},
+        "entry": {"user_id": "busy_user", "type": "income", "amount": 100000.0, "timestamp": "2025-02-14T10:00:00"},
+    }])
+
+    async def shed(*args, **kwargs):
+        raise Overloaded("queue_full", 1.0)
+
+    monkeypatch.setattr(app_state.gemini_queue, "acquire", shed)
+    # Not clear-cut for the local policy, so it would consult Gemini
+    (response,) = asyncio.run(post_in_order(
+        app_state.app, ("/api/check-expense", {"user_id": "busy_user", "amount": 2500, "category": "gadgets"})
+    ))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["decision_path"] == "fallback"
+    assert body["fallback_reason"] == "overloaded"
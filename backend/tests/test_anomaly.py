@@ -0,0 +1,34 @@
+"""Per-category spending classification"""
+
+from anomaly import STATS_FIELD, AnomalyDetector
+
+
+def profile_with_history(amounts, category="food") -> dict:
+    detector = AnomalyDetector()
+    profile = {}
+    for amount in amounts:
+        profile[STATS_FIELD] = detector.updated_stats(profile, category, amount)
+    return profile
+
+
+HISTORY = [400, 450, 500, 420, 480, 460]
+
+
+def test_usual_amount_is_typical():
+    assert AnomalyDetector().assess(profile_with_history(HISTORY), "food", 450).status == "typical"
+
+
+def test_far_below_usual_amount_is_typical():
+    assessment = AnomalyDetector().assess(profile_with_history(HISTORY), "food", 50)
+    assert assessment.z_score < -1.5
+    assert assessment.status == "typical"
+
+
+def test_far_above_usual_amount_escalates():
+    detector = AnomalyDetector()
+    assert detector.assess(profile_with_history(HISTORY), "food", 560).status == "unusual"
+    assert detector.assess(profile_with_history(HISTORY), "food", 5000).status == "anomalous"
+
+
+def test_short_history_is_unknown():
+    assert AnomalyDetector().assess(profile_with_history(HISTORY[:3]), "food", 450).status == "unknown"
@@ -0,0 +1,36 @@
+"""Write-through profile cache ordering"""
+
+from cache import ProfileCache
+
+
+def cached(balance: float) -> ProfileCache:
+    cache = ProfileCache()
+    cache.put("user", {"safe_balance": balance})
+    return cache
+
+
+def test_late_snapshot_does_not_roll_back_a_newer_write():
+    cache = cached(100.0)
+    cache.apply("user", increments={"safe_balance": 50.0}, version=1)
+    cache.apply("user", increments={"safe_balance": 25.0}, version=2)
+
+    # Echo of the first write arrives after the second was applied
+    assert not cache.put("user", {"safe_balance": 150.0}, version=1)
+    assert cache.get("user")["safe_balance"] == 175.0
+
+
+def test_write_included_in_a_newer_snapshot_is_not_applied_twice():
+    cache = cached(100.0)
+    assert cache.put("user", {"safe_balance": 150.0}, version=3)  # Snapshot landed before our write-through
+    cache.apply("user", increments={"safe_balance": 50.0}, version=3)
+    assert cache.get("user")["safe_balance"] == 150.0
+
+    cache.apply("user", increments={"safe_balance": 10.0}, version=4)
+    assert cache.get("user")["safe_balance"] == 160.0
+
+
+def test_unversioned_writes_always_apply():
+    cache = cached(100.0)
+    cache.apply("user", increments={"safe_balance": 5.0})
+    cache.apply("user", increments={"safe_balance": 5.0})
+    assert cache.get("user")["safe_balance"] == 110.0
@@ -0,0 +1,43 @@
+"""Captured requests must replay with the status they were recorded with"""
+
+import asyncio
+import json
+
+import httpx
+
+from capture import CaptureMiddleware, TrafficRecorder, read_capture
+from mock_bank import REPLAY_ENDPOINTS, EndpointStats, send_replay_request
+from storage import MemoryStorage
+
+
+def test_ndjson_batches_replay_with_their_content_type(app_state, tmp_path):
+    app_state.storage = MemoryStorage()
+    recorder = TrafficRecorder(str(tmp_path / "capture.ndjson"))
+    transport = httpx.ASGITransport(app=CaptureMiddleware(app_state.app, recorder=recorder))
+    lines = [{"user_id": "batch_user", "amount": amount} for amount in (1000, 2500)]
+    bodies = [
+        "".join(json.dumps(line) + "\n" for line in lines),  # multi-line NDJSON
+        json.dumps(lines[0]) + "\n",                         # single line: also a JSON object
+    ]
+
+    async def capture_and_replay():
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for body in bodies:
+                resp = await client.post(
+                    "/webhook/income/batch", content=body, headers={"content-type": "application/x-ndjson"}
+                )
+                assert resp.status_code == 200
+            recorder.close()
+
+            records = list(read_capture(recorder.path))
+            replayed = {name: EndpointStats() for name in REPLAY_ENDPOINTS.values()}
+            mismatches = {}
+            for record in records:
+                await send_replay_request(client, "http://test", record, replayed, mismatches, asyncio.Semaphore(0))
+            return records, mismatches
+
+    records, mismatches = asyncio.run(capture_and_replay())
+    assert [record["body"] for record in records] == bodies
+    assert {record["content_type"] for record in records} == {"application/x-ndjson"}
+    assert mismatches == {}
+    assert app_state.storage.get_user("batch_user")["total_income"] == 2 * (1000 + 2500 + 1000)
@@ -0,0 +1,37 @@
+"""Chanakya tax decisions are cached per bucketed income profile and prompt version"""
+
+import asyncio
+
+from fakes import FakeModel
+
+PROFILE = {"safe_balance": 40000.0, "tax_vault": 9000.0, "total_income": 60000.0}
+
+
+def test_nearby_amounts_share_a_key(app_state):
+    key = app_state.chanakya_cache_key
+    assert key(PROFILE, 19000) == key(PROFILE, 20000)
+    assert key(PROFILE, 2000) != key(PROFILE, 20000)
+    assert key(PROFILE, 20000) != key(dict(PROFILE, safe_balance=400.0), 20000)
+
+
+def test_prompt_or_model_change_invalidates_keys(app_state, monkeypatch):
+    before = app_state.chanakya_cache_key(PROFILE, 20000)
+    monkeypatch.setattr(app_state, "CHANAKYA_CACHE_VERSION", "another-prompt")
+    assert app_state.chanakya_cache_key(PROFILE, 20000) != before
+
+
+def test_repeat_decision_is_served_from_cache(app_state):
+    first = asyncio.run(app_state.decide_tax_allocation(PROFILE, 20000))
+    second = asyncio.run(app_state.decide_tax_allocation(PROFILE, 20500))
+
+    assert (first.percentage, first.path) == (20, "gemini")
+    assert (second.percentage, second.path) == (20, "cache")
+    assert app_state.model.calls == 1
+
+
+def test_unparseable_reply_is_not_cached(app_state):
+    app_state.model = FakeModel(responses={"Chanakya": "no idea"})
+    decision = asyncio.run(app_state.decide_tax_allocation(PROFILE, 20000))
+
+    assert (decision.percentage, decision.path) == (app_state.DEFAULT_TAX_PERCENTAGE, "fallback")
+    assert app_state.chanakya_cache.get(app_state.chanakya_cache_key(PROFILE, 20000)) is None
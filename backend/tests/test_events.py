@@ -0,0 +1,28 @@
+"""Balance stream fan-out and shutdown"""
+
+import asyncio
+
+from storage import MemoryStorage
+
+
+def test_closing_the_broker_ends_open_streams(app_state):
+    app_state.storage = MemoryStorage()
+
+    async def stream_until_closed():
+        subscription = app_state.balance_broker.subscribe("stream_user")
+        events = app_state.balance_events(subscription)
+        first = await events.__anext__()
+        app_state.balance_broker.close()
+        rest = [event async for event in events]  # Ends instead of waiting for heartbeats
+        refused = app_state.balance_broker.subscribe("stream_user")
+        return first, rest, refused
+
+    try:
+        first, rest, refused = asyncio.run(asyncio.wait_for(stream_until_closed(), timeout=5))
+    finally:
+        app_state.balance_broker.closed = False
+
+    assert first.startswith(b"event: snapshot")
+    assert rest == []
+    assert refused is None
+    assert not app_state.balance_broker.has_subscribers("stream_user")
@@ -0,0 +1,70 @@
+"""Bulk income ingestion shares the single-income path's ordering and goal allocation"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import make_storage
+
+
+async def run(app, *calls):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.request(method, path, json=payload) for method, path, payload in calls))
+
+
+@pytest.mark.parametrize("backend", ["fake-firestore", "sqlite"])
+def test_batch_interleaved_with_single_webhooks_loses_no_updates(app_state, backend, tmp_path):
+    app_state.storage = make_storage(backend, tmp_path)
+    batch = [{"user_id": "mixed_user", "amount": 1000} for _ in range(50)]
+    calls = [("POST", "/webhook/income/batch", batch)] * 4
+    calls += [("POST", "/webhook/income", {"user_id": "mixed_user", "amount": 1000})] * 50
+
+    responses = asyncio.run(run(app_state.app, *calls))
+
+    assert all(response.status_code == 200 for response in responses)
+    profile = app_state.storage.get_user("mixed_user")
+    assert profile["total_income"] == 250 * 1000
+    assert profile["tax_vault"] == 250 * 200
+    assert profile["safe_balance"] == 250 * 800
+    (balance,) = asyncio.run(run(app_state.app, ("GET", "/api/user/mixed_user/balance", None)))
+    assert balance.json()["safe_balance"] == profile["safe_balance"]
+
+
+@pytest.mark.parametrize("backend", ["memory", "fake-firestore", "sqlite"])
+def test_batch_allocates_to_goals(app_state, backend, tmp_path):
+    app_state.storage = make_storage(backend, tmp_path)
+    (created,) = asyncio.run(run(app_state.app, (
+        "POST", "/api/user/goal_user/goals", {"name": "Laptop", "targetAmount": 200.0}
+    )))
+    goal_id = created.json()["id"]
+
+    # 10% of each ₹800 safe allocation goes to the goal until it is full
+    batch = [{"user_id": "goal_user", "amount": 1000} for _ in range(3)]
+    (response,) = asyncio.run(run(app_state.app, ("POST", "/webhook/income/batch", batch)))
+
+    results = response.json()["results"]
+    assert [result["goal_allocation"] for result in results] == [80.0, 80.0, 40.0]
+    goal = app_state.storage.get_goal(goal_id)
+    assert goal["currentAmount"] == 200.0
+    assert goal["status"] == "completed"
+    profile = app_state.storage.get_user("goal_user")
+    assert profile["goal_savings"] == 200.0
+    assert profile["safe_balance"] == 3 * 800 - 200
+    alerts = app_state.storage.list_alerts("goal_user", 10)
+    assert sorted(alert["milestone"] for alert in alerts) == [25, 50, 75, 100]
+
+
+def test_large_batch_is_never_shed_and_shares_commits(app_state):
+    app_state.storage = make_storage("memory", None)
+    batch = [{"user_id": f"bulk_user_{i}", "amount": 1000} for i in range(2000)]
+
+    (response,) = asyncio.run(run(app_state.app, ("POST", "/webhook/income/batch", batch)))
+
+    summary = response.json()["summary"]
+    assert summary["processed"] == 2000
+    assert summary["failed"] == 0
+    # A profile, log entry and three rollups per user: 100 users per commit
+    assert summary["batches"] == 20
+    assert app_state.gemini_queue.stats()["shed"] == {}
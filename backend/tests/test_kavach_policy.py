@@ -0,0 +1,41 @@
+"""Kavach's local rules decide clear-cut expenses and leave the rest to Gemini"""
+
+from kavach_policy import KavachPolicy, KavachRuleEngine
+
+ENGINE = KavachRuleEngine(KavachPolicy())
+
+
+def test_expense_over_half_the_balance_is_blocked():
+    decision = ENGINE.decide(10000, 6000, "food")
+    assert (decision.status, decision.rule) == ("BLOCKED", "max_expense_ratio")
+
+
+def test_expense_leaving_too_little_is_blocked():
+    decision = ENGINE.decide(900, 450, "food")
+    assert (decision.status, decision.rule) == ("BLOCKED", "min_remaining_balance")
+
+
+def test_non_essential_on_low_balance_is_blocked():
+    decision = ENGINE.decide(4000, 100, " Shopping ")
+    assert (decision.status, decision.rule) == ("BLOCKED", "non_essential_low_balance")
+
+
+def test_essential_expense_is_approved():
+    decision = ENGINE.decide(20000, 2000, "Groceries")
+    assert (decision.status, decision.rule) == ("APPROVED", "essential_category")
+
+
+def test_ambiguous_expenses_go_to_gemini():
+    assert ENGINE.decide(20000, 2000, "gifts") is None
+    assert ENGINE.decide(20000, 2000, "entertainment") is None  # non-essential, but the balance is healthy
+
+
+def test_fallback_approves_only_small_expenses():
+    assert ENGINE.fallback(20000, 4000, "gifts").status == "APPROVED"
+    assert ENGINE.fallback(20000, 4001, "gifts").status == "BLOCKED"
+
+
+def test_thresholds_come_from_the_policy():
+    engine = KavachRuleEngine(KavachPolicy(max_expense_ratio=0.1, essential_categories=frozenset({"gifts"})))
+    assert engine.decide(20000, 3000, "food").rule == "max_expense_ratio"
+    assert engine.decide(20000, 1000, "gifts").status == "APPROVED"
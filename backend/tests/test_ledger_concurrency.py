@@ -0,0 +1,48 @@
+"""Concurrent ledger writes for one user must not lose updates"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import make_storage
+
+WEBHOOKS = 200
+AMOUNT = 1000  # FakeModel answers Chanakya with 20%
+
+
+async def post_all(app, requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.post(path, json=payload) for path, payload in requests))
+
+
+@pytest.mark.parametrize("backend", ["fake-firestore", "sqlite", "memory"])
+def test_concurrent_income_webhooks_lose_no_updates(app_state, backend, tmp_path):
+    app_state.storage = make_storage(backend, tmp_path)
+    requests = [("/webhook/income", {"user_id": "race_user", "amount": AMOUNT})] * WEBHOOKS
+
+    responses = asyncio.run(post_all(app_state.app, requests))
+
+    assert [response.status_code for response in responses] == [200] * WEBHOOKS
+    profile = app_state.storage.get_user("race_user")
+    assert profile["safe_balance"] == WEBHOOKS * AMOUNT * 0.8
+    assert profile["tax_vault"] == WEBHOOKS * AMOUNT * 0.2
+    assert profile["total_income"] == WEBHOOKS * AMOUNT
+    assert len(app_state.storage.query_transactions("race_user", WEBHOOKS + 1)) == WEBHOOKS
+
+
+@pytest.mark.parametrize("backend", ["fake-firestore", "sqlite"])
+def test_concurrent_expenses_never_overdraw(app_state, backend, tmp_path):
+    app_state.storage = make_storage(backend, tmp_path)
+    asyncio.run(post_all(app_state.app, [("/webhook/income", {"user_id": "spender", "amount": 10000})]))
+
+    # ₹8,000 safe balance; 40 x ₹450 food expenses (decided by the local policy)
+    requests = [("/api/check-expense", {"user_id": "spender", "amount": 450, "category": "food"})] * 40
+    responses = asyncio.run(post_all(app_state.app, requests))
+
+    approved = sum(response.json()["status"] == "APPROVED" for response in responses)
+    profile = app_state.storage.get_user("spender")
+    assert profile["safe_balance"] == 8000 - 450 * approved
+    assert profile["safe_balance"] >= 0
+    assert profile["total_expenses"] == 450 * approved
@@ -0,0 +1,31 @@
+"""Agent throughput must scale with concurrent users (no blocking I/O on the event loop)"""
+
+import asyncio
+
+import httpx
+
+import load_test
+from fakes import FakeFirestore, FakeModel
+from storage import FirestoreStorage
+
+REQUESTS = 32
+
+
+def test_throughput_scales_with_concurrency(app_state):
+    app_state.storage = FirestoreStorage(FakeFirestore(latency=0.01))
+    app_state.model = FakeModel(latency=0.1)
+
+    async def measure():
+        transport = httpx.ASGITransport(app=app_state.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            levels = {}
+            for concurrency in (1, 16):
+                app_state.chanakya_cache.clear()  # Each level pays for its own Gemini calls
+                throughput, _, errors = await load_test.run_level(client, concurrency, REQUESTS)
+                assert errors == 0
+                levels[concurrency] = throughput
+            return levels
+
+    levels = asyncio.run(measure())
+    # Blocking calls on the loop would keep 16 users near the 1-user rate
+    assert levels[16] >= 4 * levels[1], levels
@@ -0,0 +1,70 @@
+"""Gemini calls fall back within their latency budget and stop while the circuit is open"""
+
+import asyncio
+
+from fakes import FakeModel
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class BrokenModel:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        raise RuntimeError("Gemini is down")
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Only consecutive failures count
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, half_open_max_calls=1)
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # One probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker._state == OPEN  # state would report half-open again at once (reset_timeout=0)
+
+
+def test_slow_reply_falls_back_within_budget(app_state):
+    app_state.model = FakeModel(latency=0.3)
+
+    async def consult():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await app_state.consult_gemini("Chanakya", "chanakya", budget=0.05)
+        elapsed = loop.time() - start
+        await asyncio.sleep(0.3)  # Let the abandoned call return its queue slot
+        return result, elapsed
+
+    (response, reason), elapsed = asyncio.run(consult())
+    assert (response, reason) == (None, "timeout")
+    assert elapsed < 0.25
+
+
+def test_open_circuit_skips_gemini_and_uses_the_default(app_state, monkeypatch):
+    model = app_state.model = BrokenModel()
+    monkeypatch.setattr(app_state, "gemini_breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    profile = {"safe_balance": 40000.0, "tax_vault": 9000.0, "total_income": 60000.0}
+
+    reasons = [asyncio.run(app_state.decide_tax_allocation(profile, 20000)).fallback_reason for _ in range(3)]
+
+    assert reasons == ["error", "error", "circuit_open"]
+    assert model.calls == 2
+    decision = asyncio.run(app_state.decide_tax_allocation(profile, 20000))
+    assert (decision.percentage, decision.path) == (app_state.DEFAULT_TAX_PERCENTAGE, "fallback")
@@ -0,0 +1,46 @@
+"""Deferred settlement allocates income exactly as immediate settlement does"""
+
+import asyncio
+
+import httpx
+
+from audit import audit_ledger
+from storage import MemoryStorage
+
+
+async def run(app, *calls):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.request(method, path, json=payload) for method, path, payload in calls))
+
+
+def fund_goal(app_state, user_id: str, amount: float) -> dict:
+    """Create a goal, receive one income and return the goal afterwards"""
+    (created,) = asyncio.run(run(app_state.app, (
+        "POST", f"/api/user/{user_id}/goals", {"name": "Scooter", "targetAmount": 160.0}
+    )))
+    asyncio.run(run(app_state.app, ("POST", "/webhook/income", {"user_id": user_id, "amount": amount})))
+    return app_state.storage.get_goal(created.json()["id"])
+
+
+def test_deferred_income_funds_goals_at_settlement(app_state, monkeypatch):
+    app_state.storage = MemoryStorage()
+    immediate_goal = fund_goal(app_state, "immediate_user", 1000)
+
+    monkeypatch.setattr(app_state, "INCOME_SETTLEMENT_MODE", "deferred")
+    deferred_goal = fund_goal(app_state, "deferred_user", 1000)
+    assert deferred_goal["currentAmount"] == 0  # Nothing allocated until settlement
+
+    (report,) = asyncio.run(run(app_state.app, ("POST", "/api/settlement/run?run_id=goals-test", None)))
+    assert report.json()["goal_allocated"] == 80.0
+
+    deferred_goal = app_state.storage.get_goal(deferred_goal["id"])
+    assert deferred_goal["currentAmount"] == immediate_goal["currentAmount"] == 80.0
+    for user_id in ("immediate_user", "deferred_user"):
+        profile = app_state.storage.get_user(user_id)
+        assert profile["goal_savings"] == 80.0
+        assert profile["safe_balance"] == 720.0
+        assert sorted(alert["milestone"] for alert in app_state.storage.list_alerts(user_id, 10)) == [25, 50]
+
+    # The audit replays goal savings from settlement entries too
+    assert audit_ledger(app_state.storage)["mismatched_users"] == 0
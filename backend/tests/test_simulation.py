@@ -0,0 +1,34 @@
+"""Monte Carlo projections are reproducible for a given seed"""
+
+from kavach_policy import KavachPolicy
+from simulation import HistoryModel, simulate
+
+TRANSACTIONS = [
+    {"type": "income", "amount": 30000 + 1000 * i, "tax_allocated": 6000 + 200 * i,
+     "timestamp": f"2025-0{1 + i % 3}-{10 + i:02d}T10:00:00"}
+    for i in range(6)
+] + [
+    {"type": "expense", "amount": amount, "category": category, "timestamp": f"2025-0{1 + i % 3}-{12 + i:02d}T18:00:00"}
+    for i, (amount, category) in enumerate([(800, "food"), (2500, "shopping"), (12000, "rent"), (450, "transport")])
+]
+PROFILE = {"safe_balance": 25000.0, "tax_vault": 8000.0}
+
+
+def project(seed):
+    history = HistoryModel.fit(TRANSACTIONS, 20)
+    return simulate(PROFILE, history, KavachPolicy(), months=6, paths=2000, seed=seed)
+
+
+def test_same_seed_same_projection():
+    assert project(7) == project(7)
+
+
+def test_different_seeds_differ():
+    assert project(7)["safe_balance"] != project(8)["safe_balance"]
+
+
+def test_bands_are_ordered():
+    projection = project(7)
+    for bands in (projection["safe_balance"], projection["tax_vault"]):
+        for month in range(projection["months"]):
+            assert bands["p5"][month] <= bands["p50"][month] <= bands["p95"][month]
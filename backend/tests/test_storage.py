@@ -0,0 +1,53 @@
+"""Behaviour every storage backend must share"""
+
+import pytest
+
+from conftest import make_storage
+
+BACKENDS = ["fake-firestore", "sqlite", "memory"]
+
+
+def income_item(user_id: str, goals: dict) -> dict:
+    return {
+        "user_id": user_id,
+        "increments": {"safe_balance": 900.0, "goal_savings": 100.0},
+        "fields": {"last_income_date": "2025-02-14T10:00:00"},
+        "entry": {"user_id": user_id, "type": "income", "amount": 1000.0, "timestamp": "2025-02-14T10:00:00"},
+        "goals": goals,
+    }
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_goal_updates_skip_deleted_goals(backend, tmp_path):
+    storage = make_storage(backend, tmp_path)
+    kept = storage.create_goal({"user_id": "saver", "name": "Bike", "targetAmount": 500.0, "currentAmount": 0.0})
+    deleted = storage.create_goal({"user_id": "saver", "name": "Phone", "targetAmount": 500.0, "currentAmount": 0.0})
+    storage.delete_goal(deleted)
+
+    update = {"increments": {"currentAmount": 50.0}, "fields": {"updatedAt": "2025-02-14T10:00:00"}}
+    storage.commit_ledger([income_item("saver", {kept: update, deleted: update})])
+
+    assert storage.get_goal(deleted) is None
+    assert [goal["id"] for goal in storage.list_goals("saver")] == [kept]
+    assert storage.get_goal(kept)["currentAmount"] == 50.0
+    assert storage.get_user("saver")["safe_balance"] == 900.0
+    storage.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_list_goals_for_users_groups_by_user(backend, tmp_path):
+    storage = make_storage(backend, tmp_path)
+    # More users than one Firestore 'in' filter takes
+    user_ids = [f"saver_{i}" for i in range(45)]
+    goal_ids = {
+        user_id: storage.create_goal({"user_id": user_id, "name": "Bike", "targetAmount": 500.0})
+        for user_id in user_ids[::2]
+    }
+    storage.create_goal({"user_id": "someone_else", "name": "Phone", "targetAmount": 500.0})
+
+    goals = storage.list_goals_for_users(user_ids)
+
+    assert sorted(goals) == sorted(user_ids)
+    for user_id in user_ids:
+        assert [goal["id"] for goal in goals[user_id]] == ([goal_ids[user_id]] if user_id in goal_ids else [])
+    storage.close()